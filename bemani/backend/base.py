@@ -408,7 +408,7 @@ class Base(ABC):
         self.data.local.game.put_settings(self.game, userid, settings)
 
     def get_machine_id(self) -> int:
-        machine = self.data.local.machine.get_machine(self.config.machine.pcbid)
+        machine = self.data.local.machine.get_machine_cached(self.config.machine.pcbid)
         return machine.id
 
     def get_machine(self) -> Machine:
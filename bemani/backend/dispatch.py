@@ -76,7 +76,7 @@ class Dispatch:
         pcbid = tree.attribute('srcid')
 
         # If we are enforcing, bail out if we don't recognize thie ID
-        pcb = self.__data.local.machine.get_machine(pcbid)
+        pcb = self.__data.local.machine.get_machine_cached(pcbid)
         if self.__config.server.enforce_pcbid and pcb is None:
             self.log("Unrecognized PCBID {}", pcbid)
             raise UnrecognizedPCBIDException(pcbid, modelstring, self.__config.client.address)
@@ -96,7 +96,7 @@ class Dispatch:
         # If the machine we looked up is in an arcade, override the global
         # paseli settings with the arcade paseli settings.
         if pcb.arcade is not None:
-            arcade = self.__data.local.machine.get_arcade(pcb.arcade)
+            arcade = self.__data.local.machine.get_arcade_cached(pcb.arcade)
             if arcade is not None:
                 config['paseli']['enabled'] = arcade.data.get_bool('paseli_enabled')
                 config['paseli']['infinite'] = arcade.data.get_bool('paseli_infinite')
@@ -190,6 +190,22 @@ class IIDXBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
         machine = self.data.local.machine.get_machine(self.config.machine.pcbid)
         return machine.arcade is not None
 
+    @classmethod
+    def clear_rate_stats(cls, data: ValidatedDict) -> Optional[Tuple[bool, bool]]:
+        """
+        Given the data saved with an attempt, return whether it counts as a clear
+        and whether it counts as a full combo, or None if the attempt should be left
+        out of clear rates entirely.
+        """
+        clear_status = data.get_int('clear_status', cls.CLEAR_STATUS_FAILED)
+        if clear_status == cls.CLEAR_STATUS_NO_PLAY:
+            # This attempt was outside of the clear infra, so don't bother with it.
+            return None
+        return (
+            clear_status != cls.CLEAR_STATUS_FAILED,
+            clear_status == cls.CLEAR_STATUS_FULL_COMBO,
+        )
+
     def get_clear_rates(
         self,
         songid: Optional[int]=None,
@@ -208,8 +224,8 @@ class IIDXBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
             },
         }
         """
-        all_attempts, remote_attempts = Parallel.execute([
-            lambda: self.data.local.music.get_all_attempts(
+        local_rates, remote_attempts = Parallel.execute([
+            lambda: self.data.local.music.get_clear_rates(
                 game=self.game,
                 version=self.music_version,
                 songid=songid,
@@ -224,35 +240,15 @@ class IIDXBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
         ])
 
         attempts: Dict[int, Dict[int, Dict[str, int]]] = {}
-        for (_, attempt) in all_attempts:
-            if attempt.data.get_int('clear_status') == self.CLEAR_STATUS_NO_PLAY:
-                # This attempt was outside of the clear infra, so don't bother with it.
-                continue
-
-            # Terrible temporary structure is terrible.
-            if attempt.id not in attempts:
-                attempts[attempt.id] = {}
-            if attempt.chart not in attempts[attempt.id]:
-                attempts[attempt.id][attempt.chart] = {
-                    'total': 0,
-                    'clears': 0,
-                    'fcs': 0,
+        for musicid in local_rates:
+            attempts[musicid] = {}
+            for chart in local_rates[musicid]:
+                attempts[musicid][chart] = {
+                    'total': local_rates[musicid][chart]['plays'],
+                    'clears': local_rates[musicid][chart]['clears'],
+                    'fcs': local_rates[musicid][chart]['combos'],
                 }
 
-            # We saw an attempt, keep the total attempts in sync.
-            attempts[attempt.id][attempt.chart]['total'] = attempts[attempt.id][attempt.chart]['total'] + 1
-
-            if attempt.data.get_int('clear_status', self.CLEAR_STATUS_FAILED) == self.CLEAR_STATUS_FAILED:
-                # This attempt was a failure, so don't count it against clears of full combos
-                continue
-
-            # It was at least a clear
-            attempts[attempt.id][attempt.chart]['clears'] = attempts[attempt.id][attempt.chart]['clears'] + 1
-
-            if attempt.data.get_int('clear_status') == self.CLEAR_STATUS_FULL_COMBO:
-                # This was a full combo clear, so it also counts here
-                attempts[attempt.id][attempt.chart]['fcs'] = attempts[attempt.id][attempt.chart]['fcs'] + 1
-
         # Merge in remote attempts
         for songid in remote_attempts:
             if songid not in attempts:
@@ -411,6 +407,7 @@ class IIDXBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
             old_ex_score,
             history,
             raised,
+            clear_stats=self.clear_rate_stats(history),
         )
 
     def update_rank(
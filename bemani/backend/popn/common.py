@@ -2,7 +2,7 @@
 from abc import ABC, abstractmethod
 import binascii
 import random
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Tuple
 from typing_extensions import Final
 
 from bemani.backend.popn.base import PopnMusicBase
@@ -427,38 +427,41 @@ class PopnMusicModernBase(PopnMusicBase, ABC):
                 new_course,
             )
 
-            # Handle fetching all scores
-            uids_and_courses, profile = Parallel.execute([
-                lambda: self.data.local.user.get_all_achievements(self.game, self.version),
+            self.data.local.ranking.put_ranking(
+                self.game,
+                self.version,
+                course_type,
+                course_id,
+                userid,
+                new_course.get_int('score'),
+                prefecture,
+                loc_id,
+            )
+
+            # Look up where we stand overall, in our prefecture and at this location. If the game
+            # didn't tell us where we are, there's no prefecture or location board to rank on.
+            all_rank, pref_rank, loc_rank, profile = Parallel.execute([
+                lambda: self.data.local.ranking.get_rank(self.game, self.version, course_type, course_id, userid),
+                lambda: (
+                    self.data.local.ranking.get_rank(self.game, self.version, course_type, course_id, userid, prefecture=prefecture)
+                    if prefecture is not None else None
+                ),
+                lambda: (
+                    self.data.local.ranking.get_rank(self.game, self.version, course_type, course_id, userid, location=loc_id)
+                    if loc_id is not None else None
+                ),
                 lambda: self.get_profile(userid) or Profile(self.game, self.version, "", 0)
             ])
 
-            # Grab a sorted list of all scores for this course and chart
-            global_uids_and_courses = sorted(
-                [(uid, ach) for (uid, ach) in uids_and_courses if ach.type == course_type and ach.id == course_id],
-                key=lambda uid_and_course: uid_and_course[1].data.get_int('score'),
-                reverse=True,
-            )
-            # Grab smaller lists that contain only sorted for our prefecture/location
-            pref_uids_and_courses = [(uid, ach) for (uid, ach) in global_uids_and_courses if ach.data.get_int('pref') == prefecture]
-            loc_uids_and_courses = [(uid, ach) for (uid, ach) in global_uids_and_courses if ach.data.get_int('lid') == loc_id]
-
-            def _get_rank(uac: List[Tuple[UserID, Achievement]]) -> Optional[int]:
-                for rank, (uid, _) in enumerate(uac):
-                    if uid == userid:
-                        return rank + 1
-                return None
-
-            for nodename, ranklist in [
-                ("all_ranking", global_uids_and_courses),
-                ("pref_ranking", pref_uids_and_courses),
-                ("location_ranking", loc_uids_and_courses),
+            for nodename, ranking in [
+                ("all_ranking", all_rank),
+                ("pref_ranking", pref_rank),
+                ("location_ranking", loc_rank),
             ]:
-                # Grab the rank, bail if we don't have any answer since the game doesn't
-                # require a response.
-                rank = _get_rank(ranklist)
-                if rank is None:
+                # Bail if we don't have any answer since the game doesn't require a response.
+                if ranking is None:
                     continue
+                rank, count = ranking
 
                 # Send back the data for this ranking.
                 node = Node.void(nodename)
@@ -468,7 +471,7 @@ class PopnMusicModernBase(PopnMusicBase, ABC):
                 node.add_child(Node.s32("total_score", new_course.get_int('score')))
                 node.add_child(Node.u8("clear_type", new_course.get_int('clear_type')))
                 node.add_child(Node.u8("clear_rank", new_course.get_int('clear_rank')))
-                node.add_child(Node.s16("player_count", len(ranklist)))
+                node.add_child(Node.s16("player_count", count))
                 node.add_child(Node.s16("player_rank", rank))
 
         return root
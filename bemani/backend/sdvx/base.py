@@ -1,5 +1,5 @@
 # vim: set fileencoding=utf-8
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from typing_extensions import Final
 
 from bemani.backend.base import Base
@@ -107,6 +107,19 @@ class SoundVoltexBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
         """
         return oldprofile
 
+    @classmethod
+    def clear_rate_stats(cls, data: ValidatedDict) -> Optional[Tuple[bool, bool]]:
+        """
+        Given the data saved with an attempt, return whether it counts as a clear
+        and whether it counts as a full combo, or None if the attempt should be left
+        out of clear rates entirely.
+        """
+        clear_type = data.get_int('clear_type', cls.CLEAR_TYPE_NO_PLAY)
+        return (
+            clear_type not in [cls.CLEAR_TYPE_NO_PLAY, cls.CLEAR_TYPE_FAILED],
+            clear_type in [cls.CLEAR_TYPE_ULTIMATE_CHAIN, cls.CLEAR_TYPE_PERFECT_ULTIMATE_CHAIN],
+        )
+
     def get_clear_rates(self) -> Dict[int, Dict[int, Dict[str, int]]]:
         """
         Returns a dictionary similar to the following:
@@ -121,8 +134,8 @@ class SoundVoltexBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
             },
         }
         """
-        all_attempts, remote_attempts = Parallel.execute([
-            lambda: self.data.local.music.get_all_attempts(
+        local_rates, remote_attempts = Parallel.execute([
+            lambda: self.data.local.music.get_clear_rates(
                 game=self.game,
                 version=self.version,
             ),
@@ -132,33 +145,16 @@ class SoundVoltexBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
             )
         ])
         attempts: Dict[int, Dict[int, Dict[str, int]]] = {}
-        for (_, attempt) in all_attempts:
-            # Terrible temporary structure is terrible.
-            if attempt.id not in attempts:
-                attempts[attempt.id] = {}
-            if attempt.chart not in attempts[attempt.id]:
-                attempts[attempt.id][attempt.chart] = {
-                    'total': 0,
-                    'clears': 0,
-                    'average': 0,
+        for musicid in local_rates:
+            attempts[musicid] = {}
+            for chart in local_rates[musicid]:
+                plays = local_rates[musicid][chart]['plays']
+                attempts[musicid][chart] = {
+                    'total': plays,
+                    'clears': local_rates[musicid][chart]['clears'],
+                    'average': (local_rates[musicid][chart]['points'] // plays) if plays > 0 else 0,
                 }
 
-            # We saw an attempt, keep the total attempts in sync.
-            attempts[attempt.id][attempt.chart]['average'] = int(
-                (
-                    (attempts[attempt.id][attempt.chart]['average'] * attempts[attempt.id][attempt.chart]['total']) +
-                    attempt.points
-                ) / (attempts[attempt.id][attempt.chart]['total'] + 1)
-            )
-            attempts[attempt.id][attempt.chart]['total'] += 1
-
-            if attempt.data.get_int('clear_type', self.CLEAR_TYPE_NO_PLAY) in [self.CLEAR_TYPE_NO_PLAY, self.CLEAR_TYPE_FAILED]:
-                # This attempt was a failure, so don't count it against clears of full combos
-                continue
-
-            # It was at least a clear
-            attempts[attempt.id][attempt.chart]['clears'] += 1
-
         # Merge in remote attempts
         for songid in remote_attempts:
             if songid not in attempts:
@@ -292,4 +288,5 @@ class SoundVoltexBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
             oldpoints,
             history,
             raised,
+            clear_stats=self.clear_rate_stats(history),
         )
@@ -1,9 +1,12 @@
+import concurrent.futures
 import json
 import requests
+import threading
+from collections import OrderedDict
 from typing import Tuple, Dict, List, Any, Optional
 from typing_extensions import Final
 
-from bemani.common import APIConstants, GameConstants, VersionConstants, DBConstants, ValidatedDict
+from bemani.common import APIConstants, GameConstants, VersionConstants, DBConstants, ValidatedDict, Time
 
 
 class APIException(Exception):
@@ -33,15 +36,104 @@ class RemoteServerErrorAPIException(APIException):
 class APIClient:
     """
     A client that fully speaks BEMAPI and can pull information from a remote server.
+
+    Remote servers are queried on live game paths, so a single slow or dead server
+    must not stall every request that fans out to it. Connections to each server are
+    kept alive between requests, callers only wait up to a deadline for a response,
+    servers that keep failing are skipped for a while, and catalogs, records and
+    profiles are cached so that they can be served while they are refreshed in the
+    background. All of this is shared by every client talking to the same server.
     """
 
     API_VERSION: Final[str] = 'v1'
 
-    def __init__(self, base_uri: str, token: str, allow_stats: bool, allow_scores: bool) -> None:
+    # How long a caller waits for a response, in seconds. The request itself carries on
+    # in the background up to the timeout below, so that a late answer is still cached.
+    REQUEST_DEADLINE: Final[float] = 3.0
+    REQUEST_TIMEOUT: Final[int] = 10
+    REQUEST_WORKERS: Final[int] = 32
+
+    # After this many failures in a row, a server is skipped for the reset time, in
+    # seconds, after which requests are let through again to see if it recovered.
+    CIRCUIT_FAILURE_THRESHOLD: Final[int] = 3
+    CIRCUIT_RESET_TIME: Final[int] = 30
+
+    # How long, in seconds, a response for each cacheable object is served as-is and
+    # how long it is served while being refreshed, as well as how many are kept.
+    CACHE_TIMES: Final[Dict[str, Tuple[int, int]]] = {
+        'catalog': (3600, 86400),
+        'records': (30, 600),
+        'profile': (60, 600),
+    }
+    CACHE_SIZE: Final[int] = 1024
+
+    __lock: threading.Lock = threading.Lock()
+    __executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    __sessions: Dict[str, requests.Session] = {}
+    __servers: Dict[str, Dict[str, int]] = {}
+    __cache: 'OrderedDict[str, Tuple[int, str]]' = OrderedDict()
+    __inflight: Dict[str, 'concurrent.futures.Future[str]'] = {}
+
+    def __init__(self, base_uri: str, token: str, allow_stats: bool, allow_scores: bool, deadline: float=REQUEST_DEADLINE) -> None:
         self.base_uri = base_uri
         self.token = token
         self.allow_stats = allow_stats
         self.allow_scores = allow_scores
+        self.deadline = deadline
+
+    @staticmethod
+    def client_stats() -> Dict[str, Dict[str, int]]:
+        """
+        Returns a snapshot of request, failure and cache counts for every remote server
+        talked to by this process, keyed by the server's base URI.
+        """
+        with APIClient.__lock:
+            return {uri: dict(stats) for uri, stats in APIClient.__servers.items()}
+
+    def __server(self) -> Dict[str, int]:
+        # Must be called with the lock held.
+        if self.base_uri not in APIClient.__servers:
+            APIClient.__servers[self.base_uri] = {
+                'requests': 0,
+                'failures': 0,
+                'consecutive_failures': 0,
+                'open_until': 0,
+                'short_circuited': 0,
+                'deadline_exceeded': 0,
+                'cache_hits': 0,
+                'stale_hits': 0,
+            }
+        return APIClient.__servers[self.base_uri]
+
+    def __count(self, stat: str) -> None:
+        with APIClient.__lock:
+            self.__server()[stat] += 1
+
+    def __record_result(self, success: bool) -> None:
+        with APIClient.__lock:
+            server = self.__server()
+            if success:
+                server['consecutive_failures'] = 0
+                server['open_until'] = 0
+            else:
+                server['failures'] += 1
+                server['consecutive_failures'] += 1
+                if server['consecutive_failures'] >= self.CIRCUIT_FAILURE_THRESHOLD:
+                    server['open_until'] = Time.now() + self.CIRCUIT_RESET_TIME
+
+    def __circuit_open(self) -> bool:
+        with APIClient.__lock:
+            server = self.__server()
+            if server['open_until'] > Time.now():
+                server['short_circuited'] += 1
+                return True
+            return False
+
+    def __session(self) -> requests.Session:
+        with APIClient.__lock:
+            if self.base_uri not in APIClient.__sessions:
+                APIClient.__sessions[self.base_uri] = requests.Session()
+            return APIClient.__sessions[self.base_uri]
 
     def _content_type_valid(self, content_type: str) -> bool:
         if ';' in content_type:
@@ -59,39 +151,45 @@ class APIClient:
                     return True
         return False
 
-    def __exchange_data(self, request_uri: str, request_args: Dict[str, Any]) -> Dict[str, Any]:
-        if self.base_uri[-1:] != '/':
-            uri = f'{self.base_uri}/{request_uri}'
-        else:
-            uri = f'{self.base_uri}{request_uri}'
-
+    def __fetch(self, uri: str, data: bytes, cachekey: Optional[str]) -> str:
         headers = {
             'Authorization': f'Token {self.token}',
             'Content-Type': 'application/json; charset=utf-8',
         }
-        data = json.dumps(request_args).encode('utf8')
 
+        self.__count('requests')
         try:
-            r = requests.request(
+            r = self.__session().request(
                 'GET',
                 uri,
                 headers=headers,
                 data=data,
                 allow_redirects=False,
-                timeout=10,
+                timeout=self.REQUEST_TIMEOUT,
             )
         except Exception:
+            self.__record_result(False)
             raise APIException('Failed to query remote server!')
 
         # Verify that content type is in the form of "application/json; charset=utf-8".
         if not self._content_type_valid(r.headers['content-type']):
+            self.__record_result(False)
             raise APIException(f'API returned invalid content type \'{r.headers["content-type"]}\'!')
 
-        jsondata = r.json()
+        # Only count server errors against the server, a server that tells us we aren't
+        # authorized or that it doesn't support a game is still up and healthy.
+        self.__record_result(r.status_code < 500)
 
         if r.status_code == 200:
-            return jsondata
+            if cachekey is not None:
+                with APIClient.__lock:
+                    APIClient.__cache[cachekey] = (Time.now(), r.text)
+                    APIClient.__cache.move_to_end(cachekey)
+                    while len(APIClient.__cache) > self.CACHE_SIZE:
+                        APIClient.__cache.popitem(last=False)
+            return r.text
 
+        jsondata = r.json()
         if 'error' not in jsondata:
             raise APIException(f'API returned error code {r.status_code} but did not include \'error\' attribute in response JSON!')
         error = jsondata['error']
@@ -108,6 +206,64 @@ class APIClient:
             raise UnsupportedVersionAPIException('The server does not support this version of the API!')
         raise APIException('The server returned an invalid status code {}!', format(r.status_code))
 
+    def __submit(self, uri: str, data: bytes, cachekey: Optional[str]) -> 'concurrent.futures.Future[str]':
+        def fetch() -> str:
+            try:
+                return self.__fetch(uri, data, cachekey)
+            finally:
+                if cachekey is not None:
+                    with APIClient.__lock:
+                        APIClient.__inflight.pop(cachekey, None)
+
+        with APIClient.__lock:
+            # Only ever have one request for the same thing in flight at once.
+            if cachekey is not None and cachekey in APIClient.__inflight:
+                return APIClient.__inflight[cachekey]
+            if APIClient.__executor is None:
+                APIClient.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.REQUEST_WORKERS)
+            future = APIClient.__executor.submit(fetch)
+            if cachekey is not None:
+                APIClient.__inflight[cachekey] = future
+            return future
+
+    def __exchange_data(self, request_uri: str, request_args: Dict[str, Any]) -> Dict[str, Any]:
+        if self.base_uri[-1:] != '/':
+            uri = f'{self.base_uri}/{request_uri}'
+        else:
+            uri = f'{self.base_uri}{request_uri}'
+        data = json.dumps(request_args).encode('utf8')
+
+        objects = request_args.get('objects', [])
+        cachetimes = self.CACHE_TIMES.get(objects[0]) if len(objects) == 1 else None
+        cachekey: Optional[str] = None
+        if cachetimes is not None:
+            cachekey = json.dumps([self.token, uri, request_args], sort_keys=True)
+            with APIClient.__lock:
+                entry = APIClient.__cache.get(cachekey)
+            if entry is not None:
+                fresh, stale = cachetimes
+                timestamp, text = entry
+                age = Time.now() - timestamp
+                if age < fresh:
+                    self.__count('cache_hits')
+                    return json.loads(text)
+                if age < stale:
+                    # Serve what we have, and refresh it in the background for next time.
+                    self.__count('stale_hits')
+                    if not self.__circuit_open():
+                        self.__submit(uri, data, cachekey)
+                    return json.loads(text)
+
+        if self.__circuit_open():
+            raise APIException('Remote server is failing, skipping it for now!')
+
+        try:
+            text = self.__submit(uri, data, cachekey).result(timeout=self.deadline)
+        except concurrent.futures.TimeoutError:
+            self.__count('deadline_exceeded')
+            raise APIException('Remote server did not respond in time!')
+        return json.loads(text)
+
     def __translate(self, game: GameConstants, version: int) -> Tuple[str, str]:
         servergame = {
             GameConstants.DDR: 'ddr',
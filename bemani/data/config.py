@@ -40,6 +40,18 @@ class Database:
     def read_only(self) -> bool:
         return bool(self.__config.get('database', {}).get('read_only', False))
 
+    @property
+    def pool_size(self) -> int:
+        return int(self.__config.get('database', {}).get('pool_size', 10))
+
+    @property
+    def max_overflow(self) -> int:
+        return int(self.__config.get('database', {}).get('max_overflow', 20))
+
+    @property
+    def pool_timeout(self) -> int:
+        return int(self.__config.get('database', {}).get('pool_timeout', 30))
+
 
 class Server:
     def __init__(self, parent_config: "Config") -> None:
@@ -79,6 +91,11 @@ class Server:
     def pcbid_self_grant_limit(self) -> int:
         return int(self.__config.get('server', {}).get('pcbid_self_grant_limit', 0))
 
+    @property
+    def compress_threshold(self) -> Optional[int]:
+        threshold = self.__config.get('server', {}).get('compress_threshold', 512)
+        return int(threshold) if threshold is not None else None
+
     @property
     def region(self) -> int:
         region = int(self.__config.get('server', {}).get('region', RegionConstants.USA))
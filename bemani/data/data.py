@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+from typing import Any, Dict, Union
 
 import alembic.config  # type: ignore
 from alembic.migration import MigrationContext  # type: ignore
@@ -8,7 +11,8 @@ from sqlalchemy.orm import scoped_session  # type: ignore
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.engine import Engine  # type: ignore
 from sqlalchemy.sql import text  # type: ignore
-from sqlalchemy.exc import ProgrammingError  # type: ignore
+from sqlalchemy.exc import ProgrammingError, TimeoutError  # type: ignore
+from sqlalchemy.pool import QueuePool  # type: ignore
 
 from bemani.data.api.user import GlobalUserData
 from bemani.data.api.game import GlobalGameData
@@ -21,6 +25,7 @@ from bemani.data.mysql.machine import MachineData
 from bemani.data.mysql.game import GameData
 from bemani.data.mysql.network import NetworkData
 from bemani.data.mysql.lobby import LobbyData
+from bemani.data.mysql.ranking import RankingData
 from bemani.data.mysql.api import APIData
 from bemani.data.triggers import Triggers
 
@@ -29,6 +34,46 @@ class DBCreateException(Exception):
     pass
 
 
+class _TimedQueuePool(QueuePool):  # type: ignore
+    """
+    A QueuePool which keeps track of how long callers waited to check out a connection,
+    so that a pool which is too small for bursts of traffic shows up in pool stats.
+
+    SQLAlchemy's pool events only fire once a connection has been handed out, so the
+    time spent blocked on a full pool can only be measured around _do_get() itself.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.__stats_lock = threading.Lock()
+        self.__stats: Dict[str, Union[int, float]] = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+        }
+
+    def _do_get(self) -> Any:
+        start = time.monotonic()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.monotonic() - start
+            with self.__stats_lock:
+                self.__stats['checkouts'] += 1
+                self.__stats['timeouts'] += 1 if timed_out else 0
+                self.__stats['wait_seconds'] += waited
+                self.__stats['max_wait_seconds'] = max(self.__stats['max_wait_seconds'], waited)
+
+    def wait_stats(self) -> Dict[str, Union[int, float]]:
+        with self.__stats_lock:
+            return dict(self.__stats)
+
+
 class LocalProvider:
     """
     A wrapper object for implementing local data operations only. Right
@@ -43,6 +88,7 @@ class LocalProvider:
         game: GameData,
         network: NetworkData,
         lobby: LobbyData,
+        ranking: RankingData,
         api: APIData,
     ) -> None:
         self.user = user
@@ -51,6 +97,7 @@ class LocalProvider:
         self.game = game
         self.network = network
         self.lobby = lobby
+        self.ranking = ranking
         self.api = api
 
 
@@ -108,6 +155,7 @@ class Data:
         self.__game = GameData(config, self.__session)
         self.__network = NetworkData(config, self.__session)
         self.__lobby = LobbyData(config, self.__session)
+        self.__ranking = RankingData(config, self.__session)
         self.__api = APIData(config, self.__session)
         self.local = LocalProvider(
             self.__user,
@@ -116,6 +164,7 @@ class Data:
             self.__game,
             self.__network,
             self.__lobby,
+            self.__ranking,
             self.__api,
         )
         self.remote = GlobalProvider(self.local)
@@ -129,9 +178,39 @@ class Data:
     def create_engine(cls, config: Config) -> Engine:
         return create_engine(
             Data.sqlalchemy_url(config),
+            poolclass=_TimedQueuePool,
+            pool_size=config.database.pool_size,
+            max_overflow=config.database.max_overflow,
+            pool_timeout=config.database.pool_timeout,
             pool_recycle=3600,
+            pool_pre_ping=True,
         )
 
+    @classmethod
+    def pool_stats(cls, config: Config) -> Dict[str, Union[int, float]]:
+        """
+        Return a snapshot of the connection pool for this process.
+
+        Parameters:
+            config - A config structure with an instantiated database engine.
+
+        Returns:
+            A dictionary keyed by stat name. 'size' is the configured pool size, 'checked_out'
+            and 'checked_in' count connections in use and idle, 'overflow' counts connections
+            open beyond the pool size, 'checkouts' and 'timeouts' count connection requests and
+            'wait_seconds' and 'max_wait_seconds' measure time spent waiting for a connection.
+        """
+        pool = config.database.engine.pool
+        stats: Dict[str, Union[int, float]] = {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+        }
+        if isinstance(pool, _TimedQueuePool):
+            stats.update(pool.wait_stats())
+        return stats
+
     def __exists(self) -> bool:
         # See if the DB was already created
         try:
@@ -206,6 +285,15 @@ class Data:
             'head',
         )
 
+    def release(self) -> None:
+        """
+        Hand back any connection that the current thread checked out to the pool, leaving
+        this object usable for later requests. Use this instead of close() when one Data
+        object is shared across many requests.
+        """
+        if self.__session is not None:
+            self.__session.remove()
+
     def close(self) -> None:
         """
         Close any open data connection.
@@ -2,6 +2,7 @@ from sqlalchemy import Table, Column, UniqueConstraint  # type: ignore
 from sqlalchemy.types import String, Integer, JSON  # type: ignore
 from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
 from typing import Any, Dict, List, Optional
+from typing_extensions import Final
 
 from bemani.common import GameConstants, ValidatedDict, Time
 from bemani.data.mysql.base import BaseData, metadata
@@ -74,6 +75,10 @@ time_sensitive_settings = Table(
 
 class GameData(BaseData):
 
+    # How many user IDs to put in a single IN clause when looking up settings in bulk,
+    # so that very large lists don't run into MySQL's packet size limit.
+    SETTINGS_CHUNK_SIZE: Final[int] = 500
+
     def get_settings(self, game: GameConstants, userid: UserID) -> Optional[ValidatedDict]:
         """
         Given a game and a user ID, look up game-wide settings as a dictionary.
@@ -100,6 +105,34 @@ class GameData(BaseData):
         result = cursor.fetchone()
         return ValidatedDict(self.deserialize(result['data']))
 
+    def get_all_settings(self, game: GameConstants, userids: List[UserID]) -> Dict[UserID, ValidatedDict]:
+        """
+        Given a game and a list of user IDs, look up game-wide settings for all of them at once.
+
+        Parameters:
+            game - Enum value identifying a game series.
+            userids - List of Integers identifying users, as possibly looked up by UserData.
+
+        Returns:
+            A dictionary keyed by user ID of settings stored by a game class. Users with no
+            settings for this game will not be present.
+        """
+        if not userids:
+            return {}
+        sql = "SELECT userid, data FROM game_settings WHERE game = :game AND userid IN :userids"
+        settings: Dict[UserID, ValidatedDict] = {}
+        for chunk in self.__chunk(userids):
+            cursor = self.execute(sql, {'game': game.value, 'userids': chunk})
+            for result in cursor.fetchall():
+                settings[UserID(result['userid'])] = ValidatedDict(self.deserialize(result['data']))
+        return settings
+
+    def __chunk(self, userids: List[UserID]) -> List[List[UserID]]:
+        """
+        Split a list of user IDs into lists no larger than SETTINGS_CHUNK_SIZE.
+        """
+        return [userids[i:(i + self.SETTINGS_CHUNK_SIZE)] for i in range(0, len(userids), self.SETTINGS_CHUNK_SIZE)]
+
     def put_settings(self, game: GameConstants, userid: UserID, settings: Dict[str, Any]) -> None:
         """
         Given a game and a user ID, save game-wide settings to the DB.
@@ -1,6 +1,9 @@
 from sqlalchemy import Table, Column, UniqueConstraint  # type: ignore
 from sqlalchemy.types import String, Integer, JSON  # type: ignore
 from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional, Dict, List, Tuple, Any
 from typing_extensions import Final
 
@@ -85,6 +88,96 @@ class MachineData(BaseData):
     # and thus will start at 1.
     DEFAULT_SETTINGS_ARCADE: Final[ArcadeID] = ArcadeID(-1)
 
+    # How many seconds a cached machine or arcade lookup is trusted for. Writes through
+    # this class invalidate the cache immediately, but writes made by other processes
+    # (such as the frontend) are only seen by services once the entry expires.
+    CACHE_TTL: Final[float] = 30.0
+
+    # How many lookups are kept. Unknown PCBIDs are cached too, so this keeps a stream
+    # of made-up IDs from growing the cache forever.
+    CACHE_SIZE: Final[int] = 4096
+
+    # Shared between all instances, since a new MachineData is created for every Data.
+    __cache_lock: threading.Lock = threading.Lock()
+    __cache: 'OrderedDict[Tuple[str, Any], Tuple[float, Any]]' = OrderedDict()
+    __cache_stats: Dict[str, int] = {
+        'hits': 0,
+        'misses': 0,
+        'invalidations': 0,
+    }
+
+    @staticmethod
+    def cache_stats() -> Dict[str, int]:
+        """
+        Return a snapshot of the process-wide machine/arcade cache counters.
+
+        Returns:
+            A dictionary with 'hits', 'misses', 'invalidations' and 'entries' counts.
+        """
+        with MachineData.__cache_lock:
+            stats = dict(MachineData.__cache_stats)
+            stats['entries'] = len(MachineData.__cache)
+            return stats
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """
+        Forget every cached machine and arcade lookup in this process.
+        """
+        with MachineData.__cache_lock:
+            MachineData.__cache_stats['invalidations'] += 1
+            MachineData.__cache.clear()
+
+    def __invalidate(self, kind: str, key: Any) -> None:
+        """
+        Forget a single cached lookup.
+
+        Parameters:
+            kind - Either 'machine' or 'arcade'.
+            key - The PCBID or arcade ID that was looked up.
+        """
+        with MachineData.__cache_lock:
+            MachineData.__cache_stats['invalidations'] += 1
+            MachineData.__cache.pop((kind, key), None)
+
+    def __cached(self, kind: str, key: Any) -> Tuple[bool, Any]:
+        """
+        Look up a cached lookup, counting the hit or miss.
+
+        Parameters:
+            kind - Either 'machine' or 'arcade'.
+            key - The PCBID or arcade ID being looked up.
+
+        Returns:
+            A tuple of whether a fresh entry was found, and the entry itself.
+        """
+        now = time.monotonic()
+        with MachineData.__cache_lock:
+            entry = MachineData.__cache.get((kind, key))
+            if entry is not None:
+                if entry[0] > now:
+                    MachineData.__cache_stats['hits'] += 1
+                    MachineData.__cache.move_to_end((kind, key))
+                    return True, entry[1]
+                del MachineData.__cache[(kind, key)]
+            MachineData.__cache_stats['misses'] += 1
+            return False, None
+
+    def __remember(self, kind: str, key: Any, value: Any) -> None:
+        """
+        Cache the result of a lookup until the TTL expires.
+
+        Parameters:
+            kind - Either 'machine' or 'arcade'.
+            key - The PCBID or arcade ID that was looked up.
+            value - The Machine or Arcade found, or None if it didn't exist.
+        """
+        with MachineData.__cache_lock:
+            MachineData.__cache[(kind, key)] = (time.monotonic() + MachineData.CACHE_TTL, value)
+            MachineData.__cache.move_to_end((kind, key))
+            while len(MachineData.__cache) > MachineData.CACHE_SIZE:
+                MachineData.__cache.popitem(last=False)
+
     def from_port(self, port: int) -> Optional[str]:
         """
         Given a port, look up the PCBID attached to that port.
@@ -183,6 +276,24 @@ class MachineData(BaseData):
             self.deserialize(result['data']),
         )
 
+    def get_machine_cached(self, pcbid: str) -> Optional[Machine]:
+        """
+        Given a PCBID, look up a machine, reusing a recent lookup if there was one. The
+        returned object is shared with other callers, so it must not be modified. Use
+        get_machine() instead when the machine is going to be updated.
+
+        Parameters:
+            pcbid - The PCBID as returned from a game.
+
+        Returns:
+            A Machine object representing a machine, or None if not found.
+        """
+        found, machine = self.__cached('machine', pcbid)
+        if not found:
+            machine = self.get_machine(pcbid)
+            self.__remember('machine', pcbid, machine)
+        return machine
+
     def get_all_machines(self, arcade: Optional[ArcadeID]=None) -> List[Machine]:
         """
         Look up all machines on the network.
@@ -236,6 +347,7 @@ class MachineData(BaseData):
                 'data': self.serialize(machine.data)
             },
         )
+        self.__invalidate('machine', machine.pcbid)
 
     def create_machine(self, pcbid: str, name: str='なし', description: str='', arcade: Optional[ArcadeID]=None) -> Machine:
         """
@@ -270,6 +382,7 @@ class MachineData(BaseData):
                 port = 10000
 
             # Add new machine
+            self.__invalidate('machine', pcbid)
             try:
                 sql = (
                     "INSERT INTO `machine` (pcbid, name, description, port, arcadeid) " +
@@ -293,6 +406,7 @@ class MachineData(BaseData):
         """
         sql = "DELETE FROM `machine` WHERE pcbid = :pcbid LIMIT 1"
         self.execute(sql, {'pcbid': pcbid})
+        self.__invalidate('machine', pcbid)
 
     def create_arcade(self, name: str, description: str, region: int, data: Dict[str, Any], owners: List[UserID]) -> Arcade:
         """
@@ -320,6 +434,7 @@ class MachineData(BaseData):
         for owner in owners:
             sql = "INSERT INTO arcade_owner (userid, arcadeid) VALUES(:userid, :arcadeid)"
             self.execute(sql, {'userid': owner, 'arcadeid': arcadeid})
+        self.__invalidate('arcade', arcadeid)
         new_arcade = self.get_arcade(arcadeid)
         if new_arcade is None:
             raise Exception("Failed to create an arcade!")
@@ -358,6 +473,24 @@ class MachineData(BaseData):
             [owner['userid'] for owner in cursor.fetchall()],
         )
 
+    def get_arcade_cached(self, arcadeid: ArcadeID) -> Optional[Arcade]:
+        """
+        Given an arcade ID, look up the arcade, reusing a recent lookup if there was one.
+        The returned object is shared with other callers, so it must not be modified. Use
+        get_arcade() instead when the arcade is going to be updated.
+
+        Parameters:
+            arcadeid - The integer arcade ID, most likely returned from a get_machine query.
+
+        Returns:
+            An Arcade object if this arcade was found, or None otherwise.
+        """
+        found, arcade = self.__cached('arcade', arcadeid)
+        if not found:
+            arcade = self.get_arcade(arcadeid)
+            self.__remember('arcade', arcadeid, arcade)
+        return arcade
+
     def put_arcade(self, arcade: Arcade) -> None:
         """
         Given an arcade, update the DB to match the new values
@@ -387,6 +520,7 @@ class MachineData(BaseData):
         for owner in arcade.owners:
             sql = "INSERT INTO arcade_owner (userid, arcadeid) VALUES(:userid, :arcadeid)"
             self.execute(sql, {'userid': owner, 'arcadeid': arcade.id})
+        self.__invalidate('arcade', arcade.id)
 
     def destroy_arcade(self, arcadeid: ArcadeID) -> None:
         """
@@ -403,6 +537,9 @@ class MachineData(BaseData):
         sql = "UPDATE `machine` SET arcadeid = NULL WHERE arcadeid = :arcadeid"
         self.execute(sql, {'arcadeid': arcadeid})
 
+        # Any number of machines just lost their arcade, so start over.
+        MachineData.invalidate_cache()
+
     def get_all_arcades(self) -> List[Arcade]:
         """
         List all known arcades in the system.
@@ -474,6 +611,7 @@ class MachineData(BaseData):
             "ON DUPLICATE KEY UPDATE data=VALUES(data)"
         )
         self.execute(sql, {'id': arcadeid, 'game': game.value, 'version': version, 'type': setting, 'data': self.serialize(data)})
+        self.__invalidate('arcade', arcadeid)
 
     def get_balances(self, arcadeid: ArcadeID) -> List[Tuple[UserID, int]]:
         """
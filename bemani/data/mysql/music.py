@@ -2,9 +2,9 @@ from sqlalchemy import Table, Column, UniqueConstraint  # type: ignore
 from sqlalchemy.exc import IntegrityError  # type: ignore
 from sqlalchemy.types import String, Integer, JSON  # type: ignore
 from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
-from typing import Optional, Dict, List, Tuple, Any
+from typing import Callable, Optional, Dict, List, Tuple, Any
 
-from bemani.common import GameConstants, Time
+from bemani.common import GameConstants, Time, ValidatedDict
 from bemani.data.exceptions import ScoreSaveException
 from bemani.data.mysql.base import BaseData, metadata
 from bemani.data.types import Score, Attempt, Song, UserID
@@ -79,6 +79,74 @@ music = Table(
     mysql_charset='utf8mb4',
 )
 
+"""
+Table for storing running totals of every attempt in score_history for a particular
+musicid, so that clear rates can be looked up without walking the entire history.
+This is maintained by put_attempt, and can be rebuilt from score_history using
+rebuild_clear_rates. Which attempts count as clears or full combos is decided by
+the game backend that saved the attempt.
+"""
+clear_rate = Table(
+    'clear_rate',
+    metadata,
+    Column('musicid', Integer, nullable=False, primary_key=True, autoincrement=False),
+    Column('plays', Integer, nullable=False),
+    Column('clears', Integer, nullable=False),
+    Column('combos', Integer, nullable=False),
+    Column('points', BigInteger, nullable=False),
+    mysql_charset='utf8mb4',
+)
+
+"""
+Table for storing which user holds the top score for a particular musicid, so that
+records can be looked up without ranking every score for every chart. This is kept
+up to date by put_score, and can be checked against the score table and repaired
+using rebuild_records. The points and timestamp are copied from the record score
+so that new scores can be compared against it using the same king-of-the-hill rules
+as get_all_records.
+"""
+record = Table(
+    'record',
+    metadata,
+    Column('musicid', Integer, nullable=False, primary_key=True, autoincrement=False),
+    Column('userid', BigInteger(unsigned=True), nullable=False),
+    Column('points', Integer, nullable=False),
+    Column('timestamp', Integer, nullable=False),
+    mysql_charset='utf8mb4',
+)
+
+"""
+Table for storing which user holds the top score for a particular musicid out of
+all scores earned at a particular location. This is maintained alongside the record
+table above.
+"""
+location_record = Table(
+    'location_record',
+    metadata,
+    Column('musicid', Integer, nullable=False),
+    Column('lid', Integer, nullable=False),
+    Column('userid', BigInteger(unsigned=True), nullable=False),
+    Column('points', Integer, nullable=False),
+    Column('timestamp', Integer, nullable=False),
+    UniqueConstraint('musicid', 'lid', name='musicid_lid'),
+    mysql_charset='utf8mb4',
+)
+
+"""
+Table for storing how many times a user has played a particular musicid, so that
+play counts can be joined against scores instead of counting score_history for
+every score. This is maintained by put_attempt.
+"""
+play_count = Table(
+    'play_count',
+    metadata,
+    Column('userid', BigInteger(unsigned=True), nullable=False),
+    Column('musicid', Integer, nullable=False),
+    Column('plays', Integer, nullable=False),
+    UniqueConstraint('userid', 'musicid', name='userid_musicid'),
+    mysql_charset='utf8mb4',
+)
+
 
 class MusicData(BaseData):
 
@@ -137,6 +205,15 @@ class MusicData(BaseData):
         musicid = self.__get_musicid(game, version, songid, songchart)
         ts = timestamp if timestamp is not None else Time.now()
 
+        # If this score moves to a new location, we need to know where it was before
+        # so that the old location's record can be handed to somebody else.
+        oldlocation: Optional[int] = None
+        if new_record:
+            sql = "SELECT lid FROM score WHERE userid = :userid AND musicid = :musicid"
+            cursor = self.execute(sql, {'userid': userid, 'musicid': musicid})
+            if cursor.rowcount == 1:
+                oldlocation = cursor.fetchone()['lid']
+
         # Add to user score
         if new_record:
             # We want to update the timestamp/location to now if its a new record.
@@ -166,6 +243,131 @@ class MusicData(BaseData):
             }
         )
 
+        # Now, see if this score took over any records.
+        self.__update_record(userid, musicid)
+        if oldlocation is not None and oldlocation != location:
+            self.__rebuild_location_record(musicid, oldlocation)
+
+    def __update_record(self, userid: UserID, musicid: int) -> None:
+        """
+        Given a user and a musicid whose score was just written, make that score the
+        record for the musicid and for its location if it beats the current one.
+
+        Parameters:
+            userid - Integer representing a user.
+            musicid - Internal music ID, as looked up by __get_musicid.
+        """
+        # MySQL applies these assignments in order, so the user and timestamp must be
+        # updated before the points that the comparison is made against. By the time
+        # points is compared, timestamp has already been taken from the new score if
+        # it won, which makes the second comparison agree with the first.
+        for table, lid in [('record', ''), ('location_record', 'lid, ')]:
+            beats = (
+                f"(VALUES(points) > {table}.points OR " +
+                f"(VALUES(points) = {table}.points AND VALUES(timestamp) >= {table}.timestamp))"
+            )
+            sql = (
+                f"INSERT INTO `{table}` (musicid, {lid}userid, points, timestamp) " +
+                f"SELECT musicid, {lid}userid, points, timestamp FROM score WHERE userid = :userid AND musicid = :musicid " +
+                f"ON DUPLICATE KEY UPDATE {table}.userid = IF({beats}, VALUES(userid), {table}.userid), " +
+                f"{table}.timestamp = IF({beats}, VALUES(timestamp), {table}.timestamp), " +
+                f"{table}.points = IF({beats}, VALUES(points), {table}.points)"
+            )
+            self.execute(sql, {'userid': userid, 'musicid': musicid})
+
+    def __rebuild_location_record(self, musicid: int, location: int) -> None:
+        """
+        Recompute the record for a musicid at a location from the score table. This is
+        needed when a score leaves a location, since it may have been that location's
+        record.
+
+        Parameters:
+            musicid - Internal music ID, as looked up by __get_musicid.
+            location - Machine ID that the record is for.
+        """
+        sql = "DELETE FROM `location_record` WHERE musicid = :musicid AND lid = :location"
+        self.execute(sql, {'musicid': musicid, 'location': location})
+        sql = (
+            "INSERT INTO `location_record` (musicid, lid, userid, points, timestamp) " +
+            "SELECT musicid, lid, userid, points, timestamp FROM score WHERE musicid = :musicid AND lid = :location " +
+            "ORDER BY points DESC, timestamp DESC LIMIT 1"
+        )
+        self.execute(sql, {'musicid': musicid, 'location': location})
+
+    def rebuild_records(self) -> Tuple[int, int]:
+        """
+        Check the record and location_record tables against the score table, and
+        repair any record that does not belong to the top score. This only needs to
+        be run if the score table was modified by hand.
+
+        Returns:
+            A tuple of how many records were checked and how many were repaired.
+        """
+        def beats(new: Tuple[int, int, int], old: Optional[Tuple[int, int, int]]) -> bool:
+            return old is None or (new[1], new[2]) >= (old[1], old[2])
+
+        # Rank every score the same way get_all_records used to do it.
+        expected: Dict[Tuple[int, Optional[int]], Tuple[int, int, int]] = {}
+        sql = "SELECT musicid, lid, userid, points, timestamp FROM score"
+        cursor = self.execute(sql)
+        for result in cursor.fetchall():
+            candidate = (result['userid'], result['points'], result['timestamp'])
+            for key in [(result['musicid'], None), (result['musicid'], result['lid'])]:
+                if beats(candidate, expected.get(key)):
+                    expected[key] = candidate
+
+        # Now, compare against what we have stored.
+        actual: Dict[Tuple[int, Optional[int]], Tuple[int, int, int]] = {}
+        sql = "SELECT musicid, userid, points, timestamp FROM record"
+        cursor = self.execute(sql)
+        for result in cursor.fetchall():
+            actual[(result['musicid'], None)] = (result['userid'], result['points'], result['timestamp'])
+        sql = "SELECT musicid, lid, userid, points, timestamp FROM location_record"
+        cursor = self.execute(sql)
+        for result in cursor.fetchall():
+            actual[(result['musicid'], result['lid'])] = (result['userid'], result['points'], result['timestamp'])
+
+        repaired = 0
+        for key in set(expected.keys()) | set(actual.keys()):
+            if key in expected and key in actual:
+                # Ties on both points and timestamp can go to either user.
+                if expected[key][1:] == actual[key][1:]:
+                    continue
+
+            repaired += 1
+            musicid, location = key
+            if location is None:
+                sql = "DELETE FROM `record` WHERE musicid = :musicid"
+            else:
+                sql = "DELETE FROM `location_record` WHERE musicid = :musicid AND lid = :location"
+            self.execute(sql, {'musicid': musicid, 'location': location})
+            if key not in expected:
+                continue
+
+            userid, points, timestamp = expected[key]
+            if location is None:
+                sql = (
+                    "INSERT INTO `record` (musicid, userid, points, timestamp) " +
+                    "VALUES (:musicid, :userid, :points, :timestamp)"
+                )
+            else:
+                sql = (
+                    "INSERT INTO `location_record` (musicid, lid, userid, points, timestamp) " +
+                    "VALUES (:musicid, :location, :userid, :points, :timestamp)"
+                )
+            self.execute(
+                sql,
+                {
+                    'musicid': musicid,
+                    'location': location,
+                    'userid': userid,
+                    'points': points,
+                    'timestamp': timestamp,
+                },
+            )
+
+        return (len(expected), repaired)
+
     def put_attempt(
         self,
         game: GameConstants,
@@ -178,6 +380,7 @@ class MusicData(BaseData):
         data: Dict[str, Any],
         new_record: bool,
         timestamp: Optional[int]=None,
+        clear_stats: Optional[Tuple[bool, bool]]=None,
     ) -> None:
         """
         Given a game/version/song/chart and user ID, save a single score attempt.
@@ -196,6 +399,9 @@ class MusicData(BaseData):
             data - Optional data that the game wishes to record along with the score.
             new_record - Whether this score was a new record or not.
             timestamp - Optional integer specifying when the attempt happened.
+            clear_stats - Optional tuple of whether this attempt was a clear and whether it
+                          was a full combo, used to keep clear rates up to date. If None,
+                          the attempt is left out of clear rates altogether.
         """
         # First look up the song/chart from the music DB
         musicid = self.__get_musicid(game, version, songid, songchart)
@@ -224,6 +430,135 @@ class MusicData(BaseData):
                 f'There is already an attempt by {userid if userid is not None else 0} for music id {musicid} at {ts}'
             )
 
+        if userid is not None:
+            sql = (
+                "INSERT INTO `play_count` (userid, musicid, plays) VALUES (:userid, :musicid, 1) " +
+                "ON DUPLICATE KEY UPDATE plays = plays + 1"
+            )
+            self.execute(sql, {'userid': userid, 'musicid': musicid})
+
+        if clear_stats is not None:
+            cleared, full_combo = clear_stats
+            self.__add_clear_rate(musicid, 1, 1 if cleared else 0, 1 if full_combo else 0, points)
+
+    def __add_clear_rate(self, musicid: int, plays: int, clears: int, combos: int, points: int) -> None:
+        """
+        Add to the running clear rate totals for a musicid.
+
+        Parameters:
+            musicid - Internal music ID, as looked up by __get_musicid.
+            plays - Number of attempts to add.
+            clears - Number of those attempts that were clears.
+            combos - Number of those attempts that were full combos.
+            points - Sum of the points of those attempts.
+        """
+        sql = (
+            "INSERT INTO `clear_rate` (musicid, plays, clears, combos, points) " +
+            "VALUES (:musicid, :plays, :clears, :combos, :points) " +
+            "ON DUPLICATE KEY UPDATE plays = plays + VALUES(plays), clears = clears + VALUES(clears), " +
+            "combos = combos + VALUES(combos), points = points + VALUES(points)"
+        )
+        self.execute(
+            sql,
+            {
+                'musicid': musicid,
+                'plays': plays,
+                'clears': clears,
+                'combos': combos,
+                'points': points,
+            },
+        )
+
+    def get_clear_rates(
+        self,
+        game: GameConstants,
+        version: int,
+        songid: Optional[int]=None,
+        songchart: Optional[int]=None,
+    ) -> Dict[int, Dict[int, Dict[str, int]]]:
+        """
+        Look up the running clear rate totals for every chart in a game version, or
+        optionally a single song or song/chart.
+
+        Parameters:
+            game - Enum value representing a game series.
+            version - Integer representing which version of the game.
+            songid - Optional ID of the song according to the game.
+            songchart - Optional chart number according to the game.
+
+        Returns:
+            A dictionary keyed by songid, whose values are dictionaries keyed by chart, whose
+            values are dictionaries with integer 'plays', 'clears', 'combos' and 'points'
+            totals. Charts that have never been played are not present.
+        """
+        sql = (
+            "SELECT music.songid AS songid, music.chart AS chart, clear_rate.plays AS plays, " +
+            "clear_rate.clears AS clears, clear_rate.combos AS combos, clear_rate.points AS points " +
+            "FROM clear_rate, music WHERE clear_rate.musicid = music.id " +
+            "AND music.game = :game AND music.version = :version"
+        )
+        if songid is not None:
+            sql = sql + " AND music.songid = :songid"
+        if songchart is not None:
+            sql = sql + " AND music.chart = :songchart"
+        cursor = self.execute(sql, {'game': game.value, 'version': version, 'songid': songid, 'songchart': songchart})
+
+        rates: Dict[int, Dict[int, Dict[str, int]]] = {}
+        for result in cursor.fetchall():
+            if result['songid'] not in rates:
+                rates[result['songid']] = {}
+            rates[result['songid']][result['chart']] = {
+                'plays': result['plays'],
+                'clears': result['clears'],
+                'combos': result['combos'],
+                'points': int(result['points']),
+            }
+        return rates
+
+    def rebuild_clear_rates(self, game: GameConstants, classify: Callable[[ValidatedDict], Optional[Tuple[bool, bool]]]) -> int:
+        """
+        Recompute the running clear rate totals for a game series from score_history.
+        This only needs to be run once to backfill attempts saved before clear rates were
+        tracked, or if the game backend changes what it considers a clear.
+
+        Parameters:
+            game - Enum value representing a game series.
+            classify - A function which, given the data saved with an attempt, returns the
+                       same clear_stats tuple that the game backend passes to put_attempt.
+
+        Returns:
+            The number of attempts that were counted.
+        """
+        sql = "SELECT DISTINCT(id) AS id FROM music WHERE game = :game"
+        cursor = self.execute(sql, {'game': game.value})
+        musicids = [result['id'] for result in cursor.fetchall()]
+        if not musicids:
+            return 0
+
+        totals: Dict[int, List[int]] = {}
+        counted = 0
+        sql = "SELECT musicid, points, data FROM score_history WHERE musicid IN :musicids"
+        cursor = self.execute(sql, {'musicids': musicids})
+        for result in cursor.fetchall():
+            clear_stats = classify(ValidatedDict(self.deserialize(result['data'])))
+            if clear_stats is None:
+                continue
+            cleared, full_combo = clear_stats
+            if result['musicid'] not in totals:
+                totals[result['musicid']] = [0, 0, 0, 0]
+            total = totals[result['musicid']]
+            total[0] += 1
+            total[1] += 1 if cleared else 0
+            total[2] += 1 if full_combo else 0
+            total[3] += result['points']
+            counted += 1
+
+        sql = "DELETE FROM `clear_rate` WHERE musicid IN :musicids"
+        self.execute(sql, {'musicids': musicids})
+        for musicid, (plays, clears, combos, points) in totals.items():
+            self.__add_clear_rate(musicid, plays, clears, combos, points)
+        return counted
+
     def get_score(self, game: GameConstants, version: int, userid: UserID, songid: int, songchart: int) -> Optional[Score]:
         """
         Look up a user's previous high score.
@@ -612,26 +947,15 @@ class MusicData(BaseData):
         Returns:
             A list of UserID, Score objects representing all high scores for a game.
         """
-        # First, construct the queries for grabbing the songid/chart
+        # First, construct the join for grabbing the songid/chart. Without a version, the
+        # song and chart come from the newest version of the game that has this music ID.
         if version is not None:
-            songidquery = (
-                'SELECT songid FROM music WHERE music.id = score.musicid AND game = :game AND version = :version'
-            )
-            chartquery = (
-                'SELECT chart FROM music WHERE music.id = score.musicid AND game = :game AND version = :version'
-            )
+            musicjoin = 'JOIN music ON music.id = score.musicid AND music.game = :game AND music.version = :version'
         else:
-            songidquery = (
-                'SELECT songid FROM music WHERE music.id = score.musicid AND game = :game ORDER BY version DESC LIMIT 1'
+            musicjoin = (
+                'JOIN (SELECT id, MAX(version) AS version FROM music WHERE game = :game GROUP BY id) AS latest ON latest.id = score.musicid '
+                'JOIN music ON music.id = latest.id AND music.game = :game AND music.version = latest.version'
             )
-            chartquery = (
-                'SELECT chart FROM music WHERE music.id = score.musicid AND game = :game ORDER BY version DESC LIMIT 1'
-            )
-
-        # Select statement for getting play count
-        playselect = (
-            'SELECT COUNT(timestamp) FROM score_history WHERE score_history.musicid = score.musicid AND score_history.userid = score.userid'
-        )
 
         # Now, construct the inner select statement so we can choose which scores we care about
         innerselect = (
@@ -644,15 +968,18 @@ class MusicData(BaseData):
         if songchart is not None:
             innerselect = innerselect + ' AND chart = :songchart'
 
-        # Finally, construct the full query
+        # Finally, construct the full query, with play counts coming from the maintained totals
         sql = (
-            "SELECT ({}) AS songid, ({}) AS chart, id AS scorekey, points, timestamp, `update`, lid, data, userid, ({}) AS plays "
-            "FROM score WHERE musicid IN ({})"
-        ).format(songidquery, chartquery, playselect, innerselect)
+            "SELECT music.songid AS songid, music.chart AS chart, score.id AS scorekey, score.points AS points, "
+            "score.timestamp AS timestamp, score.`update` AS `update`, score.lid AS lid, score.data AS data, "
+            "score.userid AS userid, COALESCE(play_count.plays, 0) AS plays FROM score {} "
+            "LEFT JOIN play_count ON play_count.userid = score.userid AND play_count.musicid = score.musicid "
+            "WHERE score.musicid IN ({})"
+        ).format(musicjoin, innerselect)
 
         # Now, limit the query
         if userid is not None:
-            sql = sql + ' AND userid = :userid'
+            sql = sql + ' AND score.userid = :userid'
         if since is not None:
             sql = sql + ' AND score.update >= :since'
         if until is not None:
@@ -730,14 +1057,42 @@ class MusicData(BaseData):
                 'SELECT chart FROM music WHERE music.id = score.musicid AND game = :game ORDER BY version DESC LIMIT 1'
             )
 
-        # Next, get a list of all songs that were played given the input criteria
-        musicid_sql = (
-            "SELECT DISTINCT(score.musicid) FROM score, music WHERE score.musicid = music.id AND music.game = :game"
-        )
         params: Dict[str, Any] = {'game': game.value}
         if version is not None:
-            musicid_sql = musicid_sql + ' AND music.version = :version'
+            version_sql = 'AND music.version = :version'
             params['version'] = version
+        else:
+            version_sql = ''
+
+        if userlist is None:
+            # We keep track of the top score per chart, both overall and per location, so
+            # we can look the records up directly instead of ranking every score.
+            if locationlist is not None:
+                if len(locationlist) == 0:
+                    # We don't have any locations, but SQL will shit the bed, so lets add a default one.
+                    locationlist.append(-1)
+                params['locationlist'] = tuple(locationlist)
+                records_sql = (
+                    "SELECT (" +
+                    "SELECT userid FROM location_record WHERE location_record.musicid = played.musicid " +
+                    "AND location_record.lid IN :locationlist ORDER BY points DESC, timestamp DESC LIMIT 1" +
+                    ") AS userid, musicid FROM (" +
+                    "SELECT DISTINCT(location_record.musicid) AS musicid FROM location_record, music " +
+                    "WHERE location_record.musicid = music.id AND music.game = :game " +
+                    f"{version_sql} AND location_record.lid IN :locationlist" +
+                    ") played"
+                )
+            else:
+                records_sql = (
+                    "SELECT record.userid AS userid, record.musicid AS musicid FROM record " +
+                    f"WHERE record.musicid IN (SELECT music.id FROM music WHERE music.game = :game {version_sql})"
+                )
+            return self.__get_records(songidquery, chartquery, records_sql, params)
+
+        # Next, get a list of all songs that were played given the input criteria
+        musicid_sql = (
+            f"SELECT DISTINCT(score.musicid) FROM score, music WHERE score.musicid = music.id AND music.game = :game {version_sql}"
+        )
 
         # Figure out where the record was earned
         if locationlist is not None:
@@ -750,16 +1105,19 @@ class MusicData(BaseData):
             location_sql = ""
 
         # Figure out who got the record
-        if userlist is not None:
-            if len(userlist) == 0:
-                # We don't have any users, but SQL will shit the bed, so lets add a fake one.
-                userlist.append(UserID(-1))
-            user_sql = f"SELECT userid FROM score WHERE score.musicid = played.musicid AND score.userid IN :userlist {location_sql} ORDER BY points DESC, timestamp DESC LIMIT 1"
-            params['userlist'] = tuple(userlist)
-        else:
-            user_sql = f"SELECT userid FROM score WHERE score.musicid = played.musicid {location_sql} ORDER BY points DESC, timestamp DESC LIMIT 1"
+        if len(userlist) == 0:
+            # We don't have any users, but SQL will shit the bed, so lets add a fake one.
+            userlist.append(UserID(-1))
+        user_sql = f"SELECT userid FROM score WHERE score.musicid = played.musicid AND score.userid IN :userlist {location_sql} ORDER BY points DESC, timestamp DESC LIMIT 1"
+        params['userlist'] = tuple(userlist)
         records_sql = f"SELECT ({user_sql}) AS userid, musicid FROM ({musicid_sql}) played"
+        return self.__get_records(songidquery, chartquery, records_sql, params)
 
+    def __get_records(self, songidquery: str, chartquery: str, records_sql: str, params: Dict[str, Any]) -> List[Tuple[UserID, Score]]:
+        """
+        Given queries for the songid and chart of a musicid, and a query returning the userid
+        and musicid of each record, look up the scores for those records.
+        """
         # Now, join it up against the score and music table to grab the info we need
         sql = (
             "SELECT ({}) AS songid, ({}) AS chart, score.points AS points, score.userid AS userid, score.id AS scorekey, score.data AS data, " +
@@ -844,6 +1202,7 @@ class MusicData(BaseData):
         timelimit: Optional[int]=None,
         limit: Optional[int]=None,
         offset: Optional[int]=None,
+        before: Optional[Tuple[int, int]]=None,
     ) -> List[Tuple[Optional[UserID], Attempt]]:
         """
         Look up all of the attempts to score for a particular game.
@@ -851,6 +1210,9 @@ class MusicData(BaseData):
         Parameters:
             game - Enum value representing a game series.
             version - Integer representing which version of the game.
+            before - Tuple of timestamp and key of the last attempt on the previous
+                     page. Only attempts older than this one are returned, so pages
+                     can be walked without an ever-growing offset.
 
         Returns:
             A list of UserID, Attempt objects representing all score attempts for a game, sorted newest to oldest attempts.
@@ -893,7 +1255,9 @@ class MusicData(BaseData):
             sql = sql + ' AND userid = :userid'
         if timelimit is not None:
             sql = sql + ' AND timestamp >= :timestamp'
-        sql = sql + ' ORDER BY timestamp DESC'
+        if before is not None:
+            sql = sql + ' AND (timestamp < :before_timestamp OR (timestamp = :before_timestamp AND id < :before_id))'
+        sql = sql + ' ORDER BY timestamp DESC, id DESC'
         if limit is not None:
             sql = sql + ' LIMIT :limit'
         if offset is not None:
@@ -909,6 +1273,8 @@ class MusicData(BaseData):
             'timestamp': timelimit,
             'limit': limit,
             'offset': offset,
+            'before_timestamp': before[0] if before is not None else None,
+            'before_id': before[1] if before is not None else None,
         })
 
         # Now objectify the attempts
@@ -1,7 +1,13 @@
-from sqlalchemy import Table, Column, UniqueConstraint  # type: ignore
+import atexit
+import queue
+import sys
+import threading
+import traceback
+from sqlalchemy import Table, Column, Index, UniqueConstraint  # type: ignore
 from sqlalchemy.types import String, Integer, Text, JSON  # type: ignore
 from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
 from typing import Optional, Dict, List, Tuple, Any
+from typing_extensions import Final
 
 from bemani.common import GameConstants, Time
 from bemani.data.mysql.base import BaseData, metadata
@@ -52,12 +58,109 @@ audit = Table(
     Column('arcadeid', Integer, index=True),
     Column('type', String(64), nullable=False, index=True),
     Column('data', JSON, nullable=False),
+    Index('userid_type', 'userid', 'type'),
+    Index('arcadeid_type', 'arcadeid', 'type'),
     mysql_charset='utf8mb4',
 )
 
 
 class NetworkData(BaseData):
 
+    # How many audit events can be waiting to be written before new ones get dropped,
+    # and how many get written with a single INSERT.
+    EVENT_QUEUE_SIZE: Final[int] = 10000
+    EVENT_BATCH_SIZE: Final[int] = 100
+
+    # How wide a range of audit IDs to delete at once when pruning old events.
+    EVENT_DELETE_BATCH_SIZE: Final[int] = 10000
+
+    # The buffer belongs to the instance that called buffer_events, whose connection
+    # the writer thread uses. Only the lock and the stats are shared by the process.
+    __event_queue: Optional["queue.Queue[Dict[str, Any]]"] = None
+    __event_lock: threading.Lock = threading.Lock()
+    __event_stats: Dict[str, int] = {
+        'queued': 0,
+        'written': 0,
+        'dropped': 0,
+        'failed': 0,
+    }
+
+    @staticmethod
+    def event_stats() -> Dict[str, int]:
+        """
+        Return a snapshot of the process-wide buffered audit event counters.
+
+        Returns:
+            A dictionary with 'queued', 'written', 'dropped' and 'failed' counts.
+        """
+        with NetworkData.__event_lock:
+            return dict(NetworkData.__event_stats)
+
+    def buffer_events(self) -> None:
+        """
+        Stop writing audit events on the thread that calls put_event, and instead hand
+        them to a background thread which writes them in batches. This is meant for
+        long-running servers where a flood of events shouldn't slow down requests. If
+        the buffer fills up, new events are dropped and counted instead of blocking.
+        Anything still buffered is written when the process exits, or when
+        flush_events is called.
+        """
+        with NetworkData.__event_lock:
+            if self.__event_queue is not None:
+                return
+            self.__event_queue = queue.Queue(self.EVENT_QUEUE_SIZE)
+
+        threading.Thread(target=self.__write_events, name='audit-events', daemon=True).start()
+        atexit.register(self.flush_events)
+
+    def flush_events(self) -> None:
+        """
+        Wait until every buffered audit event has been written. Does nothing if events
+        aren't buffered.
+        """
+        if self.__event_queue is not None:
+            self.__event_queue.join()
+
+    def __write_events(self) -> None:
+        """
+        Background thread which writes buffered audit events, batching together any
+        events that have piled up since the last write.
+        """
+        events = self.__event_queue
+        if events is None:
+            return
+
+        while True:
+            batch = [events.get()]
+            while len(batch) < self.EVENT_BATCH_SIZE:
+                try:
+                    batch.append(events.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                sql = "INSERT INTO audit (timestamp, userid, arcadeid, type, data) VALUES " + ", ".join(
+                    f"(:ts{i}, :uid{i}, :aid{i}, :type{i}, :data{i})" for i in range(len(batch))
+                )
+                params: Dict[str, Any] = {}
+                for i, event in enumerate(batch):
+                    for key, value in event.items():
+                        params[f'{key}{i}'] = value
+                self.execute(sql, params)
+                stat = 'written'
+            except Exception:
+                # Don't let a bad batch take down the writer, the count shows up in stats.
+                print(
+                    f"Failed to write {len(batch)} audit events starting with '{batch[0]['type']}'!\n{traceback.format_exc()}",
+                    file=sys.stderr,
+                )
+                stat = 'failed'
+
+            with NetworkData.__event_lock:
+                NetworkData.__event_stats[stat] += len(batch)
+            for _ in batch:
+                events.task_done()
+
     def get_all_news(self) -> List[News]:
         """
         Grab all news in the system.
@@ -242,8 +345,20 @@ class NetworkData(BaseData):
     ) -> None:
         if timestamp is None:
             timestamp = Time.now()
+        values = {'ts': timestamp, 'type': event, 'data': self.serialize(data), 'uid': userid, 'aid': arcadeid}
+
+        if self.__event_queue is not None:
+            try:
+                self.__event_queue.put_nowait(values)
+                stat = 'queued'
+            except queue.Full:
+                stat = 'dropped'
+            with NetworkData.__event_lock:
+                NetworkData.__event_stats[stat] += 1
+            return
+
         sql = "INSERT INTO audit (timestamp, userid, arcadeid, type, data) VALUES (:ts, :uid, :aid, :type, :data)"
-        self.execute(sql, {'ts': timestamp, 'type': event, 'data': self.serialize(data), 'uid': userid, 'aid': arcadeid})
+        self.execute(sql, values)
 
     def get_events(
         self,
@@ -299,10 +414,26 @@ class NetworkData(BaseData):
             )
         return events
 
-    def delete_events(self, oldest_event_ts: int) -> None:
+    def delete_events(self, oldest_event_ts: int) -> List[int]:
         """
         Given a timestamp of the oldset event we should keep around, delete
-        all events older than this timestamp.
+        all events older than this timestamp. Events are deleted a range of
+        IDs at a time, so that pruning a large log never locks the whole table
+        for the duration.
+
+        Returns:
+            A list of how many events were deleted by each batch.
         """
-        sql = "DELETE FROM audit WHERE timestamp < :ts"
-        self.execute(sql, {'ts': oldest_event_ts})
+        sql = "SELECT MIN(id) AS low, MAX(id) AS high FROM audit WHERE timestamp < :ts"
+        cursor = self.execute(sql, {'ts': oldest_event_ts})
+        result = cursor.fetchone()
+        if result['low'] is None:
+            # Nothing to prune
+            return []
+
+        deleted = []
+        sql = "DELETE FROM audit WHERE id >= :low AND id < :high AND timestamp < :ts"
+        for low in range(result['low'], result['high'] + 1, self.EVENT_DELETE_BATCH_SIZE):
+            cursor = self.execute(sql, {'low': low, 'high': low + self.EVENT_DELETE_BATCH_SIZE, 'ts': oldest_event_ts})
+            deleted.append(cursor.rowcount)
+        return deleted
@@ -0,0 +1,141 @@
+from sqlalchemy import Table, Column, Index, PrimaryKeyConstraint  # type: ignore
+from sqlalchemy.types import String, Integer  # type: ignore
+from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
+from typing import Optional, Dict, Tuple, Any
+
+from bemani.common import GameConstants, Time
+from bemani.data.mysql.base import BaseData, metadata
+from bemani.data.types import UserID
+
+"""
+Table for storing each player's best score on a ranked board, such as a course
+and chart combination, so that a rank can be found by counting the better scores
+in an index range instead of sorting every player's achievements on every request.
+Type namespaces boards the same way achievement types do, and id identifies the
+board within a type. Each player has one row per board, keyed on all of these.
+The prefecture and location that the score was last submitted from are kept so
+that boards can be narrowed down to a region or an arcade, and are stored as 0
+when a game doesn't send them.
+"""
+ranking = Table(
+    'ranking',
+    metadata,
+    Column('id', Integer, nullable=False),
+    Column('game', String(32), nullable=False),
+    Column('version', Integer, nullable=False),
+    Column('type', String(64), nullable=False),
+    Column('userid', BigInteger(unsigned=True), nullable=False),
+    Column('score', Integer, nullable=False),
+    Column('pref', Integer, nullable=False),
+    Column('lid', Integer, nullable=False),
+    Column('timestamp', Integer, nullable=False),
+    PrimaryKeyConstraint('game', 'version', 'type', 'id', 'userid', name='game_version_type_id_userid'),
+    Index('game_version_type_id_score', 'game', 'version', 'type', 'id', 'score'),
+    Index('game_version_type_id_pref_score', 'game', 'version', 'type', 'id', 'pref', 'score'),
+    Index('game_version_type_id_lid_score', 'game', 'version', 'type', 'id', 'lid', 'score'),
+    mysql_charset='utf8mb4',
+)
+
+
+class RankingData(BaseData):
+
+    def put_ranking(
+        self,
+        game: GameConstants,
+        version: int,
+        rankingtype: str,
+        rankingid: int,
+        userid: UserID,
+        score: int,
+        prefecture: Optional[int],
+        location: Optional[int],
+    ) -> None:
+        """
+        Given a game/version, a board and a user ID, save the user's score on that board.
+
+        Parameters:
+            game - Enum value identifying a game series.
+            version - Integer identifying the version of the game in the series.
+            rankingtype - The type of board, namespaced like an achievement type.
+            rankingid - Integer ID of the board within that type, as provided by a game.
+            userid - Integer identifying a user, as possibly looked up by UserData.
+            score - The score to rank this user by. Higher scores rank better.
+            prefecture - Integer prefecture that the score was submitted from, or None if unknown.
+            location - Machine ID that the score was submitted from, or None if unknown.
+        """
+        sql = (
+            "INSERT INTO ranking (game, version, type, id, userid, score, pref, lid, timestamp) " +
+            "VALUES (:game, :version, :type, :id, :userid, :score, :pref, :lid, :timestamp) " +
+            "ON DUPLICATE KEY UPDATE score = VALUES(score), pref = VALUES(pref), lid = VALUES(lid), timestamp = VALUES(timestamp)"
+        )
+        self.execute(
+            sql,
+            {
+                'game': game.value,
+                'version': version,
+                'type': rankingtype,
+                'id': rankingid,
+                'userid': userid,
+                'score': score,
+                'pref': prefecture or 0,
+                'lid': location or 0,
+                'timestamp': Time.now(),
+            },
+        )
+
+    def get_rank(
+        self,
+        game: GameConstants,
+        version: int,
+        rankingtype: str,
+        rankingid: int,
+        userid: UserID,
+        prefecture: Optional[int]=None,
+        location: Optional[int]=None,
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Given a game/version, a board and a user ID, look up where the user ranks on that board.
+        If a prefecture or location is given, only scores last submitted from there are ranked.
+        The rank is a COUNT(*) over the index range of better scores, so it takes time linear
+        in the number of players ahead of this user rather than in the size of the board.
+
+        Parameters:
+            game - Enum value identifying a game series.
+            version - Integer identifying the version of the game in the series.
+            rankingtype - The type of board, namespaced like an achievement type.
+            rankingid - Integer ID of the board within that type, as provided by a game.
+            userid - Integer identifying a user, as possibly looked up by UserData.
+            prefecture - Optional integer prefecture to limit the board to.
+            location - Optional machine ID to limit the board to.
+
+        Returns:
+            A tuple of the user's 1-based rank and the number of players on the board, or None
+            if the user has no score on the board. Players tied on score share a rank.
+        """
+        scope_sql = ""
+        params: Dict[str, Any] = {
+            'game': game.value,
+            'version': version,
+            'type': rankingtype,
+            'id': rankingid,
+            'userid': userid,
+        }
+        if prefecture is not None:
+            scope_sql += " AND pref = :pref"
+            params['pref'] = prefecture
+        if location is not None:
+            scope_sql += " AND lid = :lid"
+            params['lid'] = location
+
+        board_sql = f"SELECT COUNT(*) FROM ranking WHERE game = :game AND version = :version AND type = :type AND id = :id{scope_sql}"
+        sql = (
+            f"SELECT ({board_sql} AND score > mine.score) + 1 AS `rank`, ({board_sql}) AS count FROM ranking mine " +
+            f"WHERE game = :game AND version = :version AND type = :type AND id = :id AND userid = :userid{scope_sql}"
+        )
+        cursor = self.execute(sql, params)
+        if cursor.rowcount != 1:
+            # User isn't on this board
+            return None
+
+        result = cursor.fetchone()
+        return (result['rank'], result['count'])
@@ -168,6 +168,10 @@ class UserData(BaseData):
 
     REF_ID_LENGTH: Final[int] = 16
 
+    # How many user IDs to put in a single IN clause when looking up profiles in bulk,
+    # so that very large lists don't run into MySQL's packet size limit.
+    PROFILE_CHUNK_SIZE: Final[int] = 500
+
     def from_cardid(self, cardid: str) -> Optional[UserID]:
         """
         Given a 16 digit card ID, look up a user ID.
@@ -548,11 +552,15 @@ class UserData(BaseData):
         """
         if not userids:
             return []
-        sql = "SELECT version, userid FROM refid WHERE game = :game AND userid IN :userids AND refid IN (SELECT refid FROM profile)"
-        cursor = self.execute(sql, {'game': game.value, 'userids': userids})
         profilever: Dict[UserID, int] = {}
 
-        for result in cursor.fetchall():
+        sql = "SELECT version, userid FROM refid WHERE game = :game AND userid IN :userids AND refid IN (SELECT refid FROM profile)"
+        results: List[Dict[str, Any]] = []
+        for chunk in self.__chunk(userids):
+            cursor = self.execute(sql, {'game': game.value, 'userids': chunk})
+            results.extend(cursor.fetchall())
+
+        for result in results:
             tuid = UserID(result['userid'])
             tver = result['version']
 
@@ -569,13 +577,54 @@ class UserData(BaseData):
                 elif profilever[tuid] != version:
                     profilever[tuid] = max(profilever[tuid], tver)
 
-        result = []
-        for uid in userids:
-            if uid not in profilever:
-                result.append((uid, None))
-            else:
-                result.append((uid, self.get_profile(game, profilever[uid], uid)))
-        return result
+        profiles = self.get_profiles(game, list(profilever.items()))
+        return [(uid, profiles.get(uid)) for uid in userids]
+
+    def get_profiles(self, game: GameConstants, lookups: List[Tuple[UserID, int]]) -> Dict[UserID, Profile]:
+        """
+        Given a game and a list of userid/version pairs, look up the associated profiles in bulk.
+        This does the same thing as calling get_profile for each pair, but in as few queries as
+        possible.
+
+        Parameters:
+            game - Enum value identifier of the game looking up the users.
+            lookups - List of tuples of Integer user ID and Integer version to look up.
+
+        Returns:
+            A dictionary keyed by user ID of profiles that were found. Users with no profile for
+            the requested version will not be present.
+        """
+        versions: Dict[int, List[UserID]] = {}
+        for (userid, version) in lookups:
+            if version not in versions:
+                versions[version] = []
+            versions[version].append(userid)
+
+        sql = (
+            "SELECT refid.userid AS userid, refid.refid AS refid, extid.extid AS extid, profile.data AS data " +
+            "FROM refid, extid, profile " +
+            "WHERE refid.userid IN :userids AND refid.game = :game AND refid.version = :version AND "
+            "extid.userid = refid.userid AND extid.game = refid.game AND profile.refid = refid.refid"
+        )
+        profiles: Dict[UserID, Profile] = {}
+        for version, userids in versions.items():
+            for chunk in self.__chunk(userids):
+                cursor = self.execute(sql, {'userids': chunk, 'game': game.value, 'version': version})
+                for result in cursor.fetchall():
+                    profiles[UserID(result['userid'])] = Profile(
+                        game,
+                        version,
+                        result['refid'],
+                        result['extid'],
+                        self.deserialize(result['data']),
+                    )
+        return profiles
+
+    def __chunk(self, userids: List[UserID]) -> List[List[UserID]]:
+        """
+        Split a list of user IDs into lists no larger than PROFILE_CHUNK_SIZE.
+        """
+        return [userids[i:(i + self.PROFILE_CHUNK_SIZE)] for i in range(0, len(userids), self.PROFILE_CHUNK_SIZE)]
 
     def get_games_played(self, userid: UserID, game: Optional[GameConstants] = None) -> List[Tuple[GameConstants, int]]:
         """
@@ -1,12 +1,14 @@
 import io
 import os
 import struct
+from collections import OrderedDict
 from PIL import Image  # type: ignore
 from typing import Any, Dict, List, Optional, Tuple
+from typing_extensions import Final
 
-from bemani.format.dxt import DXTBuffer
+from bemani.format.texture import TextureFormat
 from bemani.protocol.binary import BinaryEncoding
-from bemani.protocol.lz77 import Lz77
+from bemani.protocol.lz77 import Lz77, Lz77Compress
 from bemani.protocol.node import Node
 
 from .swf import SWF
@@ -38,6 +40,12 @@ class PMAN:
 
 
 class Texture:
+    # Decoded texture sheets can be tens of megabytes each, so only keep the most
+    # recently used ones around. Shared between all files that are loaded at once.
+    IMAGE_CACHE_SIZE: Final[int] = 8
+
+    __image_cache: "OrderedDict[Texture, Any]" = OrderedDict()
+
     def __init__(
         self,
         name: str,
@@ -50,7 +58,8 @@ class Texture:
         fmtflags: int,
         rawdata: bytes,
         compressed: Optional[bytes],
-        imgdata: Any,
+        texfmt: Optional[str],
+        endian: str = "<",
     ) -> None:
         self.name = name
         self.width = width
@@ -62,7 +71,48 @@ class Texture:
         self.fmtflags = fmtflags
         self.raw = rawdata
         self.compressed = compressed
-        self.img = imgdata
+        self.texfmt = texfmt
+        self.endian = endian
+        self.__img: Any = None
+
+    @property
+    def supported(self) -> bool:
+        """
+        Whether this texture has an image, without decoding it if it hasn't been yet.
+        """
+        return self.__img is not None or self.texfmt is not None
+
+    @property
+    def img(self) -> Any:
+        """
+        The texture as a PIL image, or None if it is in an unsupported format. Textures
+        are only decoded from their raw data the first time they are looked at.
+        """
+        if self.__img is not None:
+            return self.__img
+        if self.texfmt is None:
+            return None
+
+        cache = Texture.__image_cache
+        img = cache.pop(self, None)
+        if img is None:
+            img = TextureFormat.decode(self.texfmt, self.width, self.height, self.raw, endian=self.endian)
+
+        # Re-insert so this texture is the most recently used, then evict the oldest.
+        cache[self] = img
+        while len(cache) > Texture.IMAGE_CACHE_SIZE:
+            try:
+                cache.popitem(last=False)
+            except KeyError:
+                break
+        return img
+
+    @img.setter
+    def img(self, img: Any) -> None:
+        # Images that were set or modified by the caller can't be regenerated from
+        # the raw data, so they are kept with the texture instead of in the cache.
+        Texture.__image_cache.pop(self, None)
+        self.__img = img
 
     def as_dict(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
         return {
@@ -140,6 +190,40 @@ class Unknown2:
 
 
 class TXP2File(TrackedCoverage, VerboseOutput):
+    # Since the AFP file format can be found in both big and little endian, its
+    # possible that some of these loaders might need byteswapping on some platforms.
+    # This has been tested on files intended for X86 (little endian).
+    TEXTURE_FORMATS: Final[Dict[int, str]] = {
+        # 16-bit 565 color RGB format. Game references D3D9 texture format 23 (R5G6B5).
+        0x0B: TextureFormat.RGB565,
+        # RGB image, no alpha. Game references D3D9 texture format 22 (R8G8B8).
+        0x0E: TextureFormat.RGB888,
+        # Seems to be some sort of RGB with color swapping. Game references D3D9 texture
+        # format 21 (A8R8B8G8) but does manual byteswapping.
+        # TODO: Not sure this is correct, need to find sample files.
+        0x10: TextureFormat.BGR888,
+        # Some 16-bit texture format. Game references D3D9 texture format 25 (A1R5G5B5).
+        0x13: TextureFormat.ARGB1555,
+        # RGBA format. Game references D3D9 texture format 21 (A8R8G8B8).
+        # Looks like unlike 0x20 below, the game does some endianness swapping.
+        # TODO: Not sure this is correct, need to find sample files.
+        0x15: TextureFormat.ARGB8888,
+        # DXT1 format. Game references D3D9 DXT1 texture format.
+        # Konami seems to have screwed up with DDR PS3 where they
+        # swap every other byte in the format, even though its specified
+        # as little-endian by all DXT1 documentation.
+        0x16: TextureFormat.DXT1,
+        # DXT5 format. Game references D3D9 DXT5 texture format.
+        # Konami seems to have screwed up with DDR PS3 where they
+        # swap every other byte in the format, even though its specified
+        # as little-endian by all DXT5 documentation.
+        0x1A: TextureFormat.DXT5,
+        # 16-bit 4-4-4-4 RGBA format. Game references D3D9 texture format 26 (A4R4G4B4).
+        0x1F: TextureFormat.ARGB4444,
+        # RGBA format. Game references D3D9 surface format 21 (A8R8G8B8).
+        0x20: TextureFormat.BGRA8888,
+    }
+
     def __init__(self, contents: bytes, verbose: bool = False) -> None:
         # Make sure our coverage engine is initialized.
         super().__init__()
@@ -472,150 +556,14 @@ class TXP2File(TrackedCoverage, VerboseOutput):
                         if self.endian == ">" and magic != b"TXDT":
                             raise Exception("Unexpected texture format!")
 
-                        # Since the AFP file format can be found in both big and little endian, its
-                        # possible that some of these loaders might need byteswapping on some platforms.
-                        # This has been tested on files intended for X86 (little endian).
-
-                        if fmt == 0x0B:
-                            # 16-bit 565 color RGB format. Game references D3D9 texture format 23 (R5G6B5).
-                            newdata = []
-                            for i in range(width * height):
-                                pixel = struct.unpack(
-                                    f"{self.endian}H",
-                                    raw_data[(64 + (i * 2)):(66 + (i * 2))],
-                                )[0]
-
-                                # Extract the raw values
-                                red = ((pixel >> 0) & 0x1F) << 3
-                                green = ((pixel >> 5) & 0x3F) << 2
-                                blue = ((pixel >> 11) & 0x1F) << 3
-
-                                # Scale the colors so they fill the entire 8 bit range.
-                                red = red | (red >> 5)
-                                green = green | (green >> 6)
-                                blue = blue | (blue >> 5)
-
-                                newdata.append(
-                                    struct.pack("<BBB", blue, green, red)
-                                )
-                            img = Image.frombytes(
-                                'RGB', (width, height), b''.join(newdata), 'raw', 'RGB',
-                            )
-                        elif fmt == 0x0E:
-                            # RGB image, no alpha. Game references D3D9 texture format 22 (R8G8B8).
-                            img = Image.frombytes(
-                                'RGB', (width, height), raw_data[64:], 'raw', 'RGB',
-                            )
-                        elif fmt == 0x10:
-                            # Seems to be some sort of RGB with color swapping. Game references D3D9 texture
-                            # format 21 (A8R8B8G8) but does manual byteswapping.
-                            # TODO: Not sure this is correct, need to find sample files.
-                            img = Image.frombytes(
-                                'RGB', (width, height), raw_data[64:], 'raw', 'BGR',
-                            )
-                        elif fmt == 0x13:
-                            # Some 16-bit texture format. Game references D3D9 texture format 25 (A1R5G5B5).
-                            newdata = []
-                            for i in range(width * height):
-                                pixel = struct.unpack(
-                                    f"{self.endian}H",
-                                    raw_data[(64 + (i * 2)):(66 + (i * 2))],
-                                )[0]
-
-                                # Extract the raw values
-                                alpha = 255 if ((pixel >> 15) & 0x1) != 0 else 0
-                                red = ((pixel >> 0) & 0x1F) << 3
-                                green = ((pixel >> 5) & 0x1F) << 3
-                                blue = ((pixel >> 10) & 0x1F) << 3
-
-                                # Scale the colors so they fill the entire 8 bit range.
-                                red = red | (red >> 5)
-                                green = green | (green >> 5)
-                                blue = blue | (blue >> 5)
-
-                                newdata.append(
-                                    struct.pack("<BBBB", blue, green, red, alpha)
-                                )
-                            img = Image.frombytes(
-                                'RGBA', (width, height), b''.join(newdata), 'raw', 'RGBA',
-                            )
-                        elif fmt == 0x15:
-                            # RGBA format. Game references D3D9 texture format 21 (A8R8G8B8).
-                            # Looks like unlike 0x20 below, the game does some endianness swapping.
-                            # TODO: Not sure this is correct, need to find sample files.
-                            img = Image.frombytes(
-                                'RGBA', (width, height), raw_data[64:], 'raw', 'ARGB',
-                            )
-                        elif fmt == 0x16:
-                            # DXT1 format. Game references D3D9 DXT1 texture format.
-                            # Konami seems to have screwed up with DDR PS3 where they
-                            # swap every other byte in the format, even though its specified
-                            # as little-endian by all DXT1 documentation.
-                            dxt = DXTBuffer(width, height)
-                            img = Image.frombuffer(
-                                'RGBA',
-                                (width, height),
-                                dxt.DXT1Decompress(raw_data[64:], swap=self.endian != "<"),
-                                'raw',
-                                'RGBA',
-                                0,
-                                1,
-                            )
-                        elif fmt == 0x1A:
-                            # DXT5 format. Game references D3D9 DXT5 texture format.
-                            # Konami seems to have screwed up with DDR PS3 where they
-                            # swap every other byte in the format, even though its specified
-                            # as little-endian by all DXT5 documentation.
-                            dxt = DXTBuffer(width, height)
-                            img = Image.frombuffer(
-                                'RGBA',
-                                (width, height),
-                                dxt.DXT5Decompress(raw_data[64:], swap=self.endian != "<"),
-                                'raw',
-                                'RGBA',
-                                0,
-                                1,
-                            )
-                        elif fmt == 0x1E:
-                            # I have no idea what format this is. The game does some byte
+                        # Textures aren't decoded until somebody looks at them, since most
+                        # users of this class only care about the metadata.
+                        texfmt = self.TEXTURE_FORMATS.get(fmt)
+                        if texfmt is None and fmt != 0x1E:
+                            # I have no idea what format 0x1E is. The game does some byte
                             # swapping but doesn't actually call any texture create calls.
                             # This might be leftover from another game.
-                            pass
-                        elif fmt == 0x1F:
-                            # 16-bit 4-4-4-4 RGBA format. Game references D3D9 texture format 26 (A4R4G4B4).
-                            newdata = []
-                            for i in range(width * height):
-                                pixel = struct.unpack(
-                                    f"{self.endian}H",
-                                    raw_data[(64 + (i * 2)):(66 + (i * 2))],
-                                )[0]
-
-                                # Extract the raw values
-                                blue = ((pixel >> 0) & 0xF) << 4
-                                green = ((pixel >> 4) & 0xF) << 4
-                                red = ((pixel >> 8) & 0xF) << 4
-                                alpha = ((pixel >> 12) & 0xF) << 4
-
-                                # Scale the colors so they fill the entire 8 bit range.
-                                red = red | (red >> 4)
-                                green = green | (green >> 4)
-                                blue = blue | (blue >> 4)
-                                alpha = alpha | (alpha >> 4)
-
-                                newdata.append(
-                                    struct.pack("<BBBB", red, green, blue, alpha)
-                                )
-                            img = Image.frombytes(
-                                'RGBA', (width, height), b''.join(newdata), 'raw', 'RGBA',
-                            )
-                        elif fmt == 0x20:
-                            # RGBA format. Game references D3D9 surface format 21 (A8R8G8B8).
-                            img = Image.frombytes(
-                                'RGBA', (width, height), raw_data[64:], 'raw', 'BGRA',
-                            )
-                        else:
                             self.vprint(f"Unsupported format {hex(fmt)} for texture {name}")
-                            img = None
 
                         self.textures.append(
                             Texture(
@@ -629,7 +577,8 @@ class TXP2File(TrackedCoverage, VerboseOutput):
                                 fmtflags & 0xFFFFFF00,
                                 raw_data[64:],
                                 lz_data,
-                                img,
+                                texfmt,
+                                self.endian,
                             )
                         )
         else:
@@ -1190,9 +1139,10 @@ class TXP2File(TrackedCoverage, VerboseOutput):
                         # We didn't change this texture, use the original compression.
                         compressed_texture = texture.compressed
                     else:
-                        # We need to compress the raw texture.
+                        # We need to compress the raw texture. This is an offline
+                        # repack, so spend the extra time getting a smaller file.
                         lz77 = Lz77()
-                        compressed_texture = lz77.compress(raw_texture)
+                        compressed_texture = lz77.compress(raw_texture, level=Lz77Compress.LEVEL_BEST)
 
                     # Construct the mini-header and the texture itself.
                     name_to_length[texture.name] = len(compressed_texture) + 8
@@ -1569,7 +1519,9 @@ class TXP2File(TrackedCoverage, VerboseOutput):
         # Now, copy the data over and update the raw texture.
         for tex in self.textures:
             if tex.name == texture:
-                tex.img.paste(sprite_img, (region.left // 2, region.top // 2))
+                img = tex.img
+                img.paste(sprite_img, (region.left // 2, region.top // 2))
+                tex.img = img
 
                 # Now, refresh the texture so when we save the file its updated.
                 self._refresh_texture(tex)
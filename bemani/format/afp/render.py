@@ -1,4 +1,4 @@
-from typing import Any, Dict, Generator, List, Set, Tuple, Optional, Union
+from typing import Any, Callable, Dict, Generator, List, Set, Tuple, Optional, Union
 from PIL import Image  # type: ignore
 
 from .blend import affine_composite, perspective_composite
@@ -543,6 +543,7 @@ class AFPRenderer(VerboseOutput):
         # Library of shapes (draw instructions), textures (actual images) and swfs (us and other files for imports).
         self.shapes: Dict[str, Shape] = shapes
         self.textures: Dict[str, Image.Image] = textures
+        self.__texture_loaders: Dict[str, Callable[[], Image.Image]] = {}
         self.swfs: Dict[str, SWF] = swfs
 
         # Internal render parameters.
@@ -564,8 +565,24 @@ class AFPRenderer(VerboseOutput):
 
     def add_texture(self, name: str, data: Image.Image) -> None:
         # Register a named texture (already loaded PIL image) with the renderer.
+        self.__texture_loaders.pop(name, None)
         self.textures[name] = data.convert("RGBA")
 
+    def add_texture_loader(self, name: str, loader: Callable[[], Image.Image]) -> None:
+        # Register a named texture that is only loaded the first time it is drawn, so that
+        # sprites that an animation never uses are never decoded or cropped.
+        self.textures.pop(name, None)
+        self.__texture_loaders[name] = loader
+
+    def __has_texture(self, name: str) -> bool:
+        return name in self.textures or name in self.__texture_loaders
+
+    def __get_texture(self, name: str) -> Image.Image:
+        loader = self.__texture_loaders.pop(name, None)
+        if loader is not None:
+            self.textures[name] = loader().convert("RGBA")
+        return self.textures[name]
+
     def add_swf(self, name: str, data: SWF) -> None:
         # Register a named SWF with the renderer.
         if not data.parsed:
@@ -807,7 +824,7 @@ class AFPRenderer(VerboseOutput):
         elif isinstance(tag, AP2ImageTag):
             self.vprint(f"{prefix}    Loading {tag.reference} into object slot {tag.id}", component="tags")
 
-            if tag.reference not in self.textures:
+            if not self.__has_texture(tag.reference):
                 raise Exception(f"Cannot find texture reference {tag.reference}!")
 
             self.__registered_objects[tag.id] = RegisteredImage(
@@ -1254,9 +1271,9 @@ class AFPRenderer(VerboseOutput):
                 rectangle = False
                 if params.flags & 0x2:
                     # We need to look up the texture for this.
-                    if params.region not in self.textures:
+                    if not self.__has_texture(params.region):
                         raise Exception(f"Cannot find texture reference {params.region}!")
-                    texture = self.textures[params.region]
+                    texture = self.__get_texture(params.region)
 
                     if params.flags & 0x8:
                         # TODO: This texture gets further blended somehow? Not sure this is ever used.
@@ -1358,7 +1375,7 @@ class AFPRenderer(VerboseOutput):
                 return img
 
             # This is a shape draw reference.
-            texture = self.textures[renderable.source.reference]
+            texture = self.__get_texture(renderable.source.reference)
             if projection == AP2PlaceObjectTag.PROJECTION_AFFINE:
                 img = affine_composite(
                     img,
@@ -1579,7 +1596,7 @@ class AFPRenderer(VerboseOutput):
                 elif isinstance(tag, AP2ImageTag):
                     if tag.id == tag_id:
                         # We need to be able to see this shape to place it.
-                        if tag.reference not in self.textures:
+                        if not self.__has_texture(tag.reference):
                             raise Exception(f"Cannot find texture reference {tag.reference}!")
 
                         # This matched, so this is the import.
@@ -7,10 +7,28 @@ and take in bytes instead of file pointers. Inspired by Benjamin Dobell.
 Original C++ code https://github.com/Benjamin-Dobell/s3tc-dxt-decompression
 """
 
-import io
+import ctypes
+import os
 import struct
 
-from typing import List, Optional, Tuple
+from typing import Dict, List, Tuple
+
+from .. import package_root
+
+
+# Attempt to use the faster C++ libraries if they're available
+try:
+    clib = None
+    clib_path = os.path.join(package_root, "format")
+    files = [f for f in os.listdir(clib_path) if f.startswith("dxtcpp") and f.endswith(".so")]
+    if len(files) > 0:
+        clib = ctypes.cdll.LoadLibrary(os.path.join(clib_path, files[0]))
+        clib.dxt1_decompress.argtypes = (ctypes.c_char_p, ctypes.c_uint, ctypes.c_uint, ctypes.c_uint, ctypes.c_int, ctypes.c_char_p)
+        clib.dxt1_decompress.restype = ctypes.c_int
+        clib.dxt5_decompress.argtypes = (ctypes.c_char_p, ctypes.c_uint, ctypes.c_uint, ctypes.c_uint, ctypes.c_int, ctypes.c_char_p)
+        clib.dxt5_decompress.restype = ctypes.c_int
+except Exception:
+    clib = None
 
 
 class DXTBuffer:
@@ -21,8 +39,6 @@ class DXTBuffer:
         self.block_countx = self.width // 4
         self.block_county = self.height // 4
 
-        self.decompressed_buffer: List[Optional[bytes]] = [None] * ((width * height) * 2)
-
     def unpackRGB(self, packed: int) -> Tuple[int, int, int]:
         # This function converts RGB565 format to raw pixels
         R = (packed >> 11) & 0x1F
@@ -37,116 +53,137 @@ class DXTBuffer:
 
     def swapbytes(self, data: bytes, swap: bool) -> bytes:
         if swap:
-            return b"".join([
-                data[(x + 1):(x + 2)] + data[x:(x + 1)]
-                for x in range(0, len(data), 2)
-            ])
+            swapped = bytearray(data)
+            even = len(data) & ~1
+            swapped[0:even:2] = data[1:even:2]
+            swapped[1:even:2] = data[0:even:2]
+            return bytes(swapped)
         return data
 
-    def DXT5Decompress(self, filedata: bytes, swap: bool = False) -> bytes:
-        # Loop through each block and decompress it
-        file = io.BytesIO(filedata)
-        for row in range(self.block_county):
-            for col in range(self.block_countx):
-                # Get the alpha values, and color lookup table
-                a0, a1, acode0, acode1, c0, c1, ctable = struct.unpack("<BBHIHHI", self.swapbytes(file.read(16), swap))
-
-                # The 4x4 Lookup table loop
-                for j in range(4):
-                    for i in range(4):
-                        self.getColors(
-                            col * 4,
-                            row * 4,
-                            i,
-                            j,
-                            ctable,
-                            c0,
-                            c1,
-                            self.getAlpha(i, j, a0, a1, (acode1 << 16) | acode0),
-                        )  # Set the color for the current pixel
-
-        return b''.join([x for x in self.decompressed_buffer if x is not None])
-
-    def DXT1Decompress(self, filedata: bytes, swap: bool = False) -> bytes:
-        # Loop through each block and decompress it
-        file = io.BytesIO(filedata)
-        for row in range(self.block_county):
-            for col in range(self.block_countx):
-
-                # Color 1 color 2, color look up table
-                c0, c1, ctable = struct.unpack("<HHI", self.swapbytes(file.read(8), swap))
-
-                # The 4x4 Lookup table loop
-                for j in range(4):
-                    for i in range(4):
-                        self.getColors(
-                            col * 4,
-                            row * 4,
-                            i,
-                            j,
-                            ctable,
-                            c0,
-                            c1,
-                            255,
-                        )  # Set the color for the current pixel
-
-        return b''.join([x for x in self.decompressed_buffer if x is not None])
-
-    def getColors(
-        self,
-        x: int,
-        y: int,
-        i: int,
-        j: int,
-        ctable: int,
-        c0: int,
-        c1: int,
-        alpha: int,
-    ) -> None:
-        code = (ctable >> (2 * ((4 * j) + i))) & 0x03  # Get the color of the current pixel
-        pixel_color = None
+    def __blocks(self, filedata: bytes, blocksize: int, swap: bool) -> bytes:
+        # Every block is a whole number of 16-bit words, so swapping the entire
+        # image at once is the same as swapping each block as we read it.
+        length = self.block_countx * self.block_county * blocksize
+        if len(filedata) < length:
+            raise Exception(f"Not enough data for {self.width}x{self.height} texture!")
+        return self.swapbytes(filedata[:length], swap)
 
+    def __colors(self, c0: int, c1: int) -> List[Tuple[int, int, int]]:
         r0, g0, b0 = self.unpackRGB(c0)
         r1, g1, b1 = self.unpackRGB(c1)
 
         # Sliding scale between colors.
-        if code == 0:
-            pixel_color = (r0, g0, b0, alpha)
-        if code == 1:
-            pixel_color = (r1, g1, b1, alpha)
-        if code == 2:
-            if c0 > c1:
-                pixel_color = ((2 * r0 + r1) // 3, (2 * g0 + g1) // 3, (2 * b0 + b1) // 3, alpha)
-            else:
-                pixel_color = ((r0 + r1) // 2, (g0 + g1) // 2, (b0 + b1) // 2, alpha)
-        if code == 3:
-            if c0 > c1:
-                pixel_color = ((r0 + 2 * r1) // 3, (g0 + 2 * g1) // 3, (b0 + 2 * b1) // 3, alpha)
-            else:
-                pixel_color = (0, 0, 0, alpha)
-
-        # While not surpassing the image dimensions, assign pixels the colors.
-        if pixel_color is not None and (x + i) < self.width and (y + j) < self.height:
-            self.decompressed_buffer[(y + j) * self.width + (x + i)] = (
-                struct.pack('<BBBB', *pixel_color)
-            )
-
-    def getAlpha(self, i: int, j: int, a0: int, a1: int, acode: int) -> int:
+        if c0 > c1:
+            return [
+                (r0, g0, b0),
+                (r1, g1, b1),
+                ((2 * r0 + r1) // 3, (2 * g0 + g1) // 3, (2 * b0 + b1) // 3),
+                ((r0 + 2 * r1) // 3, (g0 + 2 * g1) // 3, (b0 + 2 * b1) // 3),
+            ]
+        else:
+            return [
+                (r0, g0, b0),
+                (r1, g1, b1),
+                ((r0 + r1) // 2, (g0 + g1) // 2, (b0 + b1) // 2),
+                (0, 0, 0),
+            ]
+
+    def __alphas(self, a0: int, a1: int) -> List[int]:
         # Using the same method as the colors calculate the alpha values
-        alpha_code = (acode >> (3 * ((4 * j) + i))) & 0x07
-
-        if alpha_code == 0:
-            alpha = a0
-        elif alpha_code == 1:
-            alpha = a1
+        if a0 > a1:
+            return [a0, a1, *[((8 - code) * a0 + (code - 1) * a1) // 7 for code in range(2, 8)]]
         else:
-            if a0 > a1:
-                alpha = ((8 - alpha_code) * a0 + (alpha_code - 1) * a1) // 7
-            else:
-                if alpha_code == 6:
-                    alpha = 0
-                elif alpha_code == 7:
-                    alpha = 255
-                else:
-                    alpha = ((6 - alpha_code) * a0 + (alpha_code - 1) * a1) // 5
-        return alpha
+            return [a0, a1, *[((6 - code) * a0 + (code - 1) * a1) // 5 for code in range(2, 6)], 0, 255]
+
+    def __decompress_dxt1(self, blocks: bytes) -> bytes:
+        # Decode block by block straight into one RGBA buffer covering every whole block.
+        stride = self.block_countx * 4 * 4
+        output = bytearray(stride * self.block_county * 4)
+
+        # Textures tend to reuse the same handful of endpoints, so cache palettes.
+        palettes: Dict[Tuple[int, int], List[bytes]] = {}
+
+        for index, (c0, c1, ctable) in enumerate(struct.iter_unpack("<HHI", blocks)):
+            row, col = divmod(index, self.block_countx)
+            offset = (row * 4 * stride) + (col * 4 * 4)
+
+            pixels = palettes.get((c0, c1))
+            if pixels is None:
+                pixels = [bytes((*color, 255)) for color in self.__colors(c0, c1)]
+                palettes[(c0, c1)] = pixels
+
+            for _ in range(4):
+                output[offset:(offset + 16)] = (
+                    pixels[ctable & 3] +
+                    pixels[(ctable >> 2) & 3] +
+                    pixels[(ctable >> 4) & 3] +
+                    pixels[(ctable >> 6) & 3]
+                )
+                ctable >>= 8
+                offset += stride
+
+        return bytes(output)
+
+    def __decompress_dxt5(self, blocks: bytes) -> bytes:
+        # Decode block by block straight into one RGBA buffer covering every whole block.
+        stride = self.block_countx * 4 * 4
+        output = bytearray(stride * self.block_county * 4)
+
+        # Textures tend to reuse the same handful of endpoints, so cache palettes.
+        palettes: Dict[Tuple[int, int], List[Tuple[int, int, int]]] = {}
+        alphatables: Dict[Tuple[int, int], List[int]] = {}
+
+        for index, (a0, a1, acode0, acode1, c0, c1, ctable) in enumerate(struct.iter_unpack("<BBHIHHI", blocks)):
+            row, col = divmod(index, self.block_countx)
+            offset = (row * 4 * stride) + (col * 4 * 4)
+
+            colors = palettes.get((c0, c1))
+            if colors is None:
+                colors = self.__colors(c0, c1)
+                palettes[(c0, c1)] = colors
+            alphas = alphatables.get((a0, a1))
+            if alphas is None:
+                alphas = self.__alphas(a0, a1)
+                alphatables[(a0, a1)] = alphas
+            acode = (acode1 << 16) | acode0
+
+            for _ in range(4):
+                output[offset:(offset + 16)] = bytes((
+                    *colors[ctable & 3], alphas[acode & 7],
+                    *colors[(ctable >> 2) & 3], alphas[(acode >> 3) & 7],
+                    *colors[(ctable >> 4) & 3], alphas[(acode >> 6) & 7],
+                    *colors[(ctable >> 6) & 3], alphas[(acode >> 9) & 7],
+                ))
+                ctable >>= 8
+                acode >>= 12
+                offset += stride
+
+        return bytes(output)
+
+    def DXT5Decompress(self, filedata: bytes, swap: bool = False) -> bytes:
+        """
+        Decompress DXT5 blocks to RGBA pixels. Only whole blocks are decoded, so
+        the output covers the largest multiple of 4 in each dimension.
+        """
+        if clib is not None:
+            length = self.block_countx * self.block_county * 16
+            outbuf = ctypes.create_string_buffer(length * 4)
+            if clib.dxt5_decompress(filedata, len(filedata), self.block_countx, self.block_county, 1 if swap else 0, outbuf) < 0:
+                raise Exception(f"Not enough data for {self.width}x{self.height} texture!")
+            return outbuf.raw
+
+        return self.__decompress_dxt5(self.__blocks(filedata, 16, swap))
+
+    def DXT1Decompress(self, filedata: bytes, swap: bool = False) -> bytes:
+        """
+        Decompress DXT1 blocks to RGBA pixels. Only whole blocks are decoded, so
+        the output covers the largest multiple of 4 in each dimension.
+        """
+        if clib is not None:
+            length = self.block_countx * self.block_county * 8
+            outbuf = ctypes.create_string_buffer(length * 8)
+            if clib.dxt1_decompress(filedata, len(filedata), self.block_countx, self.block_county, 1 if swap else 0, outbuf) < 0:
+                raise Exception(f"Not enough data for {self.width}x{self.height} texture!")
+            return outbuf.raw
+
+        return self.__decompress_dxt1(self.__blocks(filedata, 8, swap))
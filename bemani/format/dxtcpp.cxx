@@ -0,0 +1,187 @@
+#include <stdint.h>
+
+extern "C"
+{
+    static inline uint16_t read16(const uint8_t *data, int swap)
+    {
+        if (swap)
+        {
+            return (data[0] << 8) | data[1];
+        }
+        return data[0] | (data[1] << 8);
+    }
+
+    static inline void unpack_rgb(uint16_t packed, unsigned int *r, unsigned int *g, unsigned int *b)
+    {
+        // This function converts RGB565 format to raw pixels
+        unsigned int red = (packed >> 11) & 0x1F;
+        unsigned int green = (packed >> 5) & 0x3F;
+        unsigned int blue = packed & 0x1F;
+
+        *r = (red << 3) | (red >> 2);
+        *g = (green << 2) | (green >> 4);
+        *b = (blue << 3) | (blue >> 2);
+    }
+
+    static inline void color_palette(const uint8_t *block, int swap, uint8_t palette[4][3])
+    {
+        uint16_t c0 = read16(block, swap);
+        uint16_t c1 = read16(block + 2, swap);
+
+        unsigned int r0, g0, b0, r1, g1, b1;
+        unpack_rgb(c0, &r0, &g0, &b0);
+        unpack_rgb(c1, &r1, &g1, &b1);
+
+        palette[0][0] = r0;
+        palette[0][1] = g0;
+        palette[0][2] = b0;
+        palette[1][0] = r1;
+        palette[1][1] = g1;
+        palette[1][2] = b1;
+
+        // Sliding scale between colors.
+        if (c0 > c1)
+        {
+            palette[2][0] = (2 * r0 + r1) / 3;
+            palette[2][1] = (2 * g0 + g1) / 3;
+            palette[2][2] = (2 * b0 + b1) / 3;
+            palette[3][0] = (r0 + 2 * r1) / 3;
+            palette[3][1] = (g0 + 2 * g1) / 3;
+            palette[3][2] = (b0 + 2 * b1) / 3;
+        }
+        else
+        {
+            palette[2][0] = (r0 + r1) / 2;
+            palette[2][1] = (g0 + g1) / 2;
+            palette[2][2] = (b0 + b1) / 2;
+            palette[3][0] = 0;
+            palette[3][1] = 0;
+            palette[3][2] = 0;
+        }
+    }
+
+    static inline uint32_t color_table(const uint8_t *block, int swap)
+    {
+        return (uint32_t)read16(block + 4, swap) | ((uint32_t)read16(block + 6, swap) << 16);
+    }
+
+    int dxt1_decompress(
+        const uint8_t *indata,
+        unsigned int inlen,
+        unsigned int blocks_x,
+        unsigned int blocks_y,
+        int swap,
+        uint8_t *outdata
+    ) {
+        if (inlen < blocks_x * blocks_y * 8)
+        {
+            // We don't have enough blocks to fill the image.
+            return -1;
+        }
+
+        unsigned int stride = blocks_x * 4 * 4;
+        for (unsigned int row = 0; row < blocks_y; row++)
+        {
+            for (unsigned int col = 0; col < blocks_x; col++)
+            {
+                const uint8_t *block = indata + ((row * blocks_x) + col) * 8;
+                uint8_t palette[4][3];
+                color_palette(block, swap, palette);
+                uint32_t ctable = color_table(block, swap);
+
+                uint8_t *out = outdata + (row * 4 * stride) + (col * 4 * 4);
+                for (unsigned int j = 0; j < 4; j++)
+                {
+                    for (unsigned int i = 0; i < 4; i++)
+                    {
+                        unsigned int code = (ctable >> (2 * ((4 * j) + i))) & 0x03;
+                        uint8_t *pixel = out + (j * stride) + (i * 4);
+                        pixel[0] = palette[code][0];
+                        pixel[1] = palette[code][1];
+                        pixel[2] = palette[code][2];
+                        pixel[3] = 255;
+                    }
+                }
+            }
+        }
+
+        return 0;
+    }
+
+    int dxt5_decompress(
+        const uint8_t *indata,
+        unsigned int inlen,
+        unsigned int blocks_x,
+        unsigned int blocks_y,
+        int swap,
+        uint8_t *outdata
+    ) {
+        if (inlen < blocks_x * blocks_y * 16)
+        {
+            // We don't have enough blocks to fill the image.
+            return -1;
+        }
+
+        unsigned int stride = blocks_x * 4 * 4;
+        for (unsigned int row = 0; row < blocks_y; row++)
+        {
+            for (unsigned int col = 0; col < blocks_x; col++)
+            {
+                const uint8_t *block = indata + ((row * blocks_x) + col) * 16;
+
+                // The two alpha endpoints share a 16-bit word, so swapping exchanges them.
+                unsigned int a0 = swap ? block[1] : block[0];
+                unsigned int a1 = swap ? block[0] : block[1];
+                uint64_t acode = (
+                    (uint64_t)read16(block + 2, swap) |
+                    ((uint64_t)read16(block + 4, swap) << 16) |
+                    ((uint64_t)read16(block + 6, swap) << 32)
+                );
+
+                uint8_t alphas[8];
+                alphas[0] = a0;
+                alphas[1] = a1;
+                for (unsigned int code = 2; code < 8; code++)
+                {
+                    if (a0 > a1)
+                    {
+                        alphas[code] = ((8 - code) * a0 + (code - 1) * a1) / 7;
+                    }
+                    else if (code == 6)
+                    {
+                        alphas[code] = 0;
+                    }
+                    else if (code == 7)
+                    {
+                        alphas[code] = 255;
+                    }
+                    else
+                    {
+                        alphas[code] = ((6 - code) * a0 + (code - 1) * a1) / 5;
+                    }
+                }
+
+                uint8_t palette[4][3];
+                color_palette(block + 8, swap, palette);
+                uint32_t ctable = color_table(block + 8, swap);
+
+                uint8_t *out = outdata + (row * 4 * stride) + (col * 4 * 4);
+                for (unsigned int j = 0; j < 4; j++)
+                {
+                    for (unsigned int i = 0; i < 4; i++)
+                    {
+                        unsigned int code = (ctable >> (2 * ((4 * j) + i))) & 0x03;
+                        unsigned int alpha_code = (acode >> (3 * ((4 * j) + i))) & 0x07;
+                        uint8_t *pixel = out + (j * stride) + (i * 4);
+                        pixel[0] = palette[code][0];
+                        pixel[1] = palette[code][1];
+                        pixel[2] = palette[code][2];
+                        pixel[3] = alphas[alpha_code];
+                    }
+                }
+            }
+        }
+
+        return 0;
+    }
+}
@@ -1,11 +1,13 @@
 import hashlib
 import io
+import mmap
 import os
 import struct
-from PIL import Image  # type: ignore
-from typing import Callable, Dict, List, Optional, Tuple
+import time
+from types import TracebackType
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Type, Union
 
-from bemani.format.dxt import DXTBuffer
+from bemani.format.texture import TextureFormat
 from bemani.protocol.binary import BinaryEncoding
 from bemani.protocol.xml import XmlEncoding
 from bemani.protocol.lz77 import Lz77
@@ -17,17 +19,31 @@ class IFS:
     Best-effort utility for decoding the `.ifs` file format. There are better tools out
     there, but this was developed before their existence. This should work with most of
     the games out there including non-rhythm games that use this format.
+
+    Only the header is parsed up front. Each file is remembered by where it lives in
+    the archive, or by which referenced IFS it lives in, and is only sliced out of the
+    archive, loaded and decompressed when it is read. Use IFS.open() to memory map an
+    archive on disk instead of reading the whole thing into memory.
     """
 
     def __init__(
         self,
-        data: bytes,
+        data: Union[bytes, mmap.mmap],
         decode_binxml: bool=False,
         decode_textures: bool=False,
         keep_hex_names: bool=False,
         reference_loader: Optional[Callable[[str], Optional["IFS"]]]=None,
     ) -> None:
-        self.__files: Dict[str, bytes] = {}
+        # Each file is its offset and size in the archive data, or the name of the
+        # referenced IFS it lives in along with its name in that IFS.
+        self.__files: Dict[str, Tuple[int, int, Optional[str], str]] = {}
+        self.__data = data
+        self.__references: Dict[str, IFS] = {}
+        self.__timings: Dict[str, float] = {
+            'decompress': 0.0,
+            'binxml': 0.0,
+            'texture': 0.0,
+        }
         self.__formats: Dict[str, str] = {}
         self.__compressed: Dict[str, bool] = {}
         self.__imgsize: Dict[str, Tuple[int, int, int, int]] = {}
@@ -38,6 +54,48 @@ class IFS:
         self.__loader = reference_loader
         self.__parse_file(data)
 
+    @classmethod
+    def open(
+        cls,
+        path: str,
+        decode_binxml: bool=False,
+        decode_textures: bool=False,
+        keep_hex_names: bool=False,
+        reference_loader: Optional[Callable[[str], Optional["IFS"]]]=None,
+    ) -> "IFS":
+        """
+        Open an IFS file on disk by memory mapping it, so that only the files that are
+        actually read get paged in. Call close(), or use the IFS as a context manager,
+        when done with it.
+        """
+        with open(path, 'rb') as fp:
+            data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(
+            data,
+            decode_binxml=decode_binxml,
+            decode_textures=decode_textures,
+            keep_hex_names=keep_hex_names,
+            reference_loader=reference_loader,
+        )
+
+    def close(self) -> None:
+        for ifs in self.__references.values():
+            ifs.close()
+        self.__references = {}
+        if isinstance(self.__data, mmap.mmap):
+            self.__data.close()
+
+    def __enter__(self) -> "IFS":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
     def __fix_name(self, filename: str) -> str:
         if filename[0] == '_' and filename[1].isdigit():
             filename = filename[1:]
@@ -45,7 +103,7 @@ class IFS:
         filename = filename.replace('__', '_')
         return filename
 
-    def __parse_file(self, data: bytes) -> None:
+    def __parse_file(self, data: Union[bytes, mmap.mmap]) -> None:
         # Grab the magic values and make sure this is an IFS
         (signature, version, version_crc, pack_time, unpacked_header_size, data_index) = struct.unpack(
             '>IHHIII',
@@ -120,32 +178,11 @@ class IFS:
         # Recursively walk the entire filesystem extracting files and their locations.
         get_children(os.sep, header)
 
-        # Cache of other file data.
-        otherdata: Dict[str, IFS] = {}
-
         for fn in files:
             (start, size, pack_time, external_file) = files[fn]
-            if external_file is not None:
-                if external_file not in otherdata:
-                    if self.__loader is None:
-                        ifsdata = None
-                    else:
-                        ifsdata = self.__loader(external_file)
-
-                    if ifsdata is None:
-                        raise Exception(f"Couldn't extract file data for {fn} referencing IFS file {external_file}!")
-                    else:
-                        otherdata[external_file] = ifsdata
-
-                if fn in otherdata[external_file].filenames:
-                    filedata = otherdata[external_file].read_file(fn)
-                else:
-                    raise Exception(f"{fn} not found in {external_file} IFS!")
-            else:
-                filedata = data[start:(start + size)]
-                if len(filedata) != size:
-                    raise Exception(f"Couldn't extract file data for {fn}!")
-            self.__files[fn] = filedata
+            if external_file is None and start + size > len(data):
+                raise Exception(f"Couldn't extract file data for {fn}!")
+            self.__files[fn] = (start, size, external_file, fn)
 
         # Now, find all of the index files that are available.
         for filename in list(self.__files.keys()):
@@ -156,7 +193,7 @@ class IFS:
                 texdir = os.path.dirname(filename)
 
                 benc = BinaryEncoding()
-                texdata = benc.decode(self.__files[filename])
+                texdata = benc.decode(self.__read_member(filename))
 
                 if texdata is None:
                     # Now, try as XML
@@ -164,7 +201,7 @@ class IFS:
                     encoding = "ascii"
                     texdata = xenc.decode(
                         b'<?xml encoding="ascii"?>' +
-                        self.__files[filename]
+                        self.__read_member(filename)
                     )
 
                     if texdata is None:
@@ -243,7 +280,7 @@ class IFS:
                 geodir = os.path.join(os.path.dirname(afpdir), "geo")
 
                 benc = BinaryEncoding()
-                afpdata = benc.decode(self.__files[filename])
+                afpdata = benc.decode(self.__read_member(filename))
 
                 if afpdata is None:
                     # Now, try as XML
@@ -251,7 +288,7 @@ class IFS:
                     encoding = 'ascii'
                     afpdata = xenc.decode(
                         b'<?xml encoding="ascii"?>' +
-                        self.__files[filename]
+                        self.__read_member(filename)
                     )
 
                     if afpdata is None:
@@ -300,30 +337,71 @@ class IFS:
                                 if not self.__keep_hex_names:
                                     del self.__files[oldname]
 
+    def __read_member(self, filename: str) -> bytes:
+        (start, size, external_file, member) = self.__files[filename]
+        if external_file is None:
+            return self.__data[start:(start + size)]
+
+        if external_file not in self.__references:
+            if self.__loader is None:
+                ifsdata = None
+            else:
+                ifsdata = self.__loader(external_file)
+
+            if ifsdata is None:
+                raise Exception(f"Couldn't extract file data for {filename} referencing IFS file {external_file}!")
+            self.__references[external_file] = ifsdata
+
+        reference = self.__references[external_file]
+        if member not in reference.__files:
+            raise Exception(f"{member} not found in {external_file} IFS!")
+        return reference.read_file(member)
+
     @property
     def filenames(self) -> List[str]:
         return [f for f in self.__files]
 
+    @property
+    def timings(self) -> Dict[str, float]:
+        """
+        Total seconds spent in each stage of decoding files read so far, for profiling
+        extraction of large archives.
+        """
+        return dict(self.__timings)
+
+    def iter_files(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        Yield each filename along with its data, reading one file at a time so that
+        callers can stream an archive without holding all of it in memory.
+        """
+        for filename in self.filenames:
+            yield filename, self.read_file(filename)
+
     def read_file(self, filename: str) -> bytes:
         # First, figure out if this file is stored compressed or not. If it is, decompress
         # it so that we have the raw data available to us.
         decompress = self.__compressed.get(filename, False)
-        filedata = self.__files[filename]
+        filedata = self.__read_member(filename)
         if decompress:
+            start = time.perf_counter()
             uncompressed_size, compressed_size = struct.unpack('>II', filedata[0:8])
             if len(filedata) == compressed_size + 8:
                 lz77 = Lz77()
                 filedata = lz77.decompress(filedata[8:])
             else:
                 filedata = filedata[8:] + filedata[0:8]
+            self.__timings['decompress'] += time.perf_counter() - start
 
         if self.__decode_binxml and os.path.splitext(filename)[1] == '.xml':
+            start = time.perf_counter()
             benc = BinaryEncoding()
             filexml = benc.decode(filedata)
             if filexml is not None:
                 filedata = str(filexml).encode('utf-8')
+            self.__timings['binxml'] += time.perf_counter() - start
 
         if self.__decode_textures and filename in self.__formats and filename in self.__imgsize and filename in self.__uvsize:
+            start = time.perf_counter()
             fmt = self.__formats[filename]
             img = self.__imgsize[filename]
             crop = self.__uvsize[filename]
@@ -336,27 +414,14 @@ class IFS:
                 if len(filedata) < (width * height * 4):
                     left = (width * height * 4) - len(filedata)
                     filedata = filedata + b'\x00' * left
-                png = Image.frombytes('RGBA', (width, height), filedata, 'raw', 'BGRA')
-                png = png.crop((
-                    crop[0] - img[0],
-                    crop[2] - img[2],
-                    crop[1] - img[0],
-                    crop[3] - img[2],
-                ))
-                b = io.BytesIO()
-                png.save(b, format='PNG')
-                filedata = b.getvalue()
+                png = TextureFormat.decode(TextureFormat.BGRA8888, width, height, filedata)
             elif fmt == "dxt5":
-                dxt = DXTBuffer(width, height)
-                png = Image.frombuffer(
-                    'RGBA',
-                    (width, height),
-                    dxt.DXT5Decompress(filedata, swap=True),
-                    'raw',
-                    'RGBA',
-                    0,
-                    1,
-                )
+                # These are stored with every 16-bit word byteswapped.
+                png = TextureFormat.decode(TextureFormat.DXT5, width, height, filedata, endian=">")
+            else:
+                png = None
+
+            if png is not None:
                 png = png.crop((
                     crop[0] - img[0],
                     crop[2] - img[2],
@@ -366,5 +431,6 @@ class IFS:
                 b = io.BytesIO()
                 png.save(b, format='PNG')
                 filedata = b.getvalue()
+            self.__timings['texture'] += time.perf_counter() - start
 
         return filedata
@@ -0,0 +1,101 @@
+from PIL import Image  # type: ignore
+from typing import Dict, List, Tuple
+from typing_extensions import Final
+
+from bemani.format.dxt import DXTBuffer
+
+
+class TextureFormat:
+    """
+    Decodes whole buffers of raw pixel data found in IFS and TXP2 textures into images.
+    Formats that PIL understands natively are handed straight to it. Packed 16-bit
+    formats are loaded as one 16-bit channel and split into color channels with PIL
+    lookup tables, so no format is decoded a pixel at a time in python.
+    """
+
+    # 16-bit packed formats, named from most significant to least significant bits.
+    RGB565: Final[str] = "rgb565"
+    ARGB1555: Final[str] = "argb1555"
+    ARGB4444: Final[str] = "argb4444"
+
+    # Byte-oriented formats, named in the order that bytes appear in memory.
+    RGB888: Final[str] = "rgb888"
+    BGR888: Final[str] = "bgr888"
+    ARGB8888: Final[str] = "argb8888"
+    BGRA8888: Final[str] = "bgra8888"
+
+    # Block compressed formats. Big endian data has every 16-bit word byteswapped.
+    DXT1: Final[str] = "dxt1"
+    DXT5: Final[str] = "dxt5"
+
+    # For each packed format, the output mode and the (shift, bits) of every output channel.
+    PACKED_FORMATS: Final[Dict[str, Tuple[str, Tuple[Tuple[int, int], ...]]]] = {
+        RGB565: ('RGB', ((11, 5), (5, 6), (0, 5))),
+        ARGB1555: ('RGBA', ((10, 5), (5, 5), (0, 5), (15, 1))),
+        ARGB4444: ('RGBA', ((8, 4), (4, 4), (0, 4), (12, 4))),
+    }
+
+    # For each byte-oriented format, the output mode and the PIL raw mode to decode with.
+    RAW_FORMATS: Final[Dict[str, Tuple[str, str]]] = {
+        RGB888: ('RGB', 'RGB'),
+        BGR888: ('RGB', 'BGR'),
+        ARGB8888: ('RGBA', 'ARGB'),
+        BGRA8888: ('RGBA', 'BGRA'),
+    }
+
+    __luts: Dict[Tuple[int, int], List[int]] = {}
+
+    @staticmethod
+    def __expand(value: int, bits: int) -> int:
+        # Repeat the bits of a channel so it fills the entire 8 bit range.
+        value <<= 8 - bits
+        while bits < 8:
+            value |= value >> bits
+            bits *= 2
+        return value & 0xFF
+
+    @staticmethod
+    def __lut(shift: int, bits: int) -> List[int]:
+        lut = TextureFormat.__luts.get((shift, bits))
+        if lut is None:
+            mask = (1 << bits) - 1
+            lut = [TextureFormat.__expand((pixel >> shift) & mask, bits) for pixel in range(0x10000)]
+            TextureFormat.__luts[(shift, bits)] = lut
+        return lut
+
+    @staticmethod
+    def decode(fmt: str, width: int, height: int, data: bytes, endian: str = "<") -> Image.Image:
+        """
+        Decode raw texture data to an image.
+
+        Parameters:
+            fmt - One of the format constants on this class.
+            width - The width of the texture in pixels.
+            height - The height of the texture in pixels.
+            data - The raw pixel data, starting with the first pixel.
+            endian - The struct endianness of the data, which matters for
+                     16-bit packed formats and block compressed formats.
+
+        Returns:
+            A PIL Image in RGB or RGBA mode.
+        """
+        if fmt in TextureFormat.PACKED_FORMATS:
+            mode, channels = TextureFormat.PACKED_FORMATS[fmt]
+            packed = Image.frombytes(
+                'I', (width, height), data[:(width * height * 2)], 'raw', 'I;16B' if endian == ">" else 'I;16',
+            )
+            return Image.merge(
+                mode,
+                [packed.point(TextureFormat.__lut(shift, bits), 'L') for shift, bits in channels],
+            )
+        if fmt in TextureFormat.RAW_FORMATS:
+            mode, rawmode = TextureFormat.RAW_FORMATS[fmt]
+            return Image.frombytes(mode, (width, height), data, 'raw', rawmode)
+        if fmt in {TextureFormat.DXT1, TextureFormat.DXT5}:
+            dxt = DXTBuffer(width, height)
+            if fmt == TextureFormat.DXT1:
+                pixels = dxt.DXT1Decompress(data, swap=endian != "<")
+            else:
+                pixels = dxt.DXT5Decompress(data, swap=endian != "<")
+            return Image.frombuffer('RGBA', (width, height), pixels, 'raw', 'RGBA', 0, 1)
+        raise Exception(f"Unsupported texture format {fmt}!")
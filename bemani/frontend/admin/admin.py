@@ -1,5 +1,5 @@
 import random
-from typing import Dict, Tuple, Any, Optional
+from typing import Dict, List, Tuple, Any, Optional
 from flask import Blueprint, request, Response, render_template, url_for
 
 from bemani.backend.base import Base
@@ -7,6 +7,7 @@ from bemani.common import CardCipher, CardCipherException, GameConstants, Region
 from bemani.data import Arcade, Machine, User, UserID, News, Event, Server, Client
 from bemani.data.api.client import APIClient, NotAuthorizedAPIException, APIException
 from bemani.frontend.app import adminrequired, jsonify, valid_email, valid_username, valid_pin, render_react
+from bemani.frontend.base import FrontendBase
 from bemani.frontend.gamesettings import get_game_settings
 from bemani.frontend.iidx.iidx import IIDXFrontend
 from bemani.frontend.jubeat.jubeat import JubeatFrontend
@@ -122,6 +123,13 @@ def format_server(server: Server) -> Dict[str, Any]:
     }
 
 
+def get_event_page(until: Optional[int]=None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    events = g.data.local.network.get_events(until_id=until, limit=100)
+    if len(events) < 100:
+        return [format_event(event) for event in events], None
+    return [format_event(event) for event in events], FrontendBase.encode_cursor(events[-1].id)
+
+
 @admin_pages.route('/')
 @adminrequired
 def viewsettings() -> Response:
@@ -141,11 +149,13 @@ def viewevents() -> Response:
     iidx = IIDXFrontend(g.data, g.config, g.cache)
     jubeat = JubeatFrontend(g.data, g.config, g.cache)
     pnm = PopnMusicFrontend(g.data, g.config, g.cache)
+    events, next_cursor = get_event_page()
     return render_react(
         'Events',
         'admin/events.react.js',
         {
-            'events': [format_event(event) for event in g.data.local.network.get_events(limit=100)],
+            'events': events,
+            'next': next_cursor,
             'users': {user.id: user.username for user in g.data.local.user.get_all_users()},
             'arcades': {arcade.id: arcade.name for arcade in g.data.local.machine.get_all_arcades()},
             'iidxsongs': iidx.get_all_songs(),
@@ -157,7 +167,7 @@ def viewevents() -> Response:
         },
         {
             'refresh': url_for('admin_pages.listevents', since=-1),
-            'backfill': url_for('admin_pages.backfillevents', until=-1),
+            'backfill': url_for('admin_pages.backfillevents', cursor=-1),
             'viewuser': url_for('admin_pages.viewuser', userid=-1),
             'jubeatsong': url_for('jubeat_pages.viewtopscores', musicid=-1) if GameConstants.JUBEAT in g.config.support else None,
             'iidxsong': url_for('iidx_pages.viewtopscores', musicid=-1) if GameConstants.IIDX in g.config.support else None,
@@ -166,12 +176,15 @@ def viewevents() -> Response:
     )
 
 
-@admin_pages.route('/events/backfill/<int:until>')
+@admin_pages.route('/events/backfill/<string:cursor>')
 @jsonify
 @adminrequired
-def backfillevents(until: int) -> Dict[str, Any]:
+def backfillevents(cursor: str) -> Dict[str, Any]:
+    until = FrontendBase.decode_cursor(cursor, 1)[0]
+    events, next_cursor = get_event_page(until)
     return {
-        'events': [format_event(event) for event in g.data.local.network.get_events(until_id=until, limit=1000)],
+        'events': events,
+        'next': next_cursor,
     }
 
 
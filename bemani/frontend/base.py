@@ -1,4 +1,5 @@
 # vim: set fileencoding=utf-8
+import base64
 import copy
 from abc import ABC
 from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
@@ -39,6 +40,29 @@ class FrontendBase(ABC):
         self.config = config
         self.cache = cache
 
+    @staticmethod
+    def encode_cursor(*values: int) -> str:
+        """
+        Given the keys of the last entry on a page, return an opaque cursor that
+        can be handed back to the browser and used to fetch the following page.
+        """
+        return base64.urlsafe_b64encode(':'.join(str(value) for value in values).encode('ascii')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str, length: int) -> Tuple[int, ...]:
+        """
+        Given a cursor previously returned by encode_cursor, return the keys it
+        was built from. Raises a ValueError if the cursor was tampered with.
+        """
+        try:
+            decoded = base64.urlsafe_b64decode(cursor + ('=' * (-len(cursor) % 4))).decode('ascii')
+            values = tuple(int(value) for value in decoded.split(':'))
+        except ValueError:
+            values = ()
+        if len(values) != length:
+            raise ValueError(f'Invalid page cursor {cursor}')
+        return values
+
     def make_index(self, songid: int, chart: int) -> str:
         return f'{songid}-{chart}'
 
@@ -62,6 +86,7 @@ class FrontendBase(ABC):
             'userid': str(userid),
             'songid': attempt.id,
             'chart': attempt.chart,
+            'key': attempt.key,
             'timestamp': attempt.timestamp,
             'raised': attempt.new_record,
             'points': attempt.points,
@@ -126,25 +151,28 @@ class FrontendBase(ABC):
 
     def get_all_player_info(self, userids: List[UserID], limit: Optional[int]=None, allow_remote: bool=False) -> Dict[UserID, Dict[int, Dict[str, Any]]]:
         info: Dict[UserID, Dict[int, Dict[str, Any]]] = {}
-        playstats: Dict[UserID, ValidatedDict] = {}
 
-        # Find all versions of the users' profiles, sorted newest to oldest.
+        # Find all versions of the users' profiles, sorted newest to oldest. Local profiles
+        # and play statistics are looked up in bulk, remote profiles have to be requested one
+        # at a time below since they live on other networks.
         versions = sorted([version for (game, version, name) in self.all_games()], reverse=True)
+        localids = [userid for userid in userids if not (allow_remote and RemoteUser.is_remote(userid))]
+        profiles = {
+            version: self.data.local.user.get_profiles(self.game, [(userid, version) for userid in localids])
+            for version in versions
+        }
+        playstats = self.data.local.game.get_all_settings(self.game, userids)
+
         for userid in userids:
             info[userid] = {}
             userlimit = limit
             for version in versions:
-                if allow_remote:
+                if allow_remote and RemoteUser.is_remote(userid):
                     profile = self.data.remote.user.get_profile(self.game, version, userid)
                 else:
-                    profile = self.data.local.user.get_profile(self.game, version, userid)
+                    profile = profiles[version].get(userid)
                 if profile is not None:
-                    if userid not in playstats:
-                        stats = self.data.local.game.get_settings(self.game, userid)
-                        if stats is None:
-                            stats = ValidatedDict()
-                        playstats[userid] = stats
-                    info[userid][version] = self.format_profile(profile, playstats[userid])
+                    info[userid][version] = self.format_profile(profile, playstats.get(userid, ValidatedDict()))
                     info[userid][version]['remote'] = RemoteUser.is_remote(userid)
                     # Exit out if we've hit the limit
                     if userlimit is not None:
@@ -175,14 +203,31 @@ class FrontendBase(ABC):
 
         return self.get_latest_player_info(list(userids))
 
-    def get_network_scores(self, limit: Optional[int]=None) -> Dict[str, Any]:
+    def __get_attempts_page(
+        self,
+        userid: Optional[UserID],
+        limit: Optional[int],
+        cursor: Optional[str],
+    ) -> Tuple[List[Tuple[Optional[UserID], Attempt]], Optional[str]]:
+        before: Optional[Tuple[int, int]] = None
+        if cursor is not None:
+            timestamp, key = self.decode_cursor(cursor, 2)
+            before = (timestamp, key)
+
+        attempts = self.data.local.music.get_all_attempts(game=self.game, version=self.version, userid=userid, limit=limit, before=before)
+
+        # Only hand out a cursor when this page was full, since otherwise there's nothing left to load
+        if limit is None or len(attempts) < limit:
+            return attempts, None
+        last = attempts[-1][1]
+        return attempts, self.encode_cursor(last.timestamp, last.key)
+
+    def get_network_scores(self, limit: Optional[int]=None, cursor: Optional[str]=None) -> Dict[str, Any]:
         userids: List[UserID] = []
 
         # Find all attempts across all games
-        attempts = [
-            attempt for attempt in self.data.local.music.get_all_attempts(game=self.game, version=self.version, limit=limit)
-            if attempt[0] is not None
-        ]
+        page, next_cursor = self.__get_attempts_page(None, limit, cursor)
+        attempts = [attempt for attempt in page if attempt[0] is not None]
         for attempt in attempts:
             if attempt[0] not in userids:
                 userids.append(attempt[0])
@@ -194,6 +239,7 @@ class FrontendBase(ABC):
                 key=lambda attempt: (attempt['timestamp'], attempt['songid'], attempt['chart']),
             ),
             'players': self.get_latest_player_info(userids),
+            'next': next_cursor,
         }
 
     def get_network_records(self) -> Dict[str, Any]:
@@ -226,18 +272,20 @@ class FrontendBase(ABC):
             'players': self.get_latest_player_info(userids),
         }
 
-    def get_scores(self, userid: UserID, limit: Optional[int]=None) -> List[Dict[str, Any]]:
+    def get_scores(self, userid: UserID, limit: Optional[int]=None, cursor: Optional[str]=None) -> Dict[str, Any]:
         # Find all attempts across all games
-        attempts = [
-            attempt for attempt in self.data.local.music.get_all_attempts(game=self.game, version=self.version, userid=userid, limit=limit)
-            if attempt[0] is not None
-        ]
-
-        return sorted(
-            [self.format_attempt(None, attempt[1]) for attempt in attempts],
-            reverse=True,
-            key=lambda attempt: (attempt['timestamp'], attempt['songid'], attempt['chart']),
-        )
+        page, next_cursor = self.__get_attempts_page(userid, limit, cursor)
+        attempts = [attempt for attempt in page if attempt[0] is not None]
+
+        return {
+            'attempts': sorted(
+                [self.format_attempt(None, attempt[1]) for attempt in attempts],
+                reverse=True,
+                key=lambda attempt: (attempt['timestamp'], attempt['songid'], attempt['chart']),
+            ),
+            'players': {},
+            'next': next_cursor,
+        }
 
     def get_records(self, userid: UserID) -> List[Dict[str, Any]]:
         records: Dict[str, Tuple[UserID, Score]] = {}
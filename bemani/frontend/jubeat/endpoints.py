@@ -36,12 +36,14 @@ def viewnetworkscores() -> Response:
             'attempts': network_scores['attempts'],
             'songs': frontend.get_all_songs(),
             'players': network_scores['players'],
+            'next': network_scores['next'],
             'versions': {version: name for (game, version, name) in frontend.sanitized_games()},
             'shownames': True,
             'shownewrecords': False,
         },
         {
             'refresh': url_for('jubeat_pages.listnetworkscores'),
+            'backfill': url_for('jubeat_pages.backfillnetworkscores', cursor=-1),
             'player': url_for('jubeat_pages.viewplayer', userid=-1),
             'individual_score': url_for('jubeat_pages.viewtopscores', musicid=-1),
         },
@@ -53,7 +55,15 @@ def viewnetworkscores() -> Response:
 @loginrequired
 def listnetworkscores() -> Dict[str, Any]:
     frontend = JubeatFrontend(g.data, g.config, g.cache)
-    return frontend.get_network_scores()
+    return frontend.get_network_scores(limit=100)
+
+
+@jubeat_pages.route('/scores/list/<string:cursor>')
+@jsonify
+@loginrequired
+def backfillnetworkscores(cursor: str) -> Dict[str, Any]:
+    frontend = JubeatFrontend(g.data, g.config, g.cache)
+    return frontend.get_network_scores(limit=100, cursor=cursor)
 
 
 @jubeat_pages.route('/scores/<int:userid>')
@@ -65,22 +75,24 @@ def viewscores(userid: UserID) -> Response:
         abort(404)
 
     scores = frontend.get_scores(userid, limit=100)
-    if len(scores) > 10:
-        scores = frontend.round_to_ten(scores)
+    if len(scores['attempts']) > 10:
+        scores['attempts'] = frontend.round_to_ten(scores['attempts'])
 
     return render_react(
         f'{info["name"]}\'s Jubeat Scores',
         'jubeat/scores.react.js',
         {
-            'attempts': scores,
+            'attempts': scores['attempts'],
             'songs': frontend.get_all_songs(),
             'players': {},
+            'next': scores['next'],
             'versions': {version: name for (game, version, name) in frontend.sanitized_games()},
             'shownames': False,
             'shownewrecords': True,
         },
         {
             'refresh': url_for('jubeat_pages.listscores', userid=userid),
+            'backfill': url_for('jubeat_pages.backfillscores', userid=userid, cursor=-1),
             'player': url_for('jubeat_pages.viewplayer', userid=-1),
             'individual_score': url_for('jubeat_pages.viewtopscores', musicid=-1),
         },
@@ -92,10 +104,15 @@ def viewscores(userid: UserID) -> Response:
 @loginrequired
 def listscores(userid: UserID) -> Dict[str, Any]:
     frontend = JubeatFrontend(g.data, g.config, g.cache)
-    return {
-        'attempts': frontend.get_scores(userid),
-        'players': {},
-    }
+    return frontend.get_scores(userid, limit=100)
+
+
+@jubeat_pages.route('/scores/<int:userid>/list/<string:cursor>')
+@jsonify
+@loginrequired
+def backfillscores(userid: UserID, cursor: str) -> Dict[str, Any]:
+    frontend = JubeatFrontend(g.data, g.config, g.cache)
+    return frontend.get_scores(userid, limit=100, cursor=cursor)
 
 
 @jubeat_pages.route('/records')
@@ -37,11 +37,13 @@ def viewnetworkscores() -> Response:
             'attempts': network_scores['attempts'],
             'songs': frontend.get_all_songs(),
             'players': network_scores['players'],
+            'next': network_scores['next'],
             'shownames': True,
             'shownewrecords': False,
         },
         {
             'refresh': url_for('sdvx_pages.listnetworkscores'),
+            'backfill': url_for('sdvx_pages.backfillnetworkscores', cursor=-1),
             'player': url_for('sdvx_pages.viewplayer', userid=-1),
             'individual_score': url_for('sdvx_pages.viewtopscores', musicid=-1),
         },
@@ -53,7 +55,15 @@ def viewnetworkscores() -> Response:
 @loginrequired
 def listnetworkscores() -> Dict[str, Any]:
     frontend = SoundVoltexFrontend(g.data, g.config, g.cache)
-    return frontend.get_network_scores()
+    return frontend.get_network_scores(limit=100)
+
+
+@sdvx_pages.route('/scores/list/<string:cursor>')
+@jsonify
+@loginrequired
+def backfillnetworkscores(cursor: str) -> Dict[str, Any]:
+    frontend = SoundVoltexFrontend(g.data, g.config, g.cache)
+    return frontend.get_network_scores(limit=100, cursor=cursor)
 
 
 @sdvx_pages.route('/scores/<int:userid>')
@@ -65,21 +75,23 @@ def viewscores(userid: UserID) -> Response:
         abort(404)
 
     scores = frontend.get_scores(userid, limit=100)
-    if len(scores) > 10:
-        scores = frontend.round_to_ten(scores)
+    if len(scores['attempts']) > 10:
+        scores['attempts'] = frontend.round_to_ten(scores['attempts'])
 
     return render_react(
         f'{info["name"]}\'s SDVX Scores',
         'sdvx/scores.react.js',
         {
-            'attempts': scores,
+            'attempts': scores['attempts'],
             'songs': frontend.get_all_songs(),
             'players': {},
+            'next': scores['next'],
             'shownames': False,
             'shownewrecords': True,
         },
         {
             'refresh': url_for('sdvx_pages.listscores', userid=userid),
+            'backfill': url_for('sdvx_pages.backfillscores', userid=userid, cursor=-1),
             'player': url_for('sdvx_pages.viewplayer', userid=-1),
             'individual_score': url_for('sdvx_pages.viewtopscores', musicid=-1),
         },
@@ -91,10 +103,15 @@ def viewscores(userid: UserID) -> Response:
 @loginrequired
 def listscores(userid: UserID) -> Dict[str, Any]:
     frontend = SoundVoltexFrontend(g.data, g.config, g.cache)
-    return {
-        'attempts': frontend.get_scores(userid),
-        'players': {},
-    }
+    return frontend.get_scores(userid, limit=100)
+
+
+@sdvx_pages.route('/scores/<int:userid>/list/<string:cursor>')
+@jsonify
+@loginrequired
+def backfillscores(userid: UserID, cursor: str) -> Dict[str, Any]:
+    frontend = SoundVoltexFrontend(g.data, g.config, g.cache)
+    return frontend.get_scores(userid, limit=100, cursor=cursor)
 
 
 @sdvx_pages.route('/records')
@@ -41,33 +41,29 @@ var audit_events = React.createClass({
             jubeatversions: window.jubeatversions,
             pnmversions: window.pnmversions,
             filtering: window.possible_events,
+            next: window.next,
+            loading: false,
             offset: 0,
             limit: 10,
         };
     },
 
     componentDidMount: function() {
-        this.loadOldEvents();
         this.refreshEvents();
     },
 
     loadOldEvents: function() {
-        // If there's no events on the network, don't try loading old ones
-        if (this.state.events.length == 0) { return; }
-
-        var min_id = this.state.events.reduce(function(a, b) {
-            return a < b.id ? a : b.id;
-        }, this.state.events[0].id);
+        // Only fetch the page after the oldest event we have, and only when asked to
+        if (!this.state.next || this.state.loading) { return; }
+        this.setState({loading: true});
         AJAX.get(
-            Link.get('backfill', min_id),
+            Link.get('backfill', this.state.next),
             function(response) {
                 this.setState({
                     events: mergehandler.add(response.events),
+                    next: response.next,
+                    loading: false,
                 });
-                // Keep loading until we grab all events
-                if (response.events.length > 0) {
-                    setTimeout(this.loadOldEvents, 1);
-                }
             }.bind(this)
         );
     },
@@ -132,7 +128,7 @@ var audit_events = React.createClass({
         var events = this.getEvents().sort(function(a, b) {
             return b.id - a.id;
         });
-        if (events.length == 0) {
+        if (events.length == 0 && !this.state.next) {
             return (
                 <div>
                     {this.renderFilters()}
@@ -200,7 +196,22 @@ var audit_events = React.createClass({
                                              var page = this.state.offset + this.state.limit;
                                              if (page >= events.length) { return }
                                              this.setState({offset: page});
-                                        }.bind(this)}/> : null
+                                             // Grab the next page of older events once we reach the last one we have
+                                             if (page + this.state.limit >= events.length) {
+                                                 this.loadOldEvents();
+                                             }
+                                        }.bind(this)}/> :
+                                        this.state.loading ?
+                                            <span className="loading" style={ {float: 'right' } }>
+                                                <img
+                                                    className="loading"
+                                                    src={Link.get('static', 'loading-16.gif')}
+                                                /> loading more events...
+                                            </span> :
+                                        this.state.next ?
+                                            <Next style={ {float: 'right'} } onClick={function(event) {
+                                                 this.loadOldEvents();
+                                            }.bind(this)}/> : null
                                     }
                                 </td>
                             </tr>
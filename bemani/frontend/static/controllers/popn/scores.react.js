@@ -1,12 +1,15 @@
 /*** @jsx React.DOM */
 
+var mergehandler = new MergeManager(function(attempt) { return attempt.key; }, MergeManager.MERGE_POLICY_DROP);
+
 var network_scores = React.createClass({
     getInitialState: function(props) {
         return {
             songs: window.songs,
-            attempts: window.attempts,
+            attempts: this.sortAttempts(mergehandler.add(window.attempts)),
             players: window.players,
-            loading: true,
+            next: window.next,
+            loading: false,
             offset: 0,
             limit: 10,
         };
@@ -21,9 +24,8 @@ var network_scores = React.createClass({
             Link.get('refresh'),
             function(response) {
                 this.setState({
-                    attempts: response.attempts,
-                    players: response.players,
-                    loading: false,
+                    attempts: this.sortAttempts(mergehandler.add(response.attempts)),
+                    players: this.mergePlayers(response.players),
                 });
                 // Refresh every 15 seconds
                 setTimeout(this.refreshScores, 15000);
@@ -31,6 +33,41 @@ var network_scores = React.createClass({
         );
     },
 
+    loadOlderScores: function() {
+        // Only fetch the page after the oldest score we have, and only when asked to
+        if (!this.state.next || this.state.loading) { return; }
+        this.setState({loading: true});
+        AJAX.get(
+            Link.get('backfill', this.state.next),
+            function(response) {
+                this.setState({
+                    attempts: this.sortAttempts(mergehandler.add(response.attempts)),
+                    players: this.mergePlayers(response.players),
+                    next: response.next,
+                    loading: false,
+                });
+            }.bind(this)
+        );
+    },
+
+    mergePlayers: function(players) {
+        var merged = {};
+        Object.keys(this.state.players).map(function(userid) {
+            merged[userid] = this.state.players[userid];
+        }.bind(this));
+        Object.keys(players).map(function(userid) {
+            merged[userid] = players[userid];
+        });
+        return merged;
+    },
+
+    sortAttempts: function(attempts) {
+        return attempts.sort(function(a, b) {
+            if (a.timestamp != b.timestamp) { return b.timestamp - a.timestamp; }
+            return b.key - a.key;
+        });
+    },
+
     convertChart: function(chart) {
         switch(chart) {
             case 0:
@@ -148,6 +185,10 @@ var network_scores = React.createClass({
                                          var page = this.state.offset + this.state.limit;
                                          if (page >= this.state.attempts.length) { return }
                                          this.setState({offset: page});
+                                         // Grab the next page of older scores once we reach the last one we have
+                                         if (page + this.state.limit >= this.state.attempts.length) {
+                                             this.loadOlderScores();
+                                         }
                                     }.bind(this)}/> :
                                     this.state.loading ?
                                         <span className="loading" style={ {float: 'right' } }>
@@ -155,7 +196,11 @@ var network_scores = React.createClass({
                                                 className="loading"
                                                 src={Link.get('static', 'loading-16.gif')}
                                             /> loading more scores...
-                                        </span> : null
+                                        </span> :
+                                    this.state.next ?
+                                        <Next style={ {float: 'right'} } onClick={function(event) {
+                                             this.loadOlderScores();
+                                        }.bind(this)}/> : null
                                 }
                             </td>
                         </tr>
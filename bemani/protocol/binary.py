@@ -1,5 +1,5 @@
 import struct
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from typing_extensions import Final
 
 from bemani.protocol.stream import InputStream, OutputStream
@@ -705,6 +705,453 @@ class BinaryEncoder:
         ])
 
 
+class _BodyLayout:
+    """
+    A faster equivalent of PackedOrdering which only tracks cursors instead of
+    keeping a map of the whole body. Since every allocation happens in order,
+    the only holes that can ever exist are in the current partially-filled
+    byte chunk and the current partially-filled short chunk, so tracking where
+    those are along with the end of the used body is enough to reproduce
+    Konami's hole-fill algorithm exactly.
+    """
+
+    def __init__(self) -> None:
+        self.end = 0
+        self.byte = 0
+        self.short = 0
+
+    def allocate(self, size: int) -> int:
+        """
+        Return the location where a scalar value of a given size should be
+        found/stored, and mark it as used.
+
+        Parameters:
+            size - Number of bytes that the value takes up.
+        """
+        if size == 1:
+            if (self.byte & 3) == 0:
+                self.byte = self.end
+                self.end += 4
+            loc = self.byte
+            self.byte += 1
+            return loc
+        if size == 2:
+            if (self.short & 3) == 0:
+                self.short = self.end
+                self.end += 4
+            loc = self.short
+            self.short += 2
+            return loc
+
+        loc = self.end
+        self.end += (size + 3) & ~3
+        return loc
+
+
+class FastBinaryDecoder:
+    """
+    A class capable of taking a binary blob and decoding it to a Node tree. This
+    produces the same trees as BinaryDecoder, which is kept as the reference
+    implementation, but reads the body directly out of the blob instead of
+    walking a stream and a PackedOrdering.
+    """
+
+    # Decoded node names, keyed by their packed representation.
+    NAME_CACHE: Dict[bytes, str] = {}
+    NAME_CACHE_SIZE: Final[int] = 4096
+
+    # Compiled struct formats. Array formats embed the element count from the
+    # packet, so this is capped the same way as the name cache.
+    STRUCTS: Dict[str, struct.Struct] = {}
+    STRUCTS_SIZE: Final[int] = 1024
+
+    def __init__(self, data: bytes, encoding: str) -> None:
+        """
+        Initialize the object.
+
+        Parameters:
+            - data - A binary blob of data to be decoded
+            - encoding - A string representing the text encoding for string elements. Should be either
+                         'shift-jis', 'euc-jp' or 'utf-8'
+        """
+        self.data = data
+        self.pos = 0
+        self.encoding = encoding
+        self.executed = False
+
+    def __read_byte(self, what: str) -> int:
+        """
+        Read the next byte out of the header.
+
+        Parameters:
+            what - A description of what we were reading, for errors.
+
+        Returns:
+            An integer byte value.
+        """
+        if self.pos >= len(self.data):
+            raise BinaryEncodingException(f"Ran out of data when attempting to read {what}!")
+        val = self.data[self.pos]
+        self.pos += 1
+        return val
+
+    def __read_node_name(self) -> str:
+        """
+        Given the current position in the header, read the 6-bit-byte packed string name of the
+        node.
+
+        Returns:
+            A string representing the name in ascii
+        """
+        length = self.__read_byte("node name length")
+        binary_length = ((length * 6) + 7) // 8
+        end = self.pos + binary_length
+        if end > len(self.data):
+            raise BinaryEncodingException("Ran out of data when attempting to read node name!")
+        packed = self.data[(self.pos - 1):end]
+        self.pos = end
+
+        name = FastBinaryDecoder.NAME_CACHE.get(packed)
+        if name is None:
+            bits = int.from_bytes(packed[1:], 'big')
+            shift = binary_length * 8
+            chars = []
+            for _ in range(length):
+                shift -= 6
+                chars.append(Node.NODE_NAME_CHARS[(bits >> shift) & 0x3F])
+            name = ''.join(chars)
+
+            if len(FastBinaryDecoder.NAME_CACHE) >= FastBinaryDecoder.NAME_CACHE_SIZE:
+                FastBinaryDecoder.NAME_CACHE.clear()
+            FastBinaryDecoder.NAME_CACHE[packed] = name
+        return name
+
+    def __read_node(self, node_type: int, ordering: List[Tuple[Node, Optional[str]]]) -> Node:
+        """
+        Given an integer node type, read the node's name, possible attributes
+        and children. Will return a Node representing this node. Note
+        that calling this on the first node should return a tree of all nodes.
+        Also builds up the order that values will be found in the body.
+
+        Parameters:
+            node_type - The integer node type we just read.
+            ordering - A list of node and optional attribute name tuples to append to.
+
+        Returns:
+            Node object
+        """
+        node = Node(name=self.__read_node_name(), type=node_type)
+        if node.data_length != 0:
+            ordering.append((node, None))
+
+        attributes: List[str] = []
+        children: List[Tuple[Node, Optional[str]]] = []
+        while True:
+            child_type = self.__read_byte("node type")
+
+            if child_type == Node.END_OF_NODE:
+                # Attributes come before children in the body, in sorted order.
+                for attr in sorted(attributes):
+                    ordering.append((node, attr))
+                ordering.extend(children)
+                return node
+            elif child_type == Node.ATTR_TYPE:
+                key = self.__read_node_name()
+                node.set_attribute(key)
+                attributes.append(key)
+            else:
+                node.add_child(self.__read_node(child_type, children))
+
+    def __struct(self, fmt: str) -> struct.Struct:
+        """
+        Look up a compiled struct for a given format.
+
+        Parameters:
+            fmt - A struct format string.
+        """
+        compiled = FastBinaryDecoder.STRUCTS.get(fmt)
+        if compiled is None:
+            compiled = struct.Struct(fmt)
+            if len(FastBinaryDecoder.STRUCTS) >= FastBinaryDecoder.STRUCTS_SIZE:
+                FastBinaryDecoder.STRUCTS.clear()
+            FastBinaryDecoder.STRUCTS[fmt] = compiled
+        return compiled
+
+    def get_tree(self) -> Node:
+        """
+        Parse the header and body such that we can return a Node tree
+        representing the data passed to us.
+
+        Returns:
+            Node object
+        """
+        if self.executed:
+            raise BinaryEncodingException("Logic error, should only call this once per instance")
+        self.executed = True
+
+        data = self.data
+        if len(data) < 4:
+            raise BinaryEncodingException("Ran out of data when attempting to read header length!")
+        header_length = struct.unpack_from('>I', data, 0)[0]
+        self.pos = 4
+
+        ordering: List[Tuple[Node, Optional[str]]] = []
+        root = self.__read_node(self.__read_byte("root node type"), ordering)
+
+        eod = self.__read_byte("end of document")
+        if eod != Node.END_OF_DOCUMENT:
+            raise BinaryEncodingException(f'Unknown node type {eod} at end of document')
+
+        # Skip by any padding, then read the body next
+        pos = max(self.pos, header_length + 4)
+        if pos + 4 > len(data):
+            return root
+        body_length = struct.unpack_from('>I', data, pos)[0]
+        if body_length == 0:
+            return root
+
+        start = pos + 4
+        if start + body_length > len(data):
+            raise BinaryEncodingException('Body has insufficient data')
+        body = data[start:(start + body_length)]
+        layout = _BodyLayout()
+
+        for node, attr in ordering:
+            if attr is not None:
+                loc = layout.allocate(4)
+                if loc + 4 > body_length:
+                    raise BinaryEncodingException("Ran out of data when attempting to read node data location!")
+                size = struct.unpack_from('>I', body, loc)[0]
+                layout.end = loc + ((size + 7) & ~3)
+
+                val = body[(loc + 4):(loc + 4 + size)]
+                try:
+                    node.set_attribute(attr, val[:-1].decode(self.encoding))
+                except UnicodeDecodeError:
+                    # Nothing we can do here
+                    node.set_attribute(attr, val)  # type: ignore
+                continue
+
+            size = node.data_length
+            enc = node.data_encoding
+
+            if node.is_array:
+                if node.is_composite:
+                    raise Exception('Logic error, no support for composite arrays!')
+
+                loc = layout.allocate(4)
+                if loc + 4 > body_length:
+                    raise BinaryEncodingException("Ran out of data when attempting to read array length location!")
+
+                # The raw size in bytes
+                length = struct.unpack_from('>I', body, loc)[0]
+                layout.end = loc + ((length + 7) & ~3)
+                elems = length // size
+                node.set_value(list(self.__struct(f'>{enc * elems}').unpack_from(body, loc + 4)))
+            elif size is None:
+                # The size should be read from the first 4 bytes
+                loc = layout.allocate(4)
+                if loc + 4 > body_length:
+                    raise BinaryEncodingException("Ran out of data when attempting to read node data location!")
+                size = struct.unpack_from('>I', body, loc)[0]
+                layout.end = loc + ((size + 7) & ~3)
+
+                raw = body[(loc + 4):(loc + 4 + size)]
+                if node.data_type == 'str':
+                    # Need to convert this from encoding to standard string.
+                    # Also, need to lob off the trailing null.
+                    try:
+                        node.set_value(raw[:-1].decode(self.encoding))
+                    except UnicodeDecodeError:
+                        # Nothing we can do here
+                        node.set_value(raw)
+                else:
+                    node.set_value(raw)
+            else:
+                loc = layout.allocate(size)
+                if loc + size > body_length:
+                    raise BinaryEncodingException("Ran out of data when attempting to read node data location!")
+
+                unpacked = self.__struct(f'>{enc}').unpack_from(body, loc)
+                if node.is_composite:
+                    node.set_value(list(unpacked))
+                else:
+                    node.set_value(unpacked[0])
+
+        return root
+
+
+class FastBinaryEncoder:
+    """
+    A class capable of taking a Node tree and encoding it into a binary format. This
+    produces the same output as BinaryEncoder, which is kept as the reference
+    implementation, but writes the header and body into single buffers.
+    """
+
+    # Packed node names, including the leading length byte.
+    NAME_CACHE: Dict[str, bytes] = {}
+    NAME_CACHE_SIZE: Final[int] = 4096
+
+    CHAR_LUT: Final[Dict[str, int]] = {ch: i for i, ch in enumerate(Node.NODE_NAME_CHARS)}
+
+    def __init__(self, tree: Node, encoding: str) -> None:
+        """
+        Initialize the object.
+
+        Parameters:
+            tree - A binary blob of data to be decoded
+            encoding - A string representing the text encoding for string elements. Should be either
+                       'shift-jis', 'euc-jp' or 'utf-8'
+        """
+        self.encoding = encoding
+        self.tree = tree
+        self.executed = False
+
+    def __node_name(self, name: str) -> bytes:
+        """
+        Return the 6-bit-byte packed string name of a node, including its length.
+
+        Parameters:
+            name - A string name which should be encoded as a node name
+        """
+        packed = FastBinaryEncoder.NAME_CACHE.get(name)
+        if packed is None:
+            bits = 0
+            for ch in name:
+                bits = (bits << 6) | FastBinaryEncoder.CHAR_LUT[ch]
+
+            # Pad out the rest with zeros
+            binary_length = ((len(name) * 6) + 7) // 8
+            bits <<= (binary_length * 8) - (len(name) * 6)
+            packed = bytes([len(name)]) + bits.to_bytes(binary_length, 'big')
+
+            if len(FastBinaryEncoder.NAME_CACHE) >= FastBinaryEncoder.NAME_CACHE_SIZE:
+                FastBinaryEncoder.NAME_CACHE.clear()
+            FastBinaryEncoder.NAME_CACHE[name] = packed
+        return packed
+
+    def __write_node(self, node: Node, header: List[bytes], ordering: List[Tuple[Node, Optional[str]]]) -> None:
+        """
+        Given a node, write the node's type, name, attributes and children to the header.
+        Also builds up the order that values will be written to the body.
+
+        Parameters:
+            node - A Node which should be encoded.
+            header - A list of bytes to append header chunks to.
+            ordering - A list of node and optional attribute name tuples to append to.
+        """
+        header.append(bytes([node.type]))
+        header.append(self.__node_name(node.name))
+        if node.data_length != 0:
+            ordering.append((node, None))
+
+        if node.has_attributes:
+            for attr in sorted(node.attributes.keys()):
+                header.append(bytes([Node.ATTR_TYPE]))
+                header.append(self.__node_name(attr))
+                ordering.append((node, attr))
+
+        for child in node.children:
+            self.__write_node(child, header, ordering)
+
+        header.append(bytes([Node.END_OF_NODE]))
+
+    def get_data(self) -> bytes:
+        """
+        Encode the header and body into binary formrt.
+
+        Returns:
+            Binary blob of data that can be decoded by a game.
+        """
+        if self.executed:
+            raise Exception("Logic error, should only call this once per instance")
+        self.executed = True
+
+        # Generate the header first
+        chunks: List[bytes] = []
+        ordering: List[Tuple[Node, Optional[str]]] = []
+        self.__write_node(self.tree, chunks, ordering)
+        chunks.append(bytes([Node.END_OF_DOCUMENT]))
+        header = b''.join(chunks)
+        header += b'\0' * ((4 - (len(header) & 3)) & 3)
+
+        # Generate the body
+        body = bytearray()
+        layout = _BodyLayout()
+
+        def add_data(data: bytes, loc: int) -> None:
+            end = loc + len(data)
+            if len(body) < end:
+                body.extend(b'\0' * (((end + 3) & ~3) - len(body)))
+            body[loc:end] = data
+
+        for node, attr in ordering:
+            if attr is not None:
+                attrval = node.attribute(attr)
+                if attrval is None:
+                    raise BinaryEncodingException(f'Node \'{attr}\' has invalid value None')
+                if not isinstance(attrval, str):
+                    raise BinaryEncodingException(f'Node \'{attr}\' has non-string value!')
+                try:
+                    valbytes = attrval.encode(self.encoding) + b'\0'
+                except UnicodeEncodeError:
+                    raise BinaryEncodingException(f'Node \'{attr}\' has un-encodable string value \'{attrval}\'')
+
+                loc = layout.allocate(len(valbytes) + 4)
+                add_data(struct.pack('>I', len(valbytes)) + valbytes, loc)
+                continue
+
+            val = node.value
+            if val is None:
+                raise BinaryEncodingException(f'Node \'{node.name}\' has invalid value None')
+
+            size = node.data_length
+            enc = node.data_encoding
+            dtype = node.data_type
+
+            if node.is_array:
+                if size is None:
+                    raise Exception("Logic error, node size not set yet this is not an attribute!")
+                if dtype == 'bool':
+                    val = [1 if v else 0 for v in val]
+                packed = struct.pack(f'>{enc * len(val)}', *val)
+                loc = layout.allocate(len(packed) + 4)
+                add_data(struct.pack('>I', len(packed)) + packed, loc)
+            elif dtype == 'str':
+                # Need to convert this to encoding from standard string.
+                # Also, need to add the trailing null.
+                if not isinstance(val, str):
+                    raise BinaryEncodingException(f'Node \'{node.name}\' has non-string value!')
+                try:
+                    valbytes = val.encode(self.encoding) + b'\0'
+                except UnicodeEncodeError:
+                    raise BinaryEncodingException(f'Node \'{node.name}\' has un-encodable string value \'{val}\'')
+
+                loc = layout.allocate(len(valbytes) + 4)
+                add_data(struct.pack('>I', len(valbytes)) + valbytes, loc)
+            elif dtype == 'bin':
+                # Store raw binary
+                loc = layout.allocate(len(val) + 4)
+                add_data(struct.pack('>I', len(val)) + val, loc)
+            else:
+                if size is None:
+                    raise Exception("Logic error, node size not set yet this is not an attribute!")
+                if node.is_composite:
+                    packed = struct.pack(f'>{enc}', *val)
+                elif dtype == 'bool':
+                    packed = struct.pack(f'>{enc}', 1 if val else 0)
+                else:
+                    packed = struct.pack(f'>{enc}', val)
+                add_data(packed, layout.allocate(size))
+
+        return b''.join([
+            struct.pack('>I', len(header)),
+            header,
+            struct.pack('>I', len(body)),
+            bytes(body),
+        ])
+
+
 class BinaryEncoding:
     """
     Wrapper class representing a Binary Encoding.
@@ -779,7 +1226,7 @@ class BinaryEncoding:
         if encoding is not None:
             self.encoding = encoding
             try:
-                decoder = BinaryDecoder(data[4:], self.__sanitize_encoding(encoding))
+                decoder = FastBinaryDecoder(data[4:], self.__sanitize_encoding(encoding))
                 return decoder.get_tree()
             except BinaryEncodingException:
                 if skip_on_exceptions:
@@ -815,6 +1262,6 @@ class BinaryEncoding:
         if encoding_magic is None:
             raise BinaryEncodingException(f"Invalid text encoding {encoding}")
 
-        encoder = BinaryEncoder(tree, self.__sanitize_encoding(encoding))
+        encoder = FastBinaryEncoder(tree, self.__sanitize_encoding(encoding))
         data = encoder.get_data()
         return struct.pack(">BBBB", BinaryEncoding.MAGIC, BinaryEncoding.COMPRESSED_WITH_DATA, encoding_magic, (~encoding_magic & 0xFF)) + data
@@ -1,7 +1,6 @@
 import ctypes
 import os
-from collections import defaultdict
-from typing import Generator, List, MutableMapping, Optional, Set, Tuple
+from typing import Generator, List, Optional, Tuple
 from typing_extensions import Final
 
 from .. import package_root
@@ -212,89 +211,242 @@ class Lz77Decompress:
             self.eof = True
             return
 
+    def decompress_all(self) -> bytes:
+        """
+        Decompress the entire stream in a single pass. Instead of maintaining a
+        separate backref ring, this writes into one growing output buffer and
+        resolves backrefs by indexing directly into what we've already output.
+        The result is byte-identical to joining the output of decompress_bytes().
+
+        Returns:
+            binary string representing the decompressed data.
+        """
+        if self.ringlength < self.RING_LENGTH:
+            # A backref can reach further back than a ring this small, which
+            # means it wraps around and reads data we have since overwritten.
+            # Only the ring implementation models that correctly.
+            return b''.join(self.decompress_bytes())
+
+        data = self.data
+        datalen = len(data)
+        out = bytearray()
+        read_pos = 0
+        flags = 1
+
+        while True:
+            if flags == 1:
+                # Load the next byte for processing
+                if read_pos >= datalen:
+                    break
+                flags = 0x100 | data[read_pos]
+                read_pos += 1
+
+            if (flags & 1) == self.FLAG_COPY:
+                # Pull every consecutive copy out of the data source at once.
+                flags >>= 1
+                amount = 1
+                while flags != 1 and (flags & 1) == self.FLAG_COPY:
+                    flags >>= 1
+                    amount += 1
+
+                out += data[read_pos:(read_pos + amount)]
+                read_pos += amount
+                continue
+
+            flags >>= 1
+            if read_pos >= datalen:
+                break
+            if read_pos + 1 >= datalen:
+                raise LzException('Unexpected EOF mid-backref')
+
+            hi = data[read_pos]
+            lo = data[read_pos + 1]
+            read_pos += 2
+
+            copy_pos = (hi << 4) | (lo >> 4)
+            if copy_pos == 0:
+                break
+            copy_len = (lo & 0xF) + 3
+
+            start = len(out) - copy_pos
+            end = start + min(copy_pos, copy_len)
+            if start >= 0:
+                chunk = out[start:end]
+            else:
+                # Anything before the start of the output is the ring's initial zeros.
+                chunk = bytearray(min(-start, end - start)) + out[0:max(0, end)]
+
+            if copy_len > copy_pos:
+                # Overlapped backref, which repeats the chunk we just found.
+                chunk = (chunk * ((copy_len // copy_pos) + 1))[:copy_len]
+            out += chunk
+
+        self.eof = True
+        return bytes(out)
+
 
 class Lz77Compress:
     """
     A class that can compress arbitrary binary data using the Lz77 protocol.
     Note that this does support overlapped backtracks, so for instance the
     string "abcabcabc" will be compressed properly (see unit tests for examples).
-    Great care has been taken in optimizing this and then we further optimize
-    by using Cython to build, netting us another 40% speed-up. This is important
+    Matches are found using a hash chain over every three byte prefix, where
+    the chain only ever spans one backref window. This keeps memory bounded
+    no matter how large the input is. Great care has been taken in optimizing
+    this and then we further optimize by using Cython to build. This is important
     because for any given packet we are decompressing and compressing at least
     once, and if we use a proxy to direct traffic, possibly a second time.
     """
 
     RING_LENGTH: Final[int] = 0x1000
 
-    LOOSE_COMPRESS_THRESHOLD: Final[int] = 1024 * 512
+    # Number of buckets for three byte prefixes. Must be a power of two.
+    HASH_LENGTH: Final[int] = 0x8000
+
+    MIN_BACKREF: Final[int] = 3
+    MAX_BACKREF: Final[int] = 18
+    MAX_DISTANCE: Final[int] = 0xFFF
+
+    # Only look at the most recent handful of candidates and take the first
+    # good match, suitable for compressing packets while a game waits on them.
+    LEVEL_FAST: Final[int] = 1
+    # Look much further back through the candidates and defer a match by one
+    # byte if that finds a longer one, suitable for offline file repacking.
+    LEVEL_BEST: Final[int] = 2
 
     FLAG_COPY: Final[int] = 1
     FLAG_BACKREF: Final[int] = 0
 
-    def __init__(self, data: bytes, backref: Optional[int] = None) -> None:
+    def __init__(self, data: bytes, backref: Optional[int] = None, level: Optional[int] = None) -> None:
         """
         Initialize the object.
 
         Parameters:
-            data - Binary blob representing the data to be decompressed.
+            data - Binary blob representing the data to be compressed.
+            backref - Optional ring length to use instead of the default.
+            level - Optional compression level, should be LEVEL_FAST or LEVEL_BEST.
         """
         self.data: bytes = data
         self.read_pos: int = 0
-        self.left: int = len(self.data)
         self.eof: bool = False
-        self.bytes_written: int = 0
         self.ringlength: int = backref or self.RING_LENGTH
-        self.locations: MutableMapping[int, Set[int]] = defaultdict(set)
-        self.starts: MutableMapping[bytes, Set[int]] = defaultdict(set)
-        self.last_start: Tuple[int, int, int] = (0, 0, 0)
-
-        if len(data) > self.LOOSE_COMPRESS_THRESHOLD:
-            self._ring_write = self._ring_write_starts_only
+        self.level: int = self.LEVEL_FAST if level is None else level
+
+        if self.level == self.LEVEL_FAST:
+            self.max_chain: int = 16
+            self.lazy: bool = False
+        elif self.level == self.LEVEL_BEST:
+            self.max_chain = 256
+            self.lazy = True
         else:
-            self._ring_write = self._ring_write_both
+            raise LzException(f"Unknown compression level {level}")
+
+        # Most recent position for each prefix hash, and for each position in the
+        # window the previous position with the same prefix hash.
+        self.head: List[int] = [-1] * self.HASH_LENGTH
+        self.prev: List[int] = [-1] * self.ringlength
+        self.inserted: int = 0
+        self.lookahead: Optional[Tuple[int, Tuple[int, int]]] = None
 
-    def _ring_write_starts_only(self, bytedata: bytes) -> None:
+    def _insert(self, until: int) -> None:
         """
-        Write bytes into the backref ring.
+        Add every position before a given position to the hash chains.
 
         Parameters:
-            byte - A byte to be written at the current write offset
+            until - The position to stop at, exclusive.
+        """
+        data = self.data
+        last = min(until, len(data) - 2)
+        while self.inserted < last:
+            pos = self.inserted
+            key = ((data[pos] << 10) ^ (data[pos + 1] << 5) ^ data[pos + 2]) & (self.HASH_LENGTH - 1)
+            self.prev[pos % self.ringlength] = self.head[key]
+            self.head[key] = pos
+            self.inserted += 1
+        if until > self.inserted:
+            self.inserted = until
+
+    def _find_match(self, pos: int) -> Tuple[int, int]:
+        """
+        Find the longest backref for the data at a given position.
+
+        Parameters:
+            pos - The position in the data to find a backref for.
+
+        Returns:
+            A tuple of the backref length and distance, or (0, 0) if there is
+            no backref long enough to be worth using.
         """
-        for byte in bytedata:
-            # Update the start locations hashmap if we're past the beginning
-            self.last_start = (self.last_start[1], self.last_start[2], byte)
-            if self.bytes_written >= 2:
-                self.starts[bytes(self.last_start)].add(self.bytes_written - 2)
+        data = self.data
+        maxlen = min(self.MAX_BACKREF, len(data) - pos)
+        if maxlen < self.MIN_BACKREF:
+            return (0, 0)
+
+        self._insert(pos)
+        earliest = max(0, pos - min(self.ringlength - 1, self.MAX_DISTANCE))
+        key = ((data[pos] << 10) ^ (data[pos + 1] << 5) ^ data[pos + 2]) & (self.HASH_LENGTH - 1)
+
+        best_length = 0
+        best_distance = 0
+        chain = self.max_chain
+        candidate = self.head[key]
+        while candidate >= earliest and chain > 0:
+            chain -= 1
+
+            # Only bother checking if this could possibly beat our current best.
+            if data[candidate + best_length] == data[pos + best_length]:
+                length = 0
+                while length < maxlen and data[candidate + length] == data[pos + length]:
+                    length += 1
+
+                if length > best_length:
+                    best_length = length
+                    best_distance = pos - candidate
+                    if length == maxlen:
+                        # We found an ideal length, no need to keep searching.
+                        break
+
+            candidate = self.prev[candidate % self.ringlength]
 
-            # Keep track of the fact that we wrote this byte.
-            self.bytes_written += 1
+        if best_length < self.MIN_BACKREF:
+            return (0, 0)
+        return (best_length, best_distance)
 
-    def _ring_write_both(self, bytedata: bytes) -> None:
+    def _next_match(self) -> Tuple[int, int]:
         """
-        Write bytes into the backref ring.
+        Find the backref to output at the current read position, taking into
+        account lazy matching when compressing at the best level.
 
-        Parameters:
-            byte - A byte to be written at the current write offset
+        Returns:
+            A tuple of the backref length and distance, or (0, 0) if the next
+            byte should be output as a copy.
         """
-        for byte in bytedata:
-            # Update the start locations hashmap if we're past the beginning
-            self.last_start = (self.last_start[1], self.last_start[2], byte)
-            if self.bytes_written >= 2:
-                self.starts[bytes(self.last_start)].add(self.bytes_written - 2)
+        pos = self.read_pos
+        if self.lookahead is not None and self.lookahead[0] == pos:
+            match = self.lookahead[1]
+            self.lookahead = None
+        else:
+            match = self._find_match(pos)
 
-            # Update the rest of the location hashmaps
-            self.locations[byte].add(self.bytes_written)
+        if self.lazy and 0 < match[0] < self.MAX_BACKREF:
+            # See if we would be better off outputting this byte as a copy and
+            # then using a longer backref that starts at the next byte.
+            lookahead = self._find_match(pos + 1)
+            if lookahead[0] > match[0]:
+                self.lookahead = (pos + 1, lookahead)
+                return (0, 0)
 
-            # Keep track of the fact that we wrote this byte.
-            self.bytes_written += 1
+        return match
 
     def compress_bytes(self) -> Generator[bytes, None, None]:
         """
         Given the current stream, go through and assemble the next flag byte
         followed by the next chunk of compressed data.
         """
+        datalen = len(self.data)
+
         while not self.eof:
-            if self.left == 0:
+            if self.read_pos >= datalen:
                 # Output a dummy flag and an end of stream marker.
                 self.eof = True
                 yield b"\x00\x00\x00"
@@ -302,115 +454,29 @@ class Lz77Compress:
                 # Need to assemble and return the next chunk, which is a flag
                 # byte and then 8 instructions.
                 flags = 0x0
-                flagpos = -1
-                data: List[bytes] = [b""] * 8
-
-                for _ in range(8):
-                    # Track what flag we're generating data for
-                    flagpos += 1
+                data: List[bytes] = []
 
-                    if self.left == 0:
+                for flagpos in range(8):
+                    if self.read_pos >= datalen:
                         # Output the end of stream marker, set EOF since we've succeeded
                         # in outputting all flags.
                         flags |= self.FLAG_BACKREF << flagpos
-                        data[flagpos] = b"\x00\x00"
+                        data.append(b"\x00\x00")
                         self.eof = True
                         break
-                    elif self.left < 3 or self.bytes_written < 3:
-                        # We either don't have enough data written to backref, or we
-                        # don't have enough data in the stream that could be made into
-                        # a backref.
-                        flags |= self.FLAG_COPY << flagpos
-
-                        chunk = self.data[self.read_pos:(self.read_pos + 1)]
-                        data[flagpos] = chunk
-                        self._ring_write(chunk)
 
-                        self.read_pos += 1
-                        self.left -= 1
-                        continue
-
-                    # Figure out the maximum backref we can attempt to find
-                    backref_amount = min(self.left, 18)
-
-                    # Iterate over all spots where the first byte equals, and is in range.
-                    earliest = max(0, self.bytes_written - (self.ringlength - 1))
-                    index = self.data[self.read_pos:(self.read_pos + 3)]
-                    updated_backref_locations: Set[int] = set(
-                        absolute_pos for absolute_pos in self.starts[index]
-                        if absolute_pos >= earliest
-                    )
-                    self.starts[index] = updated_backref_locations
-                    possible_backref_locations: List[int] = list(updated_backref_locations)
-
-                    # Output the data as a copy if we couldn't find a backref
-                    if not possible_backref_locations:
+                    copy_amount, backref_pos = self._next_match()
+                    if copy_amount == 0:
+                        # Output the data as a copy since we couldn't find a backref.
                         flags |= self.FLAG_COPY << flagpos
-
-                        chunk = self.data[self.read_pos:(self.read_pos + 1)]
-                        data[flagpos] = chunk
-                        self._ring_write(chunk)
-
+                        data.append(self.data[self.read_pos:(self.read_pos + 1)])
                         self.read_pos += 1
-                        self.left -= 1
-                        continue
-
-                    # Now, find the longest actual backref of our possibilities. We know
-                    # we're going to write at least these three bytes, so append it to the
-                    # output buffer.
-                    start_write_size = self.bytes_written
-                    self._ring_write(index)
-                    copy_amount = 3
-                    while copy_amount < backref_amount:
-                        # First, let's see if we have any 3-wide chunks to consume.
-                        index = self.data[(self.read_pos + copy_amount):(self.read_pos + copy_amount + 3)]
-                        locations = self.starts[index]
-                        new_backref_locations: List[int] = [
-                            absolute_pos for absolute_pos in possible_backref_locations
-                            if absolute_pos + copy_amount in locations
-                        ]
-
-                        if new_backref_locations:
-                            # Mark that we're copying an extra byte from the backref.
-                            self._ring_write(index)
-                            copy_amount += 3
-                            possible_backref_locations = new_backref_locations
-                        else:
-                            # Check our existing locations to figure out if we still have
-                            # longest prefixes of 1 or 2 left.
-                            while copy_amount < backref_amount:
-                                locations = self.locations[self.data[self.read_pos + copy_amount]]
-                                new_backref_locations = [
-                                    absolute_pos for absolute_pos in possible_backref_locations
-                                    if absolute_pos + copy_amount in locations
-                                ]
-
-                                # If we have no longest prefixes, that means that any of the
-                                # previous prefixes are good enough.
-                                if not new_backref_locations:
-                                    break
-
-                                # Mark that we're copying an extra byte from the backref.
-                                self._ring_write(self.data[(self.read_pos + copy_amount):(self.read_pos + copy_amount + 1)])
-                                copy_amount += 1
-                                possible_backref_locations = new_backref_locations
-
-                            # Either we looped above in the inner while, or we didn't. Either way,
-                            # we don't have any more to check since there were no more 3-long backref
-                            # locations.
-                            break
-
-                    # Now that we have a list of candidates, arbitrarily pick the
-                    # first one as our candidate and output it.
-                    absolute_pos = possible_backref_locations[0]
-                    backref_pos = start_write_size - absolute_pos
-
-                    lo = (copy_amount - 3) & 0xF | ((backref_pos & 0xF) << 4)
-                    hi = (backref_pos >> 4) & 0xFF
-                    flags |= self.FLAG_BACKREF << flagpos
-                    data[flagpos] = bytes([hi, lo])
-                    self.read_pos += copy_amount
-                    self.left -= copy_amount
+                    else:
+                        lo = (copy_amount - 3) & 0xF | ((backref_pos & 0xF) << 4)
+                        hi = (backref_pos >> 4) & 0xFF
+                        flags |= self.FLAG_BACKREF << flagpos
+                        data.append(bytes([hi, lo]))
+                        self.read_pos += copy_amount
 
                 yield bytes([flags]) + b"".join(data)
 
@@ -455,18 +521,24 @@ class Lz77:
                 raise LzException("Unknown exception in C++ code!")
         else:
             lz = Lz77Decompress(data, backref=self.backref)
-            return b''.join(lz.decompress_bytes())
+            return lz.decompress_all()
 
-    def compress(self, data: bytes) -> bytes:
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
         """
         Given a binary blob, return a new binary blob representing the compressed data.
 
         Parameters:
             data - Raw binary data.
+            level - Optional compression level, should be Lz77Compress.LEVEL_FAST (the
+                    default) or Lz77Compress.LEVEL_BEST. The C++ implementation always
+                    searches the whole window, so this only affects the python fallback.
 
         Returns:
             L7zz-compressed binary data.
         """
+        if level not in (None, Lz77Compress.LEVEL_FAST, Lz77Compress.LEVEL_BEST):
+            raise LzException(f"Unknown compression level {level}")
+
         if clib is not None:
             # Given a worst case scenario where we end up copying every byte to
             # the output, compression would actually inflate the file by 9/8 size.
@@ -484,5 +556,5 @@ class Lz77:
             else:
                 raise LzException("Unknown exception in C++ code!")
         else:
-            lz = Lz77Compress(data, backref=self.backref)
+            lz = Lz77Compress(data, backref=self.backref, level=level)
             return b''.join(lz.compress_bytes())
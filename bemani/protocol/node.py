@@ -1,5 +1,5 @@
-import copy
 import struct
+import sys
 from typing import Any, Dict, List, Optional, Union
 from typing_extensions import Final
 
@@ -23,6 +23,22 @@ class Node:
     """
     NODE_NAME_CHARS: Final[str] = "0123456789:ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
 
+    # Packets are made up of many thousands of small nodes, so keep them as compact
+    # as possible. Attributes are only allocated when a node has some, and the
+    # index used by child() is only built when somebody looks up a child by name.
+    __slots__ = (
+        '__name',
+        '__array',
+        '__translated_type',
+        '__type',
+        '__attrs',
+        '__value',
+        '__children',
+        '__index',
+        '__indexed',
+    )
+    __NAME_CHARS: Final[frozenset] = frozenset(NODE_NAME_CHARS)
+
     NODE_TYPE_VOID: Final[int] = 1
     NODE_TYPE_S8: Final[int] = 2
     NODE_TYPE_U8: Final[int] = 3
@@ -556,9 +572,11 @@ class Node:
         self.__array = False
         self.__translated_type: Optional[Dict[str, Any]] = None
         self.__type: Optional[int] = None
-        self.__attrs: Dict[str, str] = {}
+        self.__attrs: Optional[Dict[str, str]] = None
         self.__value: Any = None
         self.__children: List[Node] = []
+        self.__index: Optional[Dict[str, Node]] = None
+        self.__indexed = 0
 
         if name is not None:
             self.set_name(name)
@@ -576,11 +594,11 @@ class Node:
                 NODE_NAME_CHARS characters.
         """
         # Ensure it isn't a violation
-        for char in name:
-            if char not in Node.NODE_NAME_CHARS:
-                raise NodeException(f'Invalid node name {name}')
+        if not Node.__NAME_CHARS.issuperset(name):
+            raise NodeException(f'Invalid node name {name}')
 
-        self.__name = name
+        # The same handful of names show up over and over again in every packet.
+        self.__name = sys.intern(name)
 
     @property
     def name(self) -> str:
@@ -679,6 +697,8 @@ class Node:
             val - The string value to set the attribute value to. Defaults to empty string if
                   not provided.
         """
+        if self.__attrs is None:
+            self.__attrs = {}
         self.__attrs[attr] = val
 
     def attribute(self, attr: str, default: Optional[str]=None) -> Optional[str]:
@@ -691,6 +711,8 @@ class Node:
         Returns:
             The attribute value as a string.
         """
+        if self.__attrs is None:
+            return default
         return self.__attrs.get(attr, default)
 
     def add_child(self, child: 'Node') -> None:
@@ -704,6 +726,10 @@ class Node:
             raise NodeException('Invalid child')
 
         self.__children.append(child)
+        if self.__index is not None and self.__indexed == len(self.__children) - 1:
+            # Keep the index up to date, remembering that child() finds the first match.
+            self.__index.setdefault(child.__name, child)
+            self.__indexed += 1
 
     def child(self, name: str) -> Optional['Node']:
         """
@@ -717,18 +743,37 @@ class Node:
         Returns:
             A Node if a child was found by name, or None if not.
         """
-        tree = name.split('/', 1)
-        for child in self.__children:
-            if child.name == tree[0]:
-                if len(tree) == 1:
-                    # We don't have any more nodes to traverse.
-                    return child
-                else:
-                    # We have more nodes, try to get the next.
-                    return child.child(tree[1])
+        if '/' not in name:
+            return self.__find_child(name)
+
+        node: Optional[Node] = self
+        for part in name.split('/'):
+            node = node.__find_child(part)
+            if node is None:
+                # There was no child by this name, return None.
+                return None
+        return node
+
+    def __find_child(self, name: str) -> Optional['Node']:
+        """
+        Find the first direct child with a given name, building an index of
+        children by name the first time this is called on a node.
 
-        # There was no child by this name, return None.
-        return None
+        Parameters:
+            name - String name of the child to find, without any slashes.
+
+        Returns:
+            A Node if a child was found by name, or None if not.
+        """
+        children = self.__children
+        index = self.__index
+        if index is None or self.__indexed != len(children):
+            index = {}
+            for child in children:
+                index.setdefault(child.__name, child)
+            self.__index = index
+            self.__indexed = len(children)
+        return index.get(name)
 
     def child_value(self, name: str) -> Optional[Any]:
         """
@@ -765,8 +810,21 @@ class Node:
         Returns:
             A dictionary keyed by attribute name whose values are strings.
         """
+        if self.__attrs is None:
+            self.__attrs = {}
         return self.__attrs
 
+    @property
+    def has_attributes(self) -> _renamed_bool:
+        """
+        Returns whether this Node has any attributes, without allocating
+        an attribute dictionary for nodes that have none.
+
+        Returns:
+            True if at least one attribute is set, False otherwise.
+        """
+        return bool(self.__attrs)
+
     @property
     def is_array(self) -> _renamed_bool:
         """
@@ -882,34 +940,20 @@ class Node:
         else:
             return str_to_val(self.__value)
 
-    def __to_xml(self, depth: int) -> str:
+    def __to_xml(self, depth: int, out: List[str]) -> None:
         """
-        Convert this node, attributes and all children to an XML-like representation of the tree.
+        Convert this node, attributes and all children to an XML-like representation of the tree,
+        walking the tree once and appending to a single buffer.
 
         Parameters:
-            depth - Number of levels deep into the tree we currently are. If we shouldn't output
-                    any depth, this should be set to None.
-
-        Returns:
-            A string representing the XML-like data for this node and all children.
+            depth - Number of levels deep into the tree we currently are.
+            out - A list of strings that the XML-like data for this node and all children
+                  should be appended to.
         """
         if self.__translated_type is None:
             raise Exception('Logic error, tried to get XML representation before setting type!')
         translated_type: Dict[str, Any] = self.__translated_type
 
-        attrs_dict = copy.deepcopy(self.__attrs)
-        order = sorted(attrs_dict.keys())
-        if self.data_length != 0:
-            # Represent type and length
-            if self.__array:
-                if self.__value is None:
-                    attrs_dict['__count'] = '0'
-                else:
-                    attrs_dict['__count'] = str(len(self.__value))
-                order.insert(0, '__count')
-            attrs_dict['__type'] = translated_type['name']
-            order.insert(0, '__type')
-
         def escape(val: Any, attr: _renamed_bool=False) -> str:
             if isinstance(val, str):
                 val = val.replace('&', '&amp;')
@@ -925,11 +969,6 @@ class Node:
             else:
                 return str(val)
 
-        if attrs_dict:
-            attrs = ' ' + ' '.join([f'{attr}="{escape(attrs_dict[attr], attr=True)}"' for attr in order])
-        else:
-            attrs = ''
-
         def get_val() -> str:
             if self.__array or translated_type['composite']:
                 if self.__value is None:
@@ -940,38 +979,39 @@ class Node:
                 vals = escape(self.__value)
             elif translated_type['name'] == 'bin':
                 # Convert to a hex string
-                def bin_to_hex(binary: int) -> str:
-                    val = hex(binary)[2:]
-                    while len(val) < 2:
-                        val = '0' + val
-                    return val
-
-                vals = ''.join([bin_to_hex(v) for v in self.__value])
+                vals = self.__value.hex()
             else:
                 vals = str(self.__value)
             return vals
 
+        indent = ' ' * (depth * 4)
+        has_value = self.data_length != 0
+
+        out.append(f'{indent}<{self.__name}')
+        if has_value:
+            # Represent type and length
+            out.append(f' __type="{translated_type["name"]}"')
+            if self.__array:
+                out.append(f' __count="{0 if self.__value is None else len(self.__value)}"')
+        if self.__attrs:
+            for attr in sorted(self.__attrs):
+                out.append(f' {attr}="{escape(self.__attrs[attr], attr=True)}"')
+
         if self.__children:
             # Has children nodes
-            children = [child.__to_xml(depth=depth + 1) for child in self.__children]
-
-            if self.data_length != 0:
+            out.append('>\n')
+            if has_value:
                 # Has children and a value
-                children = [
-                    f'{" " * ((depth + 1) * 4)}{get_val()}\n',
-                ] + children
-
-            string = f'{" " * (depth * 4)}<{self.__name}{attrs}>\n{"".join(children)}{" " * (depth * 4)}</{self.__name}>\n'
+                out.append(f'{" " * ((depth + 1) * 4)}{get_val()}\n')
+            for child in self.__children:
+                child.__to_xml(depth + 1, out)
+            out.append(f'{indent}</{self.__name}>\n')
+        elif not has_value:
+            # Void node
+            out.append(' />\n')
         else:
-            # Doesn't have children nodes
-            if self.data_length == 0:
-                # Void node
-                string = f'{" " * (depth * 4)}<{self.__name}{attrs} />\n'
-            else:
-                # Node with values
-                string = f'{" " * (depth * 4)}<{self.__name}{attrs}>{get_val()}</{self.__name}>\n'
-
-        return string
+            # Node with values
+            out.append(f'>{get_val()}</{self.__name}>\n')
 
     def __str__(self) -> str:
         """
@@ -980,7 +1020,20 @@ class Node:
         Returns:
             A string that is parseable as valid XML, pretty printed.
         """
-        return self.__to_xml(0)
+        out: List[str] = []
+        self.__to_xml(0, out)
+        return ''.join(out)
+
+    def to_xml_lazy(self) -> '_LazyXml':
+        """
+        Return a placeholder for the XML-like representation of this node and its children
+        which is only rendered when it is actually converted to a string. Hand this to verbose
+        logging calls so that large trees are only formatted when the output will be shown.
+
+        Returns:
+            An object whose string conversion is equivalent to str(node).
+        """
+        return _LazyXml(self)
 
     def __eq__(self, other: object) -> _renamed_bool:
         """
@@ -1014,10 +1067,10 @@ class Node:
                     if self.__value[i] != other.__value[i]:
                         return False
 
-            for attr in self.__attrs:
+            for attr in self.__attrs or {}:
                 if other.attribute(attr) != self.attribute(attr):
                     return False
-            for attr in other.__attrs:
+            for attr in other.__attrs or {}:
                 if self.attribute(attr) != other.attribute(attr):
                     return False
 
@@ -1043,3 +1096,23 @@ class Node:
             True if this node doesn't equal the other node, False if it does equal.
         """
         return not self.__eq__(other)
+
+
+class _LazyXml:
+    """
+    Defers formatting a Node tree to XML until something asks for the string,
+    and then remembers the result in case it is asked for again.
+    """
+    __slots__ = ('__node', '__xml')
+
+    def __init__(self, node: Node) -> None:
+        self.__node = node
+        self.__xml: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self.__xml is None:
+            self.__xml = str(self.__node)
+        return self.__xml
+
+    def __repr__(self) -> str:
+        return str(self)
@@ -1,14 +1,33 @@
 import binascii
+import ctypes
 import hashlib
-from typing import Optional
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Union
 from typing_extensions import Final
 
+from .. import package_root
 from bemani.protocol.lz77 import Lz77
 from bemani.protocol.binary import BinaryEncoding
 from bemani.protocol.xml import XmlEncoding
 from bemani.protocol.node import Node
 
 
+# Attempt to use the faster C++ libraries if they're available
+try:
+    clib = None
+    clib_path = os.path.join(package_root, "protocol")
+    files = [f for f in os.listdir(clib_path) if f.startswith("rc4cpp") and f.endswith(".so")]
+    if len(files) > 0:
+        clib = ctypes.cdll.LoadLibrary(os.path.join(clib_path, files[0]))
+        clib.rc4_crypt.argtypes = (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p)
+        clib.rc4_crypt.restype = None
+except Exception:
+    clib = None
+
+
 class EAmuseException(Exception):
     """
     An exception thrown when we encounter an error with E-Amusement encapsulation.
@@ -30,33 +49,111 @@ class EAmuseProtocol:
     UTF_8: Final[str] = "utf-8"
     ASCII: Final[str] = "ascii"
 
+    # Number of derived RC4 key schedules to remember. Each cabinet sends a new
+    # X-Eamuse-Info value per request/response pair, so this only needs to cover
+    # the handful of packets in flight at any one time.
+    KEY_CACHE_SIZE: Final[int] = 64
+
+    # When adaptive compression is requested, packets larger than this are first
+    # checked by compressing a sample of this many bytes. If the sample doesn't
+    # shrink below the given ratio, the packet is sent uncompressed.
+    COMPRESS_SAMPLE_LENGTH: Final[int] = 4096
+    COMPRESS_SAMPLE_RATIO: Final[float] = 0.9
+
+    # Shared between all instances, since services creates a new protocol object
+    # for every request it receives.
+    __key_cache: "OrderedDict[str, bytes]" = OrderedDict()
+    __stats_lock: threading.Lock = threading.Lock()
+    __stats: Dict[str, Union[int, float]] = {
+        'compressed': 0,
+        'skipped_small': 0,
+        'skipped_incompressible': 0,
+        'bytes_saved': 0,
+        'compress_seconds': 0.0,
+        'decoded_binary': 0,
+        'decoded_xml': 0,
+        'decode_fallback': 0,
+        'decode_failed': 0,
+    }
+
     def __init__(self) -> None:
         """
         Initialize the object.
         """
         self.last_text_encoding: Optional[str] = None
         self.last_packet_encoding: Optional[int] = None
+        self.last_compression: Optional[str] = None
 
-    def _rc4_crypt(self, data: bytes, key: bytes) -> bytes:
+    @staticmethod
+    def stats() -> Dict[str, Union[int, float]]:
         """
-        Given a data blob and a key blob, perform RC4 encryption/decryption.
+        Return a snapshot of the process-wide protocol counters.
+
+        Returns:
+            A dictionary keyed by counter name. 'compressed', 'skipped_small' and
+            'skipped_incompressible' count how adaptive compression treated responses,
+            'bytes_saved' counts bytes not sent thanks to compression and 'compress_seconds'
+            is the CPU time spent compressing. 'decoded_binary' and 'decoded_xml' count
+            packets decoded by each codec, 'decode_fallback' counts packets whose encoding
+            couldn't be told from their first bytes and 'decode_failed' counts packets
+            that couldn't be decoded at all.
+        """
+        with EAmuseProtocol.__stats_lock:
+            return dict(EAmuseProtocol.__stats)
+
+    @staticmethod
+    def __count(stat: str, amount: Union[int, float] = 1) -> None:
+        """
+        Add to one of the process-wide protocol counters.
+
+        Parameters:
+            stat - The name of the counter, as returned in stats().
+            amount - How much to add to the counter.
+        """
+        with EAmuseProtocol.__stats_lock:
+            EAmuseProtocol.__stats[stat] += amount
+
+    def _rc4_schedule(self, key: bytes) -> bytes:
+        """
+        Given a key blob, run the RC4 key scheduling algorithm.
 
         Parameters:
-            data - Binary string representing data to be encrypted/decrypted
             key - Binary string representing the key to use
 
         Returns:
-            binary string representing the encrypted/decrypted data
+            binary string of length 256 representing the initial RC4 state
         """
         S = list(range(256))
         j = 0
-        out = []
 
         # KSA Phase
         for i in range(256):
             j = (j + S[i] + key[i % len(key)]) & 0xFF
             S[i], S[j] = S[j], S[i]
 
+        return bytes(S)
+
+    def _rc4_keystream(self, data: bytes, schedule: bytes) -> bytes:
+        """
+        Given a data blob and an initial RC4 state, perform RC4 encryption/decryption.
+
+        Parameters:
+            data - Binary string representing data to be encrypted/decrypted
+            schedule - Binary string representing the state returned from _rc4_schedule()
+
+        Returns:
+            binary string representing the encrypted/decrypted data
+        """
+        if clib is not None:
+            # Use a real buffer here instead of a bytes object, since very short
+            # bytes objects are shared singletons and must never be written to.
+            outbuf = ctypes.create_string_buffer(len(data))
+            clib.rc4_crypt(schedule, data, len(data), outbuf)
+            return outbuf.raw
+
+        S = list(schedule)
+        out = []
+
         # PRGA Phase
         i = j = 0
         for char in data:
@@ -67,21 +164,34 @@ class EAmuseProtocol:
 
         return bytes(out)
 
-    def __decrypt(self, encryption_key: Optional[str], data: bytes) -> bytes:
+    def _rc4_crypt(self, data: bytes, key: bytes) -> bytes:
         """
-        Given data and an optional encryption key, decrypt the data.
+        Given a data blob and a key blob, perform RC4 encryption/decryption.
 
         Parameters:
-            encryption_key - A string encryption key as returned from a HTTP request.
-                             Should be in the form 1-xxyyzzww-aabb. If it is None, this
-                             performs a null decrypt.
-            data - Binary string representing data to transform.
+            data - Binary string representing data to be encrypted/decrypted
+            key - Binary string representing the key to use
 
         Returns:
-            binary string representing transformed data
+            binary string representing the encrypted/decrypted data
         """
-        key: Optional[bytes] = None
-        if encryption_key:
+        return self._rc4_keystream(data, self._rc4_schedule(key))
+
+    def __key_schedule(self, encryption_key: str) -> bytes:
+        """
+        Given an encryption key as returned from a HTTP request, derive the RC4
+        key and return its initial state, reusing a previously derived state
+        if we have seen this key recently.
+
+        Parameters:
+            encryption_key - A string encryption key in the form 1-xxyyzzww-aabb.
+
+        Returns:
+            binary string of length 256 representing the initial RC4 state
+        """
+        cache = EAmuseProtocol.__key_cache
+        schedule = cache.pop(encryption_key, None)
+        if schedule is None:
             # Key is concatenated with the shared secret above
             version, first, second = encryption_key.split('-')
             key = binascii.unhexlify((first + second).encode('ascii')) + EAmuseProtocol.SHARED_SECRET
@@ -89,11 +199,33 @@ class EAmuseProtocol:
             # Next, key is sent through MD5 to derive the real key
             m = hashlib.md5()
             m.update(key)
-            key = m.digest()
+            schedule = self._rc4_schedule(m.digest())
+
+        # Re-insert so this key is the most recently used, then evict the oldest.
+        cache[encryption_key] = schedule
+        while len(cache) > EAmuseProtocol.KEY_CACHE_SIZE:
+            try:
+                cache.popitem(last=False)
+            except KeyError:
+                break
+        return schedule
+
+    def __decrypt(self, encryption_key: Optional[str], data: bytes) -> bytes:
+        """
+        Given data and an optional encryption key, decrypt the data.
 
-        if key:
+        Parameters:
+            encryption_key - A string encryption key as returned from a HTTP request.
+                             Should be in the form 1-xxyyzzww-aabb. If it is None, this
+                             performs a null decrypt.
+            data - Binary string representing data to transform.
+
+        Returns:
+            binary string representing transformed data
+        """
+        if encryption_key:
             # This is an encrypted old-style packet
-            return self._rc4_crypt(data, key)
+            return self._rc4_keystream(data, self.__key_schedule(encryption_key))
 
         # No encryption
         return data
@@ -160,6 +292,59 @@ class EAmuseProtocol:
         else:
             raise EAmuseException(f'Unknown compression {compression}')
 
+    def __adaptive_compress(self, compression: Optional[str], data: bytes, threshold: Optional[int]) -> bytes:
+        """
+        Given data, an optional compression scheme and an optional size threshold,
+        compress the data if it is worth doing so. Sets last_compression to the
+        compression that was actually used.
+
+        Parameters:
+            compression - A string specifying the compression requested. Should be
+                          of the form 'lz77' or 'none'. The python value None will
+                          also be recognized as 'none'.
+            data - Binary string representing data to transform.
+            threshold - Packets smaller than this many bytes are sent uncompressed.
+                        If None, the requested compression is always honored.
+
+        Returns:
+            binary string representing transformed data
+        """
+        if compression != 'lz77':
+            self.last_compression = compression
+            return self.__compress(compression, data)
+
+        start = time.thread_time()
+        try:
+            if threshold is None:
+                self.last_compression = compression
+                return self.__compress(compression, data)
+
+            if len(data) < threshold:
+                EAmuseProtocol.__count('skipped_small')
+                self.last_compression = 'none'
+                return data
+
+            if len(data) > EAmuseProtocol.COMPRESS_SAMPLE_LENGTH:
+                sample = data[:EAmuseProtocol.COMPRESS_SAMPLE_LENGTH]
+                if len(self.__compress(compression, sample)) >= len(sample) * EAmuseProtocol.COMPRESS_SAMPLE_RATIO:
+                    EAmuseProtocol.__count('skipped_incompressible')
+                    self.last_compression = 'none'
+                    return data
+
+            compressed = self.__compress(compression, data)
+            if len(compressed) >= len(data):
+                # Sample lied to us, or the packet was too small to sample.
+                EAmuseProtocol.__count('skipped_incompressible')
+                self.last_compression = 'none'
+                return data
+
+            EAmuseProtocol.__count('compressed')
+            EAmuseProtocol.__count('bytes_saved', len(data) - len(compressed))
+            self.last_compression = compression
+            return compressed
+        finally:
+            EAmuseProtocol.__count('compress_seconds', time.thread_time() - start)
+
     def __decode(self, data: bytes) -> Node:
         """
         Given data, decode the data into a Node tree.
@@ -170,30 +355,68 @@ class EAmuseProtocol:
         Returns:
             Node tree on success or None on failure.
         """
-        # Assume it's a binary page
+        # Binary packets always start with the binary magic, and XML packets with
+        # a tag after optional whitespace, so we can usually pick the right codec
+        # up front instead of parsing the packet twice.
+        if data[:1] == bytes([BinaryEncoding.MAGIC]):
+            ret = self.__decode_binary(data)
+        elif data.lstrip()[:1] == b'<':
+            ret = self.__decode_xml(data)
+        else:
+            # Don't know what this is, so try everything
+            EAmuseProtocol.__count('decode_fallback')
+            ret = self.__decode_binary(data)
+            if ret is None:
+                ret = self.__decode_xml(data)
+
+        if ret is not None:
+            return ret
+
+        # Couldn't decode
+        EAmuseProtocol.__count('decode_failed')
+        raise EAmuseException('Unknown packet encoding')
+
+    def __decode_binary(self, data: bytes) -> Optional[Node]:
+        """
+        Given data, attempt to decode the data as a binary packet.
+
+        Parameters:
+            data - Binary string representing data to decode.
+
+        Returns:
+            Node tree on success or None on failure.
+        """
         binary = BinaryEncoding()
         ret = binary.decode(data, skip_on_exceptions=True)
 
         if ret is not None:
             # We got a result, it was binary
+            EAmuseProtocol.__count('decoded_binary')
             self.last_text_encoding = binary.encoding
             self.last_packet_encoding = EAmuseProtocol.BINARY
 
-            return ret
+        return ret
 
-        # Assume its XML
+    def __decode_xml(self, data: bytes) -> Optional[Node]:
+        """
+        Given data, attempt to decode the data as an XML packet.
+
+        Parameters:
+            data - Binary string representing data to decode.
+
+        Returns:
+            Node tree on success or None on failure.
+        """
         xml = XmlEncoding()
         ret = xml.decode(data, skip_on_exceptions=True)
 
         if ret is not None:
             # We got a result, it was XML
+            EAmuseProtocol.__count('decoded_xml')
             self.last_text_encoding = xml.encoding
             self.last_packet_encoding = EAmuseProtocol.XML
 
-            return ret
-
-        # Couldn't decode
-        raise EAmuseException('Unknown packet encoding')
+        return ret
 
     def __encode(self, tree: Node, text_encoding: str, packet_encoding: int) -> bytes:
         """
@@ -246,6 +469,7 @@ class EAmuseProtocol:
         tree: Node,
         text_encoding: Optional[str]=None,
         packet_encoding: Optional[int]=None,
+        compress_threshold: Optional[int]=None,
     ) -> bytes:
         """
         Given a response with optional compression and encryption set, encode, compress
@@ -260,6 +484,10 @@ class EAmuseProtocol:
                             last decoded packet. See __encode for values.
             packet_encpding - A packet encoding to use. If not provided, uses the packet encoding
                               of the last decoded packet. See __encode for values.
+            compress_threshold - If provided, lz77 compression becomes adaptive. Packets smaller
+                                 than this many bytes, or that don't compress well, are sent
+                                 uncompressed instead. Check last_compression afterwards to
+                                 find out what compression was actually used.
 
         Returns:
             A blob of data representing the encoded packet.
@@ -280,5 +508,5 @@ class EAmuseProtocol:
         self.last_packet_encoding = None
 
         data = self.__encode(tree, text_encoding, packet_encoding)
-        data = self.__compress(compression, data)
+        data = self.__adaptive_compress(compression, data, compress_threshold)
         return self.__encrypt(encryption, data)
@@ -0,0 +1,26 @@
+#include <stdint.h>
+#include <string.h>
+
+extern "C"
+{
+    void rc4_crypt(uint8_t *sbox, uint8_t *indata, unsigned int inlen, uint8_t *outdata)
+    {
+        // Work on a copy of the schedule so that the caller's cached copy stays
+        // pristine for the next packet using the same key.
+        uint8_t S[256];
+        memcpy(S, sbox, 256);
+
+        // PRGA Phase
+        unsigned int i = 0;
+        unsigned int j = 0;
+        for (unsigned int pos = 0; pos < inlen; pos++)
+        {
+            i = (i + 1) & 0xFF;
+            j = (j + S[i]) & 0xFF;
+            uint8_t tmp = S[i];
+            S[i] = S[j];
+            S[j] = tmp;
+            outdata[pos] = indata[pos] ^ S[(S[i] + S[j]) & 0xFF];
+        }
+    }
+}
@@ -1,4 +1,3 @@
-import copy
 import struct
 from typing import Any, Dict, Iterator, List, Optional, Tuple
 from typing_extensions import Final
@@ -346,9 +345,10 @@ class XmlEncoder:
 
     def get_data(self) -> bytes:
         magic = f'<?xml version="1.0" encoding="{self.encoding}"?>'.encode('ascii')
-        payload = self.to_xml(self.tree)
+        out: List[bytes] = [magic]
+        self.__write(self.tree, out)
 
-        return magic + payload
+        return b''.join(out)
 
     def to_xml(self, node: Node) -> bytes:
         """
@@ -360,106 +360,111 @@ class XmlEncoder:
         Returns:
             Bytes representing the XML-like data for this node and all children.
         """
-        attrs_dict = copy.deepcopy(node.attributes)
-        order = sorted(attrs_dict.keys())
-        if node.data_length != 0:
-            # Represent type and length
-            if node.is_array:
-                if node.value is None:
-                    attrs_dict['__count'] = '0'
-                else:
-                    attrs_dict['__count'] = str(len(node.value))
-                order.insert(0, '__count')
-            attrs_dict['__type'] = node.data_type
-            order.insert(0, '__type')
-
-        def escape(val: Any, attr: bool=False) -> bytes:
-            if isinstance(val, str):
-                val = val.replace('&', '&amp;')
-                val = val.replace('<', '&lt;')
-                val = val.replace('>', '&gt;')
-                val = val.replace('\'', '&apos;')
-                val = val.replace('\"', '&quot;')
-                if attr:
-                    val = val.replace('\r', '&#13;')
-                    val = val.replace('\n', '&#10;')
-
-                return val.encode(self.encoding)
-            else:
-                return str(val).encode('ascii')
+        out: List[bytes] = []
+        self.__write(node, out)
+        return b''.join(out)
+
+    def __escape(self, val: Any, attr: bool=False) -> bytes:
+        """
+        Escape a value so it can be placed in an XML document.
+
+        Parameters:
+            val - The value to escape. Strings are escaped and encoded with the current
+                  encoding, anything else is converted to an ASCII string.
+            attr - Whether this value will be placed in an attribute, in which case
+                   newlines are escaped as well.
 
-        if attrs_dict:
-            attrs = b' ' + b' '.join([b''.join([attr.encode('ascii'), b'="', escape(attrs_dict[attr], attr=True), b'"']) for attr in order])
+        Returns:
+            Bytes representing the escaped value.
+        """
+        if isinstance(val, str):
+            val = val.replace('&', '&amp;')
+            val = val.replace('<', '&lt;')
+            val = val.replace('>', '&gt;')
+            val = val.replace('\'', '&apos;')
+            val = val.replace('\"', '&quot;')
+            if attr:
+                val = val.replace('\r', '&#13;')
+                val = val.replace('\n', '&#10;')
+
+            return val.encode(self.encoding)
         else:
-            attrs = b''
+            return str(val).encode('ascii')
 
-        if node.children:
+    def __write(self, node: Node, out: List[bytes]) -> None:
+        """
+        Walk a node, its attributes and all of its children once, appending the XML-like
+        representation to a buffer instead of building intermediate strings per element.
+
+        Parameters:
+            node - A Node representing the root of the tree to be encoded.
+            out - A list of byte chunks that the encoded data should be appended to.
+        """
+        name = node.name.encode('ascii')
+        out.append(b'<')
+        out.append(name)
+
+        has_value = node.data_length != 0
+        if has_value:
+            # Represent type and length
+            out.append(b' __type="')
+            out.append(node.data_type.encode('ascii'))
+            out.append(b'"')
+            if node.is_array:
+                value = node.value
+                out.append(b' __count="')
+                out.append(b'0' if value is None else str(len(value)).encode('ascii'))
+                out.append(b'"')
+
+        if node.has_attributes:
+            attrs = node.attributes
+            for attr in sorted(attrs):
+                out.append(b' ')
+                out.append(attr.encode('ascii'))
+                out.append(b'="')
+                out.append(self.__escape(attrs[attr], attr=True))
+                out.append(b'"')
+
+        children = node.children
+        if not children and not has_value:
+            # Void node
+            out.append(b'/>')
+            return
+
+        out.append(b'>')
+        if children:
             # Has children nodes
-            children = [self.to_xml(child) for child in node.children]
-            string = b''.join([
-                b'<',
-                node.name.encode('ascii'),
-                attrs,
-                b'>',
-                b''.join(children),
-                b'</',
-                node.name.encode('ascii'),
-                b'>',
-            ])
+            for child in children:
+                self.__write(child, out)
         else:
-            # Doesn't have children nodes
-            if node.data_length == 0:
-                # Void node
-                string = b''.join([
-                    b'<',
-                    node.name.encode('ascii'),
-                    attrs,
-                    b'/>',
-                ])
-            else:
-                # Node with values
-                if node.is_array or node.is_composite:
-                    if node.value is None:
-                        vals = ''
-                    else:
-                        if node.data_type == 'bool':
-                            vals = ' '.join([('1' if val else '0') for val in node.value])
-                        else:
-                            vals = ' '.join([str(val) for val in node.value])
-                    binary = vals.encode('ascii')
-                elif node.data_type == 'str':
-                    binary = escape(node.value)
-                elif node.data_type == 'bool':
-                    binary = b'1' if node.value else b'0'
-                elif node.data_type == 'ip4':
-                    vals = '.'.join([str(val) for val in node.value])
-                    binary = vals.encode('ascii')
-                elif node.data_type == 'bin':
-                    # Convert to a hex string
-                    def bin_to_hex(binary: int) -> str:
-                        val = hex(binary)[2:]
-                        while len(val) < 2:
-                            val = '0' + val
-                        return val
-
-                    vals = ''.join([bin_to_hex(v) for v in node.value])
-                    binary = vals.encode('ascii')
+            # Node with values
+            data_type = node.data_type
+            if node.is_array or node.is_composite:
+                value = node.value
+                if value is None:
+                    vals = ''
                 else:
-                    vals = str(node.value)
-                    binary = vals.encode('ascii')
-
-                string = b''.join([
-                    b'<',
-                    node.name.encode('ascii'),
-                    attrs,
-                    b'>',
-                    binary,
-                    b'</',
-                    node.name.encode('ascii'),
-                    b'>',
-                ])
-
-        return string
+                    if data_type == 'bool':
+                        vals = ' '.join([('1' if val else '0') for val in value])
+                    else:
+                        vals = ' '.join([str(val) for val in value])
+                out.append(vals.encode('ascii'))
+            elif data_type == 'str':
+                out.append(self.__escape(node.value))
+            elif data_type == 'bool':
+                out.append(b'1' if node.value else b'0')
+            elif data_type == 'ip4':
+                vals = '.'.join([str(val) for val in node.value])
+                out.append(vals.encode('ascii'))
+            elif data_type == 'bin':
+                # Convert to a hex string
+                out.append(node.value.hex().encode('ascii'))
+            else:
+                out.append(str(node.value).encode('ascii'))
+
+        out.append(b'</')
+        out.append(name)
+        out.append(b'>')
 
 
 class XmlEncoding:
@@ -1,11 +1,68 @@
 # vim: set fileencoding=utf-8
+import json
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+from unittest.mock import patch
 
+from bemani.common import APIConstants, GameConstants, VersionConstants
 from bemani.data.api.client import APIClient
 
 
+class StubServer(ThreadingHTTPServer):
+    """
+    A tiny BEMAPI server that answers every request with a canned response, and keeps
+    track of which connection each request came in on.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.status = 200
+        self.response: Dict[str, Any] = {}
+        self.delay = 0.0
+        self.requests: List[Tuple[int, Dict[str, Any]]] = []
+        self.thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    @property
+    def uri(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: StubServer
+
+    def do_GET(self) -> None:
+        length = int(self.headers.get('content-length', 0))
+        self.server.requests.append((self.client_address[1], json.loads(self.rfile.read(length) or b'{}')))
+        time.sleep(self.server.delay)
+
+        body = json.dumps(self.server.response).encode('utf-8')
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
 class TestAPIClient(unittest.TestCase):
 
+    def setUp(self) -> None:
+        self.server = StubServer()
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
     def test_content_type(self) -> None:
         client = APIClient('https://127.0.0.1', 'token', False, False)
         self.assertFalse(client._content_type_valid('application/text'))
@@ -19,3 +76,86 @@ class TestAPIClient(unittest.TestCase):
         self.assertTrue(client._content_type_valid('application/json;charset=UTF-8'))
         self.assertTrue(client._content_type_valid('application/json;charset = UTF-8'))
         self.assertTrue(client._content_type_valid('application/json; charset = UTF-8'))
+
+    def wait_for(self, condition: Callable[[], bool]) -> None:
+        for _ in range(100):
+            if condition():
+                return
+            time.sleep(0.02)
+        self.fail('Timed out waiting for a background request')
+
+    def get_records(self, client: APIClient) -> List[Dict[str, Any]]:
+        return client.get_records(GameConstants.IIDX, VersionConstants.IIDX_PENDUAL, APIConstants.ID_TYPE_SERVER, [])
+
+    def test_persistent_session(self) -> None:
+        self.server.response = {'statistics': []}
+        for _ in range(3):
+            client = APIClient(self.server.uri, 'token', True, True)
+            self.assertEqual(client.get_statistics(GameConstants.IIDX, VersionConstants.IIDX_PENDUAL, APIConstants.ID_TYPE_SERVER, []), [])
+
+        # Separate clients for the same server should share one kept-alive connection.
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len({port for port, _ in self.server.requests}), 1)
+
+    def test_stale_while_revalidate(self) -> None:
+        client = APIClient(self.server.uri, 'token', True, True)
+        with patch('bemani.data.api.client.Time') as fake_time:
+            fake_time.now.return_value = 1000
+            self.server.response = {'records': [{'song': '1'}]}
+            self.assertEqual(self.get_records(client), [{'song': '1'}])
+            self.assertEqual(self.get_records(client), [{'song': '1'}])
+            self.assertEqual(len(self.server.requests), 1)
+
+            # Once stale, the old records are returned right away and refreshed behind the scenes.
+            fake_time.now.return_value = 1000 + APIClient.CACHE_TIMES['records'][0]
+            self.server.response = {'records': [{'song': '2'}]}
+            self.assertEqual(self.get_records(client), [{'song': '1'}])
+            self.wait_for(lambda: self.get_records(client) == [{'song': '2'}])
+            self.assertEqual(len(self.server.requests), 2)
+
+            # Once expired, we have to wait for the server again.
+            fake_time.now.return_value = 1000 + APIClient.CACHE_TIMES['records'][0] + APIClient.CACHE_TIMES['records'][1]
+            self.server.response = {'records': [{'song': '3'}]}
+            self.assertEqual(self.get_records(client), [{'song': '3'}])
+
+        stats = APIClient.client_stats()[self.server.uri]
+        self.assertEqual(stats['requests'], 3)
+        self.assertGreaterEqual(stats['stale_hits'], 1)
+
+    def test_deadline(self) -> None:
+        client = APIClient(self.server.uri, 'token', True, True, deadline=0.1)
+        self.server.response = {'records': [{'song': '1'}]}
+        self.server.delay = 0.5
+
+        # A slow server shouldn't hold up the caller, but its answer is kept for next time.
+        start = time.time()
+        self.assertEqual(self.get_records(client), [])
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(APIClient.client_stats()[self.server.uri]['deadline_exceeded'], 1)
+        self.wait_for(lambda: self.get_records(client) == [{'song': '1'}])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_circuit_breaker(self) -> None:
+        client = APIClient(self.server.uri, 'token', True, True)
+        with patch('bemani.data.api.client.Time') as fake_time:
+            fake_time.now.return_value = 1000
+            self.server.status = 500
+            self.server.response = {'error': 'broken'}
+            for _ in range(APIClient.CIRCUIT_FAILURE_THRESHOLD + 2):
+                self.assertEqual(self.get_records(client), [])
+            self.assertEqual(len(self.server.requests), APIClient.CIRCUIT_FAILURE_THRESHOLD)
+            self.assertEqual(APIClient.client_stats()[self.server.uri]['short_circuited'], 2)
+
+            # After the reset time, the server gets another chance and closes the circuit.
+            fake_time.now.return_value = 1000 + APIClient.CIRCUIT_RESET_TIME
+            self.server.status = 200
+            self.server.response = {'records': [{'song': '1'}]}
+            self.assertEqual(self.get_records(client), [{'song': '1'}])
+            self.assertEqual(APIClient.client_stats()[self.server.uri]['consecutive_failures'], 0)
+
+        # Servers that reject us are healthy, so that doesn't open the circuit.
+        self.server.status = 401
+        self.server.response = {'error': 'go away'}
+        for _ in range(APIClient.CIRCUIT_FAILURE_THRESHOLD + 1):
+            self.assertEqual(client.get_statistics(GameConstants.IIDX, VersionConstants.IIDX_PENDUAL, APIConstants.ID_TYPE_SERVER, []), [])
+        self.assertEqual(APIClient.client_stats()[self.server.uri]['short_circuited'], 2)
@@ -0,0 +1,119 @@
+# vim: set fileencoding=utf-8
+import os
+import random
+import struct
+import unittest
+from typing import Any
+
+from bemani.protocol.binary import BinaryDecoder, BinaryEncoder, FastBinaryDecoder, FastBinaryEncoder
+from bemani.protocol.node import Node
+
+
+class TestBinaryEncoding(unittest.TestCase):
+
+    # The reference implementation doesn't know how to align 3 byte composites,
+    # so leave those out when comparing the two.
+    SKIPPED_TYPES = {
+        Node.NODE_TYPE_VOID,
+        Node.NODE_TYPE_3S8,
+        Node.NODE_TYPE_3U8,
+    }
+
+    ARRAY_TYPES = [
+        Node.NODE_TYPE_S8,
+        Node.NODE_TYPE_U8,
+        Node.NODE_TYPE_S16,
+        Node.NODE_TYPE_U16,
+        Node.NODE_TYPE_S32,
+        Node.NODE_TYPE_U32,
+        Node.NODE_TYPE_S64,
+        Node.NODE_TYPE_U64,
+        Node.NODE_TYPE_TIME,
+        Node.NODE_TYPE_FLOAT,
+        Node.NODE_TYPE_BOOL,
+    ]
+
+    def random_name(self) -> str:
+        return ''.join(random.choice(Node.NODE_NAME_CHARS) for _ in range(random.randint(1, 20)))
+
+    def random_string(self) -> str:
+        return ''.join(random.choice('abcdefXYZ0123 _-あいうアイウ') for _ in range(random.randint(0, 12)))
+
+    def random_scalar(self, enc: str) -> Any:
+        if enc == 'f':
+            # Stick to values that survive a trip through a 32 bit float.
+            return random.randint(-1000, 1000) / 4
+        if enc == 'd':
+            return random.random() * 1000
+        size = struct.calcsize(enc)
+        if enc.isupper():
+            return random.randint(0, (1 << (size * 8)) - 1)
+        return random.randint(-(1 << (size * 8 - 1)), (1 << (size * 8 - 1)) - 1)
+
+    def random_node(self, depth: int) -> Node:
+        if depth > 0 and random.random() < 0.4:
+            node = Node.void(self.random_name())
+            for _ in range(random.randint(0, 6)):
+                node.add_child(self.random_node(depth - 1))
+        elif random.random() < 0.2:
+            nodetype = random.choice(self.ARRAY_TYPES)
+            enc = Node.NODE_TYPES[nodetype]['enc']
+            values = [self.random_scalar(enc) for _ in range(random.randint(0, 10))]
+            if nodetype == Node.NODE_TYPE_BOOL:
+                values = [random.choice([True, False]) for _ in values]
+            node = Node(name=self.random_name(), type=nodetype, array=True, value=values)
+        else:
+            nodetype = random.choice([t for t in Node.NODE_TYPES if t not in self.SKIPPED_TYPES])
+            typeinfo = Node.NODE_TYPES[nodetype]
+            value: Any
+            if typeinfo['name'] == 'str':
+                value = self.random_string()
+            elif typeinfo['name'] == 'bin':
+                value = os.urandom(random.randint(0, 20))
+            elif typeinfo['name'] == 'ip4':
+                value = os.urandom(4)
+            elif typeinfo['name'] == 'bool':
+                value = random.choice([True, False])
+            elif typeinfo['composite']:
+                value = [self.random_scalar(enc) for enc in typeinfo['enc']]
+            else:
+                value = self.random_scalar(typeinfo['enc'])
+            node = Node(name=self.random_name(), type=nodetype, value=value)
+
+        for _ in range(random.choice([0, 0, 1, 3])):
+            node.set_attribute(self.random_name(), self.random_string())
+        return node
+
+    def test_fuzz_against_reference(self) -> None:
+        for _ in range(200):
+            root = self.random_node(4)
+
+            reference = BinaryEncoder(root, 'shift-jis').get_data()
+            fast = FastBinaryEncoder(root, 'shift-jis').get_data()
+            self.assertEqual(reference, fast)
+
+            reference_tree = BinaryDecoder(reference, 'shift-jis').get_tree()
+            fast_tree = FastBinaryDecoder(reference, 'shift-jis').get_tree()
+            self.assertEqual(root, reference_tree)
+            self.assertEqual(root, fast_tree)
+
+    def test_packing(self) -> None:
+        # See the example in PackedOrdering.
+        root = Node.u8('a', 1)
+        root.add_child(Node.string('b', 'hi'))
+        root.add_child(Node.s16('c', 3))
+        root.add_child(Node.u8('d', 4))
+
+        data = FastBinaryEncoder(root, 'ascii').get_data()
+        self.assertEqual(data, BinaryEncoder(root, 'ascii').get_data())
+        self.assertEqual(data[-20:], b'\x00\x00\x00\x10\x01\x04\x00\x00\x00\x00\x00\x03hi\x00\x00\x00\x03\x00\x00')
+        self.assertEqual(FastBinaryDecoder(data, 'ascii').get_tree(), root)
+
+    def test_struct_cache_bounded(self) -> None:
+        root = Node.void('root')
+        for count in range(FastBinaryDecoder.STRUCTS_SIZE + 10):
+            root.add_child(Node.u16_array('a', [count] * count))
+        data = FastBinaryEncoder(root, 'ascii').get_data()
+
+        self.assertEqual(FastBinaryDecoder(data, 'ascii').get_tree(), root)
+        self.assertLessEqual(len(FastBinaryDecoder.STRUCTS), FastBinaryDecoder.STRUCTS_SIZE)
@@ -0,0 +1,157 @@
+# vim: set fileencoding=utf-8
+import io
+import os
+import random
+import struct
+import unittest
+from typing import Any, List, Optional, Tuple
+from unittest.mock import patch
+
+from bemani.format import dxt
+from bemani.format.dxt import DXTBuffer
+
+
+class ReferenceDXTBuffer:
+    """
+    The original pixel at a time decoder, kept around to verify the fast paths against.
+    """
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.block_countx = self.width // 4
+        self.block_county = self.height // 4
+        self.decompressed_buffer: List[Optional[bytes]] = [None] * ((width * height) * 2)
+
+    def unpackRGB(self, packed: int) -> Tuple[int, int, int]:
+        R = (packed >> 11) & 0x1F
+        G = (packed >> 5) & 0x3F
+        B = (packed) & 0x1F
+        return ((R << 3) | (R >> 2), (G << 2) | (G >> 4), (B << 3) | (B >> 2))
+
+    def swapbytes(self, data: bytes, swap: bool) -> bytes:
+        if swap:
+            return b"".join([data[(x + 1):(x + 2)] + data[x:(x + 1)] for x in range(0, len(data), 2)])
+        return data
+
+    def DXT5Decompress(self, filedata: bytes, swap: bool = False) -> bytes:
+        file = io.BytesIO(filedata)
+        for row in range(self.block_county):
+            for col in range(self.block_countx):
+                a0, a1, acode0, acode1, c0, c1, ctable = struct.unpack("<BBHIHHI", self.swapbytes(file.read(16), swap))
+                for j in range(4):
+                    for i in range(4):
+                        alpha = self.getAlpha(i, j, a0, a1, (acode1 << 16) | acode0)
+                        self.getColors(col * 4, row * 4, i, j, ctable, c0, c1, alpha)
+        return b''.join([x for x in self.decompressed_buffer if x is not None])
+
+    def DXT1Decompress(self, filedata: bytes, swap: bool = False) -> bytes:
+        file = io.BytesIO(filedata)
+        for row in range(self.block_county):
+            for col in range(self.block_countx):
+                c0, c1, ctable = struct.unpack("<HHI", self.swapbytes(file.read(8), swap))
+                for j in range(4):
+                    for i in range(4):
+                        self.getColors(col * 4, row * 4, i, j, ctable, c0, c1, 255)
+        return b''.join([x for x in self.decompressed_buffer if x is not None])
+
+    def getColors(self, x: int, y: int, i: int, j: int, ctable: int, c0: int, c1: int, alpha: int) -> None:
+        code = (ctable >> (2 * ((4 * j) + i))) & 0x03
+        r0, g0, b0 = self.unpackRGB(c0)
+        r1, g1, b1 = self.unpackRGB(c1)
+
+        pixel_color: Any = None
+        if code == 0:
+            pixel_color = (r0, g0, b0, alpha)
+        if code == 1:
+            pixel_color = (r1, g1, b1, alpha)
+        if code == 2:
+            if c0 > c1:
+                pixel_color = ((2 * r0 + r1) // 3, (2 * g0 + g1) // 3, (2 * b0 + b1) // 3, alpha)
+            else:
+                pixel_color = ((r0 + r1) // 2, (g0 + g1) // 2, (b0 + b1) // 2, alpha)
+        if code == 3:
+            if c0 > c1:
+                pixel_color = ((r0 + 2 * r1) // 3, (g0 + 2 * g1) // 3, (b0 + 2 * b1) // 3, alpha)
+            else:
+                pixel_color = (0, 0, 0, alpha)
+
+        if pixel_color is not None and (x + i) < self.width and (y + j) < self.height:
+            self.decompressed_buffer[(y + j) * self.width + (x + i)] = struct.pack('<BBBB', *pixel_color)
+
+    def getAlpha(self, i: int, j: int, a0: int, a1: int, acode: int) -> int:
+        alpha_code = (acode >> (3 * ((4 * j) + i))) & 0x07
+        if alpha_code == 0:
+            return a0
+        elif alpha_code == 1:
+            return a1
+        elif a0 > a1:
+            return ((8 - alpha_code) * a0 + (alpha_code - 1) * a1) // 7
+        elif alpha_code == 6:
+            return 0
+        elif alpha_code == 7:
+            return 255
+        else:
+            return ((6 - alpha_code) * a0 + (alpha_code - 1) * a1) // 5
+
+
+class TestDXT(unittest.TestCase):
+
+    # Sizes that aren't a multiple of the block size only decode whole blocks.
+    SIZES = [(4, 4), (8, 4), (16, 12), (20, 8), (6, 10), (3, 8)]
+
+    def implementations(self) -> List[Any]:
+        # Always check the pure python decoder, and the C++ one as well if it was compiled.
+        return [None] + ([dxt.clib] if dxt.clib is not None else [])
+
+    def test_dxt1_parity(self) -> None:
+        for clib in self.implementations():
+            with patch.object(dxt, 'clib', clib):
+                for width, height in self.SIZES:
+                    for swap in [False, True]:
+                        data = os.urandom((width // 4) * (height // 4) * 8)
+                        self.assertEqual(
+                            DXTBuffer(width, height).DXT1Decompress(data, swap=swap),
+                            ReferenceDXTBuffer(width, height).DXT1Decompress(data, swap=swap),
+                        )
+
+    def test_dxt5_parity(self) -> None:
+        for clib in self.implementations():
+            with patch.object(dxt, 'clib', clib):
+                for width, height in self.SIZES:
+                    for swap in [False, True]:
+                        data = os.urandom((width // 4) * (height // 4) * 16)
+                        self.assertEqual(
+                            DXTBuffer(width, height).DXT5Decompress(data, swap=swap),
+                            ReferenceDXTBuffer(width, height).DXT5Decompress(data, swap=swap),
+                        )
+
+    def test_repeated_endpoints(self) -> None:
+        # Make sure both orderings of the same endpoints take the right palette, since
+        # decoded palettes are shared between blocks.
+        c0, c1 = sorted(random.sample(range(0x10000), 2))
+        dxt1 = b''.join(struct.pack("<HHI", *endpoints, random.getrandbits(32)) for endpoints in [(c0, c1), (c1, c0), (c0, c0)] * 4)
+        dxt5 = b''.join(
+            struct.pack("<BB", *alphas) + os.urandom(6) + struct.pack("<HHI", *endpoints, random.getrandbits(32))
+            for alphas, endpoints in [((10, 200), (c0, c1)), ((200, 10), (c1, c0)), ((10, 10), (c0, c0))] * 4
+        )
+
+        for clib in self.implementations():
+            with patch.object(dxt, 'clib', clib):
+                for swap in [False, True]:
+                    self.assertEqual(
+                        DXTBuffer(24, 8).DXT1Decompress(dxt1, swap=swap),
+                        ReferenceDXTBuffer(24, 8).DXT1Decompress(dxt1, swap=swap),
+                    )
+                    self.assertEqual(
+                        DXTBuffer(24, 8).DXT5Decompress(dxt5, swap=swap),
+                        ReferenceDXTBuffer(24, 8).DXT5Decompress(dxt5, swap=swap),
+                    )
+
+    def test_truncated(self) -> None:
+        for clib in self.implementations():
+            with patch.object(dxt, 'clib', clib):
+                with self.assertRaisesRegex(Exception, 'Not enough data for 8x8 texture!'):
+                    DXTBuffer(8, 8).DXT1Decompress(b'\0' * 31)
+                with self.assertRaisesRegex(Exception, 'Not enough data for 8x8 texture!'):
+                    DXTBuffer(8, 8).DXT5Decompress(b'\0' * 63)
@@ -0,0 +1,37 @@
+# vim: set fileencoding=utf-8
+import unittest
+
+from sqlalchemy import create_engine  # type: ignore
+from sqlalchemy.exc import TimeoutError  # type: ignore
+
+from bemani.data import Config, Data
+from bemani.data.data import _TimedQueuePool
+
+
+class TestDataPool(unittest.TestCase):
+
+    def test_pool_stats(self) -> None:
+        engine = create_engine('sqlite://', poolclass=_TimedQueuePool, pool_size=2, max_overflow=1, pool_timeout=0.1)
+        config = Config({'database': {'engine': engine}})
+
+        conns = [engine.connect() for _ in range(3)]
+        stats = Data.pool_stats(config)
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['checked_out'], 3)
+        self.assertEqual(stats['overflow'], 1)
+        self.assertEqual(stats['checkouts'], 3)
+        self.assertEqual(stats['timeouts'], 0)
+
+        with self.assertRaises(TimeoutError):
+            engine.connect()
+
+        for conn in conns:
+            conn.close()
+        stats = Data.pool_stats(config)
+        self.assertEqual(stats['checked_out'], 0)
+        self.assertEqual(stats['checked_in'], 2)
+        self.assertEqual(stats['overflow'], 0)
+        self.assertEqual(stats['checkouts'], 4)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertGreaterEqual(stats['max_wait_seconds'], 0.1)
+        engine.dispose()
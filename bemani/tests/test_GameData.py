@@ -3,6 +3,7 @@ import unittest
 from unittest.mock import Mock
 
 from bemani.common import GameConstants
+from bemani.data import UserID
 from bemani.data.mysql.game import GameData
 from bemani.tests.helpers import FakeCursor
 
@@ -31,3 +32,27 @@ class TestGameData(unittest.TestCase):
         with self.assertRaises(Exception) as context:
             game.put_time_sensitive_settings(GameConstants.BISHI_BASHI, 1, 'work', {'start_time': 12347, 'end_time': 12355})
         self.assertTrue('This event overlaps an existing one with start time 12345 and end time 12350' in str(context.exception))
+
+    def test_get_all_settings(self) -> None:
+        game = GameData(Mock(), None)
+        game.execute = Mock(return_value=FakeCursor([  # type: ignore
+            {'userid': 1, 'data': '{"total_plays": 5}'},
+            {'userid': 3, 'data': '{"total_plays": 7}'},
+        ]))
+
+        settings = game.get_all_settings(GameConstants.POPN_MUSIC, [UserID(1), UserID(2), UserID(3)])
+        self.assertEqual(settings, {1: {'total_plays': 5}, 3: {'total_plays': 7}})
+        self.assertEqual(game.execute.call_count, 1)
+
+        # Looking up nobody shouldn't hit the DB at all.
+        self.assertEqual(game.get_all_settings(GameConstants.POPN_MUSIC, []), {})
+        self.assertEqual(game.execute.call_count, 1)
+
+    def test_get_all_settings_chunked(self) -> None:
+        game = GameData(Mock(), None)
+        game.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+
+        userids = [UserID(i) for i in range(GameData.SETTINGS_CHUNK_SIZE + 1)]
+        self.assertEqual(game.get_all_settings(GameConstants.POPN_MUSIC, userids), {})
+        chunks = [call[0][1]['userids'] for call in game.execute.call_args_list]
+        self.assertEqual([len(chunk) for chunk in chunks], [GameData.SETTINGS_CHUNK_SIZE, 1])
@@ -0,0 +1,117 @@
+# vim: set fileencoding=utf-8
+import os
+import struct
+import tempfile
+import unittest
+from typing import Dict, Optional
+from unittest.mock import patch
+
+from bemani.format import IFS
+from bemani.protocol.binary import BinaryEncoding
+from bemani.protocol.node import Node
+from bemani.utils import ifsutils
+
+
+class TestIFS(unittest.TestCase):
+
+    def make_ifs(self, files: Dict[str, bytes], references: Optional[Dict[str, str]]=None) -> bytes:
+        # Lay out a version 1 IFS with each file's data after the header, and any
+        # referenced files pointing at the first super IFS.
+        root = Node.void('imgfs')
+        body = b''
+        for name, data in files.items():
+            parent = root
+            *dirs, filename = name.split('/')
+            for dirname in dirs:
+                child = parent.child(dirname)
+                if child is None:
+                    child = Node.void(dirname)
+                    parent.add_child(child)
+                parent = child
+            parent.add_child(Node(name=filename.replace('.', '_E'), type=Node.NODE_TYPE_3S32, value=[len(body), len(data), 0]))
+            body += data
+        for name, supername in (references or {}).items():
+            entry = Node(name=name.replace('.', '_E'), type=Node.NODE_TYPE_3S32, value=[0, 0, 0])
+            entry.add_child(Node.s32('i', 1))
+            root.add_child(entry)
+            superentry = Node.string('_super_', supername)
+            superentry.add_child(Node.binary('md5', b'\0' * 16))
+            root.add_child(superentry)
+
+        header = BinaryEncoding().encode(root, 'ascii')
+        data_index = 20 + len(header)
+        return struct.pack('>IHHIII', 0x6CAD8F89, 1, 0xFFFE, 0, len(header), data_index) + header + body
+
+    def test_open(self) -> None:
+        data = self.make_ifs({'a.txt': b'hello', 'dir/b.bin': b'\x01\x02\x03'})
+        self.assertEqual(IFS(data).read_file('a.txt'), b'hello')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'test.ifs')
+            with open(path, 'wb') as fp:
+                fp.write(data)
+
+            with IFS.open(path) as ifs:
+                self.assertEqual(sorted(ifs.filenames), sorted(['a.txt', os.path.join('dir', 'b.bin')]))
+                self.assertEqual(ifs.read_file(os.path.join('dir', 'b.bin')), b'\x01\x02\x03')
+                self.assertEqual(
+                    dict(ifs.iter_files()),
+                    {'a.txt': b'hello', os.path.join('dir', 'b.bin'): b'\x01\x02\x03'},
+                )
+
+    def test_truncated(self) -> None:
+        data = self.make_ifs({'a.txt': b'hello'})
+        with self.assertRaisesRegex(Exception, "Couldn't extract file data for a.txt!"):
+            IFS(data[:-1])
+
+    def test_references(self) -> None:
+        loads: Dict[str, int] = {}
+        supers: Dict[str, bytes] = {
+            'super.ifs': self.make_ifs({'shared.txt': b'shared'}),
+        }
+
+        def loader(name: str) -> Optional[IFS]:
+            loads[name] = loads.get(name, 0) + 1
+            if name not in supers:
+                return None
+            return IFS(supers[name], keep_hex_names=True)
+
+        # Referenced archives are only loaded once something is read out of them.
+        ifs = IFS(self.make_ifs({'a.txt': b'hello'}, {'shared.txt': 'super.ifs'}), reference_loader=loader)
+        self.assertEqual(loads, {})
+        self.assertEqual(ifs.read_file('a.txt'), b'hello')
+        self.assertEqual(loads, {})
+        self.assertEqual(ifs.read_file('shared.txt'), b'shared')
+        self.assertEqual(ifs.read_file('shared.txt'), b'shared')
+        self.assertEqual(loads, {'super.ifs': 1})
+
+        ifs = IFS(self.make_ifs({}, {'missing.txt': 'super.ifs'}), reference_loader=loader)
+        with self.assertRaisesRegex(Exception, 'missing.txt not found in super.ifs IFS!'):
+            ifs.read_file('missing.txt')
+
+    def test_timings(self) -> None:
+        xml = BinaryEncoding().encode(Node.u8('value', 5), 'ascii')
+        ifs = IFS(self.make_ifs({'a.xml': xml, 'b.txt': b'hello'}), decode_binxml=True)
+        self.assertEqual(ifs.timings, {'decompress': 0.0, 'binxml': 0.0, 'texture': 0.0})
+
+        ifs.read_file('b.txt')
+        self.assertEqual(ifs.timings['binxml'], 0.0)
+        self.assertIn(b'<value', ifs.read_file('a.xml'))
+        self.assertGreater(ifs.timings['binxml'], 0.0)
+        self.assertEqual(ifs.timings['texture'], 0.0)
+
+    def test_extract_jobs(self) -> None:
+        files = {'a.txt': b'hello', 'dir/b.bin': b'\x01\x02\x03', 'dir/c.bin': b'\x04'}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'test.ifs')
+            with open(path, 'wb') as fp:
+                fp.write(self.make_ifs(files))
+
+            for jobs in [1, 2]:
+                outdir = os.path.join(tmpdir, f'out{jobs}')
+                with patch('sys.argv', ['ifsutils', path, '-d', outdir, '--jobs', str(jobs)]), patch('builtins.print'):
+                    ifsutils.main()
+                for name, data in files.items():
+                    with open(os.path.join(outdir, name), 'rb') as fp:
+                        self.assertEqual(fp.read(), data)
@@ -0,0 +1,86 @@
+# vim: set fileencoding=utf-8
+import unittest
+from unittest.mock import Mock, patch
+
+from bemani.data.mysql.machine import MachineData
+from bemani.data.types import ArcadeID
+from bemani.tests.helpers import FakeCursor
+
+
+class TestMachineData(unittest.TestCase):
+
+    def setUp(self) -> None:
+        MachineData.invalidate_cache()
+
+    def machine_row(self, arcadeid: int) -> FakeCursor:
+        return FakeCursor([{
+            'id': 1,
+            'name': 'Test',
+            'description': '',
+            'arcadeid': arcadeid,
+            'port': 10000,
+            'game': None,
+            'version': None,
+            'data': None,
+        }])
+
+    def test_machine_cache(self) -> None:
+        machine = MachineData(Mock(), None)
+        machine.execute = Mock(return_value=self.machine_row(5))  # type: ignore
+        before = MachineData.cache_stats()
+
+        self.assertEqual(machine.get_machine_cached('PCBID').arcade, 5)
+        self.assertEqual(machine.get_machine_cached('PCBID').arcade, 5)
+        self.assertEqual(machine.execute.call_count, 1)
+
+        # A different Data object in the same process shares the cache.
+        other = MachineData(Mock(), None)
+        other.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+        self.assertEqual(other.get_machine_cached('PCBID').arcade, 5)
+        self.assertEqual(other.execute.call_count, 0)
+
+        # Unknown machines are remembered too.
+        self.assertIsNone(other.get_machine_cached('UNKNOWN'))
+        self.assertIsNone(other.get_machine_cached('UNKNOWN'))
+        self.assertEqual(other.execute.call_count, 1)
+
+        # Writes invalidate the cache.
+        current = machine.get_machine('PCBID')
+        current.arcade = ArcadeID(6)
+        machine.put_machine(current)
+        machine.execute = Mock(return_value=self.machine_row(6))  # type: ignore
+        self.assertEqual(machine.get_machine_cached('PCBID').arcade, 6)
+
+        after = MachineData.cache_stats()
+        self.assertEqual(after['hits'] - before['hits'], 3)
+        self.assertEqual(after['misses'] - before['misses'], 3)
+
+    def test_arcade_cache(self) -> None:
+        machine = MachineData(Mock(), None)
+        machine.execute = Mock(side_effect=[  # type: ignore
+            FakeCursor([{'name': 'Arcade', 'description': '', 'pin': '00000000', 'pref': 1, 'data': '{"paseli_enabled": true}'}]),
+            FakeCursor([{'userid': 1}]),
+        ])
+
+        self.assertTrue(machine.get_arcade_cached(ArcadeID(5)).data.get_bool('paseli_enabled'))
+        self.assertTrue(machine.get_arcade_cached(ArcadeID(5)).data.get_bool('paseli_enabled'))
+        self.assertEqual(machine.execute.call_count, 2)
+
+        machine.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+        machine.put_settings(ArcadeID(5), Mock(), 1, 'shop', {})
+        self.assertIsNone(machine.get_arcade_cached(ArcadeID(5)))
+
+    def test_cache_bounded(self) -> None:
+        machine = MachineData(Mock(), None)
+        machine.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+
+        with patch.object(MachineData, 'CACHE_SIZE', 4):
+            for i in range(10):
+                self.assertIsNone(machine.get_machine_cached(f'UNKNOWN{i}'))
+        self.assertEqual(MachineData.cache_stats()['entries'], 4)
+
+        # Expired entries are dropped when they are looked up.
+        with patch('bemani.data.mysql.machine.time.monotonic', return_value=1e12):
+            machine.execute = Mock(return_value=self.machine_row(5))  # type: ignore
+            self.assertEqual(machine.get_machine_cached('UNKNOWN9').arcade, 5)
+        self.assertEqual(MachineData.cache_stats()['entries'], 4)
@@ -0,0 +1,331 @@
+# vim: set fileencoding=utf-8
+import re
+import sqlite3
+import unittest
+from typing import Any, Dict, List, Optional, Tuple
+from unittest.mock import Mock
+
+from bemani.backend.iidx import IIDXBase
+from bemani.backend.museca import MusecaBase
+from bemani.backend.sdvx import SoundVoltexBase
+from bemani.common import GameConstants, ValidatedDict
+from bemani.data import UserID
+from bemani.data.mysql.music import MusicData
+from bemani.tests.helpers import FakeCursor
+
+
+class TestMusicData(unittest.TestCase):
+
+    def seeded_music(self) -> Tuple[MusicData, sqlite3.Connection, List[str]]:
+        # An in-memory database standing in for MySQL, seeded with a song whose ID changes
+        # between versions, a score with no attempts and an anonymous attempt.
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        conn.executescript(
+            """
+            CREATE TABLE music (id INTEGER, songid INTEGER, chart INTEGER, game TEXT, version INTEGER);
+            CREATE TABLE score (id INTEGER PRIMARY KEY, userid INTEGER, musicid INTEGER, points INTEGER, timestamp INTEGER, `update` INTEGER, lid INTEGER, data TEXT);
+            CREATE TABLE score_history (id INTEGER PRIMARY KEY, userid INTEGER, musicid INTEGER, timestamp INTEGER);
+            CREATE TABLE play_count (userid INTEGER, musicid INTEGER, plays INTEGER, UNIQUE (userid, musicid));
+            INSERT INTO music VALUES (1, 100, 0, 'iidx', 1), (1, 100, 0, 'iidx', 2), (2, 101, 1, 'iidx', 1), (2, 201, 1, 'iidx', 2), (3, 100, 0, 'ddr', 1);
+            INSERT INTO score VALUES (1, 1, 1, 500, 10, 10, 5, '{}'), (2, 2, 1, 700, 20, 20, 5, '{}'), (3, 1, 2, 300, 30, 30, 6, '{}'), (4, 3, 3, 900, 40, 40, 6, '{}');
+            INSERT INTO score_history VALUES (1, 1, 1, 1), (2, 1, 1, 2), (3, 1, 1, 3), (4, 1, 2, 4), (5, 0, 1, 5), (6, 3, 3, 6);
+            INSERT INTO play_count (userid, musicid, plays)
+                SELECT userid, musicid, COUNT(timestamp) FROM score_history WHERE userid != 0 GROUP BY userid, musicid;
+            """
+        )
+        queries: List[str] = []
+
+        def execute(sql: str, params: Dict[str, Any]) -> sqlite3.Cursor:
+            queries.append(sql)
+            return conn.execute(sql, params)
+
+        music = MusicData(Mock(), None)
+        music.execute = execute  # type: ignore
+        return music, conn, queries
+
+    def seeded_records(self) -> Tuple[MusicData, sqlite3.Connection]:
+        # An in-memory database standing in for MySQL, with two charts and no scores yet.
+        conn = sqlite3.connect(':memory:')
+        conn.row_factory = sqlite3.Row
+        conn.executescript(
+            """
+            CREATE TABLE music (id INTEGER, songid INTEGER, chart INTEGER, game TEXT, version INTEGER);
+            CREATE TABLE score (id INTEGER PRIMARY KEY, userid INTEGER, musicid INTEGER, points INTEGER, timestamp INTEGER, `update` INTEGER, lid INTEGER, data TEXT, UNIQUE (userid, musicid));
+            CREATE TABLE record (musicid INTEGER PRIMARY KEY, userid INTEGER, points INTEGER, timestamp INTEGER);
+            CREATE TABLE location_record (musicid INTEGER, lid INTEGER, userid INTEGER, points INTEGER, timestamp INTEGER, UNIQUE (musicid, lid));
+            INSERT INTO music VALUES (1, 100, 0, 'iidx', 25), (2, 101, 0, 'iidx', 25);
+            """
+        )
+        keys = {'score': 'userid, musicid', 'record': 'musicid', 'location_record': 'musicid, lid'}
+
+        def execute(sql: str, params: Optional[Dict[str, Any]]=None) -> Any:
+            # Rewrite MySQL upserts into the SQLite equivalent. SQLite evaluates every
+            # assignment against the old row where MySQL applies them in order, but the
+            # record upserts are written so that both give the same answer.
+            if ' ON DUPLICATE KEY UPDATE ' in sql:
+                table = re.match(r"INSERT INTO `(\w+)`", sql).group(1)
+                insert, updates = sql.split(' ON DUPLICATE KEY UPDATE ')
+                updates = updates.replace(f'{table}.', '').replace('IF(', 'iif(')
+                updates = re.sub(r'VALUES\((`?\w+`?)\)', r'excluded.\1', updates)
+                sql = f"{insert} ON CONFLICT ({keys[table]}) DO UPDATE SET {updates}"
+            cursor = conn.execute(sql, params or {})
+            if sql.startswith('SELECT'):
+                return FakeCursor([dict(row) for row in cursor.fetchall()])
+            return cursor
+
+        music = MusicData(Mock(), None)
+        music.execute = execute  # type: ignore
+        return music, conn
+
+    def records(self, conn: sqlite3.Connection) -> List[Tuple[int, Optional[int], int, int, int]]:
+        return sorted(
+            [(r['musicid'], None, r['userid'], r['points'], r['timestamp']) for r in conn.execute('SELECT * FROM record')] +
+            [(r['musicid'], r['lid'], r['userid'], r['points'], r['timestamp']) for r in conn.execute('SELECT * FROM location_record')],
+            key=lambda r: (r[0], r[1] or 0),
+        )
+
+    def correlated_scores(
+        self,
+        conn: sqlite3.Connection,
+        version: Optional[int]=None,
+        userid: Optional[int]=None,
+        songid: Optional[int]=None,
+        songchart: Optional[int]=None,
+    ) -> List[Tuple[int, int, int, int, int, int]]:
+        # The per-row subquery form of get_all_scores that the joins replaced.
+        latest = ' AND version = :version' if version is not None else ' ORDER BY version DESC LIMIT 1'
+        innerselect = 'SELECT DISTINCT(id) FROM music WHERE game = :game'
+        if version is not None:
+            innerselect = innerselect + ' AND version = :version'
+        if songid is not None:
+            innerselect = innerselect + ' AND songid = :songid'
+        if songchart is not None:
+            innerselect = innerselect + ' AND chart = :songchart'
+        sql = (
+            f"SELECT (SELECT songid FROM music WHERE music.id = score.musicid AND game = :game{latest}) AS songid, "
+            f"(SELECT chart FROM music WHERE music.id = score.musicid AND game = :game{latest}) AS chart, id, points, userid, "
+            "(SELECT COUNT(timestamp) FROM score_history WHERE score_history.musicid = score.musicid AND score_history.userid = score.userid) AS plays "
+            f"FROM score WHERE musicid IN ({innerselect})"
+        )
+        if userid is not None:
+            sql = sql + ' AND userid = :userid'
+        cursor = conn.execute(sql, {'game': 'iidx', 'version': version, 'userid': userid, 'songid': songid, 'songchart': songchart})
+        return sorted((r['userid'], r['id'], r['songid'], r['chart'], r['points'], r['plays']) for r in cursor.fetchall())
+
+    def test_get_clear_rates(self) -> None:
+        music = MusicData(Mock(), None)
+        music.execute = Mock(return_value=FakeCursor([  # type: ignore
+            {'songid': 1000, 'chart': 0, 'plays': 5, 'clears': 3, 'combos': 1, 'points': 4000},
+            {'songid': 1000, 'chart': 2, 'plays': 1, 'clears': 0, 'combos': 0, 'points': 200},
+            {'songid': 1001, 'chart': 1, 'plays': 2, 'clears': 2, 'combos': 2, 'points': 1800},
+        ]))
+
+        self.assertEqual(
+            music.get_clear_rates(GameConstants.IIDX, 22),
+            {
+                1000: {
+                    0: {'plays': 5, 'clears': 3, 'combos': 1, 'points': 4000},
+                    2: {'plays': 1, 'clears': 0, 'combos': 0, 'points': 200},
+                },
+                1001: {
+                    1: {'plays': 2, 'clears': 2, 'combos': 2, 'points': 1800},
+                },
+            },
+        )
+
+        music.get_clear_rates(GameConstants.IIDX, 22, songid=1000, songchart=2)
+        sql, params = music.execute.call_args[0]
+        self.assertIn('music.songid = :songid', sql)
+        self.assertIn('music.chart = :songchart', sql)
+        self.assertEqual(params['songid'], 1000)
+        self.assertEqual(params['songchart'], 2)
+
+    def test_rebuild_clear_rates(self) -> None:
+        music = MusicData(Mock(), None)
+        music.execute = Mock(side_effect=[  # type: ignore
+            FakeCursor([{'id': 1}, {'id': 2}]),
+            FakeCursor([
+                {'musicid': 1, 'points': 100, 'data': '{"clear_status": 100}'},
+                {'musicid': 1, 'points': 300, 'data': '{"clear_status": 700}'},
+                {'musicid': 1, 'points': 500, 'data': '{"clear_status": 50}'},
+                {'musicid': 2, 'points': 200, 'data': '{"clear_status": 400}'},
+            ]),
+            FakeCursor([]),
+            FakeCursor([]),
+            FakeCursor([]),
+        ])
+
+        self.assertEqual(music.rebuild_clear_rates(GameConstants.IIDX, IIDXBase.clear_rate_stats), 3)
+        calls = [call[0] for call in music.execute.call_args_list]
+        self.assertIn('DELETE FROM `clear_rate`', calls[2][0])
+        self.assertEqual(calls[2][1], {'musicids': [1, 2]})
+        self.assertEqual(calls[3][1], {'musicid': 1, 'plays': 2, 'clears': 1, 'combos': 1, 'points': 400})
+        self.assertEqual(calls[4][1], {'musicid': 2, 'plays': 1, 'clears': 1, 'combos': 0, 'points': 200})
+
+    def test_clear_rate_stats(self) -> None:
+        self.assertIsNone(IIDXBase.clear_rate_stats(ValidatedDict({'clear_status': IIDXBase.CLEAR_STATUS_NO_PLAY})))
+        self.assertEqual(IIDXBase.clear_rate_stats(ValidatedDict({'clear_status': IIDXBase.CLEAR_STATUS_FAILED})), (False, False))
+        self.assertEqual(IIDXBase.clear_rate_stats(ValidatedDict({'clear_status': IIDXBase.CLEAR_STATUS_HARD_CLEAR})), (True, False))
+        self.assertEqual(IIDXBase.clear_rate_stats(ValidatedDict({'clear_status': IIDXBase.CLEAR_STATUS_FULL_COMBO})), (True, True))
+
+        self.assertEqual(SoundVoltexBase.clear_rate_stats(ValidatedDict({})), (False, False))
+        self.assertEqual(SoundVoltexBase.clear_rate_stats(ValidatedDict({'clear_type': SoundVoltexBase.CLEAR_TYPE_CLEAR})), (True, False))
+        self.assertEqual(SoundVoltexBase.clear_rate_stats(ValidatedDict({'clear_type': SoundVoltexBase.CLEAR_TYPE_ULTIMATE_CHAIN})), (True, True))
+
+        self.assertEqual(MusecaBase.clear_rate_stats(ValidatedDict({'clear_type': MusecaBase.CLEAR_TYPE_FAILED})), (False, False))
+        self.assertEqual(MusecaBase.clear_rate_stats(ValidatedDict({'clear_type': MusecaBase.CLEAR_TYPE_CLEARED})), (True, False))
+        self.assertEqual(MusecaBase.clear_rate_stats(ValidatedDict({'clear_type': MusecaBase.CLEAR_TYPE_FULL_COMBO})), (True, True))
+
+    def test_get_all_records(self) -> None:
+        music = MusicData(Mock(), None)
+        music.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+
+        # Without a user filter, we should read the maintained record tables.
+        music.get_all_records(GameConstants.DDR, 16)
+        sql, _ = music.execute.call_args[0]
+        self.assertIn('FROM record', sql)
+        music.get_all_records(GameConstants.DDR, 16, locationlist=[5])
+        sql, params = music.execute.call_args[0]
+        self.assertIn('FROM location_record', sql)
+        self.assertEqual(params['locationlist'], (5,))
+
+        # With a user filter, we have to rank their scores ourselves.
+        music.get_all_records(GameConstants.DDR, 16, userlist=[UserID(1)])
+        sql, params = music.execute.call_args[0]
+        self.assertNotIn('record.', sql)
+        self.assertEqual(params['userlist'], (1,))
+
+    def test_rebuild_records(self) -> None:
+        music = MusicData(Mock(), None)
+        music.execute = Mock(side_effect=[  # type: ignore
+            FakeCursor([
+                {'musicid': 1, 'lid': 10, 'userid': 1, 'points': 500, 'timestamp': 100},
+                {'musicid': 1, 'lid': 11, 'userid': 2, 'points': 500, 'timestamp': 200},
+                {'musicid': 1, 'lid': 10, 'userid': 3, 'points': 300, 'timestamp': 300},
+            ]),
+            FakeCursor([
+                {'musicid': 1, 'userid': 1, 'points': 500, 'timestamp': 100},
+            ]),
+            FakeCursor([
+                {'musicid': 1, 'lid': 10, 'userid': 1, 'points': 500, 'timestamp': 100},
+                {'musicid': 1, 'lid': 11, 'userid': 2, 'points': 500, 'timestamp': 200},
+                {'musicid': 2, 'lid': 10, 'userid': 1, 'points': 100, 'timestamp': 100},
+            ]),
+        ] + [FakeCursor([])] * 3)
+
+        # The global record should go to the later of the two tied scores, and the stale
+        # location record for a chart without scores should be removed.
+        self.assertEqual(music.rebuild_records(), (3, 2))
+        writes = [call[0] for call in music.execute.call_args_list[3:]]
+        self.assertEqual(len(writes), 3)
+        for sql, params in writes:
+            if sql.startswith('INSERT'):
+                self.assertIn('`record`', sql)
+                self.assertEqual(params['userid'], 2)
+            elif params['musicid'] == 2:
+                self.assertIn('`location_record`', sql)
+                self.assertEqual(params['location'], 10)
+            else:
+                self.assertIn('`record`', sql)
+
+    def test_put_score_records(self) -> None:
+        music, conn = self.seeded_records()
+
+        def put(userid: int, points: int, timestamp: int, location: int) -> None:
+            music.put_score(GameConstants.IIDX, 25, UserID(userid), 100, 0, location, points, {}, True, timestamp=timestamp)
+
+        # A lower score doesn't take the record, a tie goes to whoever got it last.
+        put(1, 500, 10, 5)
+        put(2, 400, 20, 5)
+        put(3, 500, 30, 6)
+        self.assertEqual(self.records(conn), [
+            (1, None, 3, 500, 30),
+            (1, 5, 1, 500, 10),
+            (1, 6, 3, 500, 30),
+        ])
+
+        # Moving a record score to another location hands the old location's record
+        # to the next best score earned there.
+        put(1, 600, 40, 6)
+        expected = [
+            (1, None, 1, 600, 40),
+            (1, 5, 2, 400, 20),
+            (1, 6, 1, 600, 40),
+        ]
+        self.assertEqual(self.records(conn), expected)
+        self.assertEqual(music.rebuild_records(), (3, 0))
+
+        # Rebuilding repairs a wrong record, a missing record and a stale record.
+        conn.execute('UPDATE record SET userid = 2, points = 400, timestamp = 20')
+        conn.execute('DELETE FROM location_record WHERE lid = 6')
+        conn.execute('INSERT INTO location_record VALUES (2, 7, 1, 100, 50)')
+        self.assertEqual(music.rebuild_records(), (3, 3))
+        self.assertEqual(self.records(conn), expected)
+
+    def test_get_all_attempts_keyset(self) -> None:
+        music = MusicData(Mock(), None)
+        music.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+
+        # Ties on timestamp are broken by key so that pages never overlap or skip.
+        music.get_all_attempts(GameConstants.IIDX, 25, limit=100, before=(1500, 42))
+        sql, params = music.execute.call_args[0]
+        self.assertIn('(timestamp < :before_timestamp OR (timestamp = :before_timestamp AND id < :before_id))', sql)
+        self.assertIn('ORDER BY timestamp DESC, id DESC LIMIT :limit', sql)
+        self.assertEqual(params['before_timestamp'], 1500)
+        self.assertEqual(params['before_id'], 42)
+
+        music.get_all_attempts(GameConstants.IIDX, 25, limit=100)
+        sql, _ = music.execute.call_args[0]
+        self.assertNotIn(':before_timestamp', sql)
+
+    def test_get_all_scores_matches_correlated(self) -> None:
+        music, conn, queries = self.seeded_music()
+
+        for kwargs in [
+            {},
+            {'version': 1},
+            {'version': 2},
+            {'songid': 100},
+            {'songid': 101},
+            {'songid': 201, 'songchart': 1},
+            {'version': 1, 'songid': 101},
+            {'userid': 1},
+            {'version': 2, 'userid': 2},
+        ]:
+            scores = music.get_all_scores(GameConstants.IIDX, **kwargs)  # type: ignore
+            self.assertEqual(
+                sorted((userid, score.key, score.id, score.chart, score.points, score.plays) for userid, score in scores),
+                self.correlated_scores(conn, **kwargs),
+            )
+
+        # Songs that changed IDs come from the newest version, scores without attempts have
+        # no plays, and anonymous attempts aren't counted against anybody.
+        self.assertEqual(
+            sorted((userid, score.id, score.plays) for userid, score in music.get_all_scores(GameConstants.IIDX)),
+            [(1, 100, 3), (1, 201, 1), (2, 100, 0)],
+        )
+
+        # Nothing in the query plan should be evaluated once per score.
+        for sql in queries:
+            plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', {
+                'game': 'iidx',
+                'version': 1,
+                'userid': 1,
+                'songid': 100,
+                'songchart': 0,
+            }).fetchall()
+            self.assertFalse([row for row in plan if 'CORRELATED' in row['detail']], sql)
+
+    def test_put_attempt_counts_plays(self) -> None:
+        music = MusicData(Mock(), None)
+        music.execute = Mock(side_effect=lambda sql, params: FakeCursor([{'id': 7}]))  # type: ignore
+
+        music.put_attempt(GameConstants.IIDX, 25, UserID(1), 1000, 0, 5, 300, {}, False, timestamp=100)
+        sql, params = music.execute.call_args_list[-1][0]
+        self.assertIn('`play_count`', sql)
+        self.assertEqual(params, {'userid': 1, 'musicid': 7})
+
+        # Anonymous attempts are still saved, but aren't anybody's plays.
+        music.put_attempt(GameConstants.IIDX, 25, None, 1000, 0, 5, 300, {}, False, timestamp=200)
+        self.assertNotIn('`play_count`', music.execute.call_args_list[-1][0][0])
@@ -1,6 +1,7 @@
 # vim: set fileencoding=utf-8
+import io
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 from freezegun import freeze_time
 
 from bemani.common import GameConstants
@@ -50,3 +51,66 @@ class TestNetworkData(unittest.TestCase):
 
             network.execute = Mock(return_value=FakeCursor([{'year': None, 'day': 16790}]))  # type: ignore
             self.assertTrue(network.should_schedule(GameConstants.BISHI_BASHI, 1, 'work', 'weekly'))
+
+    def test_buffered_events(self) -> None:
+        network = NetworkData(Mock(), None)
+        network.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+        before = NetworkData.event_stats()
+
+        # Without buffering, events are written right away.
+        network.put_event('unauthorized_pcbid', {'pcbid': 'ABCD'}, timestamp=1)
+        self.assertEqual(network.execute.call_count, 1)
+
+        network.buffer_events()
+        for i in range(5):
+            network.put_event('unhandled_packet', {'packet': i}, timestamp=i)
+        network.flush_events()
+
+        # Every buffered event should be written, batched together where possible.
+        sqls = [call[0][0] for call in network.execute.call_args_list[1:]]
+        self.assertTrue(all(sql.startswith('INSERT INTO audit') for sql in sqls))
+        self.assertLessEqual(len(sqls), 5)
+        self.assertEqual(sum(sql.count('(:ts') for sql in sqls), 5)
+
+        after = NetworkData.event_stats()
+        self.assertEqual(after['queued'] - before['queued'], 5)
+        self.assertEqual(after['written'] - before['written'], 5)
+        self.assertEqual(after['dropped'], before['dropped'])
+
+    def test_buffered_events_failed(self) -> None:
+        network = NetworkData(Mock(), None)
+        network.execute = Mock(side_effect=Exception('Lost connection'))  # type: ignore
+        before = NetworkData.event_stats()
+
+        # A failed batch is counted and reported rather than silently thrown away.
+        with patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            network.buffer_events()
+            network.put_event('unhandled_packet', {'packet': 1}, timestamp=1)
+            network.flush_events()
+        self.assertIn("starting with 'unhandled_packet'", stderr.getvalue())
+        self.assertIn('Lost connection', stderr.getvalue())
+
+        after = NetworkData.event_stats()
+        self.assertEqual(after['failed'] - before['failed'], 1)
+
+    def test_delete_events(self) -> None:
+        network = NetworkData(Mock(), None)
+        network.execute = Mock(return_value=FakeCursor([{'low': None, 'high': None}]))  # type: ignore
+        self.assertEqual(network.delete_events(1000), [])
+        self.assertEqual(network.execute.call_count, 1)
+
+        # Deletes should walk the old events a bounded range of IDs at a time.
+        deleted = FakeCursor([])
+        deleted.rowcount = 7
+        network.execute = Mock(side_effect=[  # type: ignore
+            FakeCursor([{'low': 5, 'high': 5 + NetworkData.EVENT_DELETE_BATCH_SIZE * 2}]),
+            deleted,
+            deleted,
+            deleted,
+        ])
+        self.assertEqual(network.delete_events(1000), [7, 7, 7])
+        ranges = [(call[0][1]['low'], call[0][1]['high']) for call in network.execute.call_args_list[1:]]
+        self.assertEqual(ranges[0], (5, 5 + NetworkData.EVENT_DELETE_BATCH_SIZE))
+        self.assertEqual(ranges[-1][0], 5 + NetworkData.EVENT_DELETE_BATCH_SIZE * 2)
+        for call in network.execute.call_args_list[1:]:
+            self.assertEqual(call[0][1]['ts'], 1000)
@@ -0,0 +1,75 @@
+# vim: set fileencoding=utf-8
+import copy
+import unittest
+
+from bemani.protocol.node import Node, NodeException
+
+
+class TestNode(unittest.TestCase):
+
+    def test_child_lookup(self) -> None:
+        root = Node.void('root')
+        first = Node.void('player')
+        first.add_child(Node.s32('score', 1))
+        second = Node.void('player')
+        second.add_child(Node.s32('score', 2))
+        second.add_child(Node.s32('combo', 3))
+        root.add_child(first)
+
+        self.assertEqual(root.child_value('player/score'), 1)
+
+        # Children added after the first lookup are still found, and the first child by
+        # a name always wins, so paths don't fall through to later siblings.
+        root.add_child(second)
+        root.add_child(Node.u8('version', 4))
+        self.assertIs(root.child('player'), first)
+        self.assertEqual(root.child_value('player/score'), 1)
+        self.assertIsNone(root.child_value('player/combo'))
+        self.assertEqual(root.child_value('version'), 4)
+        self.assertIsNone(root.child('missing'))
+        self.assertIsNone(root.child('player/'))
+        self.assertIsNone(root.child('version/score'))
+        self.assertEqual(root.children, [first, second, root.child('version')])
+
+    def test_attributes(self) -> None:
+        node = Node.s32('score', 5)
+        self.assertIsNone(node.attribute('id'))
+        self.assertEqual(node.attribute('id', 'default'), 'default')
+        self.assertEqual(node, Node.s32('score', 5))
+        self.assertFalse(node.has_attributes)
+
+        node.attributes['id'] = '1'
+        self.assertTrue(node.has_attributes)
+        self.assertEqual(node.attribute('id'), '1')
+        self.assertNotEqual(node, Node.s32('score', 5))
+
+        other = Node.s32('score', 5)
+        other.set_attribute('id', '1')
+        self.assertEqual(node, other)
+        self.assertEqual(copy.deepcopy(node), node)
+
+    def test_names(self) -> None:
+        with self.assertRaises(NodeException):
+            Node.void('bad name')
+
+        name = ''.join(['dup', 'name'])
+        self.assertIs(Node.void(name).name, Node.void('dupname').name)
+
+    def test_to_xml(self) -> None:
+        root = Node.u8_array('root', [1, 2])
+        root.set_attribute('note', '"quoted"\n')
+        root.add_child(Node.binary('blob', b'\x01\xff'))
+        root.add_child(Node.void('empty'))
+        root.add_child(Node.string('text', 'a<b'))
+
+        expected = (
+            '<root __type="u8" __count="2" note="&quot;quoted&quot;&#10;">\n'
+            '    1 2\n'
+            '    <blob __type="bin">01ff</blob>\n'
+            '    <empty />\n'
+            '    <text __type="str">a&lt;b</text>\n'
+            '</root>\n'
+        )
+        self.assertEqual(str(root), expected)
+        self.assertEqual(str(root.to_xml_lazy()), expected)
+        self.assertEqual('{}'.format(root.to_xml_lazy()), expected)
@@ -0,0 +1,57 @@
+# vim: set fileencoding=utf-8
+import unittest
+from typing import Optional, Tuple
+from unittest.mock import Mock
+
+from bemani.backend.popn.usaneko import PopnMusicUsaNeko
+from bemani.common import Profile
+from bemani.data import UserID
+from bemani.protocol import Node
+
+
+class TestPopnMusicUsaNeko(unittest.TestCase):
+
+    def __make_request(self, pref: Optional[int], location_id: str) -> Node:
+        request = Node.void('player24')
+        request.add_child(Node.string('ref_id', '0123456789ABCDEF'))
+        request.add_child(Node.s16('course_id', 5))
+        request.add_child(Node.s8('sheet_num', 1))
+        request.add_child(Node.s32('total_score', 1000))
+        request.add_child(Node.u8('clear_type', 2))
+        request.add_child(Node.u8('clear_rank', 3))
+        if pref is not None:
+            request.add_child(Node.s8('pref', pref))
+        request.add_child(Node.string('location_id', location_id))
+        return request
+
+    def __make_base(self) -> Tuple[PopnMusicUsaNeko, Mock]:
+        data = Mock()
+        data.remote.user.from_refid.return_value = UserID(1)
+        data.local.user.get_achievement.return_value = None
+        data.local.ranking.get_rank.return_value = (2, 10)
+        base = PopnMusicUsaNeko(data, Mock(), Mock())
+        base.get_profile = Mock(return_value=Profile(base.game, base.version, '0123456789ABCDEF', 1, {'name': 'PLAYER'}))  # type: ignore
+        return base, data
+
+    def test_update_ranking_unparseable_location(self) -> None:
+        base, data = self.__make_base()
+        response = base.handle_player24_update_ranking_request(self.__make_request(13, 'garbage'))
+
+        # The score is still ranked, without a location to narrow it down to.
+        put_args = data.local.ranking.put_ranking.call_args[0]
+        self.assertEqual(put_args[-2:], (13, None))
+        for call in data.local.ranking.get_rank.call_args_list:
+            self.assertNotIn('location', call[1])
+
+        self.assertIsNotNone(response.child('all_ranking'))
+        self.assertEqual(response.child_value('pref_ranking/player_rank'), 2)
+        self.assertIsNone(response.child('location_ranking'))
+
+    def test_update_ranking_missing_prefecture(self) -> None:
+        base, data = self.__make_base()
+        response = base.handle_player24_update_ranking_request(self.__make_request(None, 'US-7'))
+
+        for call in data.local.ranking.get_rank.call_args_list:
+            self.assertNotIn('prefecture', call[1])
+        self.assertIsNone(response.child('pref_ranking'))
+        self.assertEqual(response.child_value('location_ranking/player_count'), 10)
@@ -2,7 +2,7 @@
 import random
 import unittest
 
-from bemani.protocol.protocol import EAmuseProtocol
+from bemani.protocol import EAmuseProtocol, Node
 
 
 class TestRC4Cipher(unittest.TestCase):
@@ -40,3 +40,52 @@ class TestRC4Cipher(unittest.TestCase):
 
         plaintext = proto._rc4_crypt(cyphertext, key)
         self.assertEqual(data, plaintext)
+
+    def test_parity_with_reference(self) -> None:
+        def reference(data: bytes, key: bytes) -> bytes:
+            S = list(range(256))
+            j = 0
+            out = []
+
+            for i in range(256):
+                j = (j + S[i] + key[i % len(key)]) & 0xFF
+                S[i], S[j] = S[j], S[i]
+
+            i = j = 0
+            for char in data:
+                i = (i + 1) & 0xFF
+                j = (j + S[i]) & 0XFF
+                S[i], S[j] = S[j], S[i]
+                out.append(char ^ S[(S[i] + S[j]) & 0xFF])
+
+            return bytes(out)
+
+        proto = EAmuseProtocol()
+        for length in [0, 1, 255, 256, 257, 4096, 65537]:
+            data = bytes([random.randint(0, 255) for _ in range(length)])
+            key = bytes([random.randint(0, 255) for _ in range(random.randint(1, 32))])
+            self.assertEqual(reference(data, key), proto._rc4_crypt(data, key))
+
+    def test_cached_schedule(self) -> None:
+        data = bytes([random.randint(0, 255) for _ in range(10 * 1024)])
+        root = Node.void('call')
+        root.add_child(Node.binary('data', data))
+        proto = EAmuseProtocol()
+
+        # Encrypt several times with the same key so the second and later
+        # packets are served from the key schedule cache.
+        packets = [
+            proto.encode(None, '1-abcdef-0123', root, text_encoding=EAmuseProtocol.SHIFT_JIS, packet_encoding=EAmuseProtocol.BINARY)
+            for _ in range(3)
+        ]
+        self.assertEqual(packets[0], packets[1])
+        self.assertEqual(packets[0], packets[2])
+        self.assertEqual(root, proto.decode(None, '1-abcdef-0123', packets[2]))
+
+        # Evicting every other key and coming back should produce identical output.
+        for i in range(EAmuseProtocol.KEY_CACHE_SIZE + 1):
+            proto.encode(None, f'1-{i:08x}-0000', root, text_encoding=EAmuseProtocol.SHIFT_JIS, packet_encoding=EAmuseProtocol.BINARY)
+        self.assertEqual(
+            packets[0],
+            proto.encode(None, '1-abcdef-0123', root, text_encoding=EAmuseProtocol.SHIFT_JIS, packet_encoding=EAmuseProtocol.BINARY),
+        )
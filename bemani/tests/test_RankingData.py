@@ -0,0 +1,44 @@
+# vim: set fileencoding=utf-8
+import unittest
+from unittest.mock import Mock
+
+from bemani.common import GameConstants
+from bemani.data import UserID
+from bemani.data.mysql.ranking import RankingData
+from bemani.tests.helpers import FakeCursor
+
+
+class TestRankingData(unittest.TestCase):
+
+    def test_get_rank(self) -> None:
+        ranking = RankingData(Mock(), None)
+        ranking.execute = Mock(return_value=FakeCursor([{'rank': 3, 'count': 10}]))  # type: ignore
+
+        self.assertEqual(ranking.get_rank(GameConstants.POPN_MUSIC, 24, 'course_1', 5, UserID(1)), (3, 10))
+        sql, params = ranking.execute.call_args[0]
+        self.assertNotIn('pref', sql)
+        self.assertNotIn('lid', sql)
+
+        # Scoped boards should filter both the player's own row and the players ranked against.
+        ranking.get_rank(GameConstants.POPN_MUSIC, 24, 'course_1', 5, UserID(1), prefecture=13)
+        sql, params = ranking.execute.call_args[0]
+        self.assertEqual(sql.count('pref = :pref'), 3)
+        self.assertEqual(params['pref'], 13)
+        ranking.get_rank(GameConstants.POPN_MUSIC, 24, 'course_1', 5, UserID(1), location=7)
+        sql, params = ranking.execute.call_args[0]
+        self.assertEqual(sql.count('lid = :lid'), 3)
+        self.assertEqual(params['lid'], 7)
+
+        # Players without a score aren't on the board.
+        ranking.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+        self.assertIsNone(ranking.get_rank(GameConstants.POPN_MUSIC, 24, 'course_1', 5, UserID(2)))
+
+    def test_put_ranking_unknown_location(self) -> None:
+        ranking = RankingData(Mock(), None)
+        ranking.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+
+        # The table doesn't allow nulls, so unknown prefectures and locations are stored as 0.
+        ranking.put_ranking(GameConstants.POPN_MUSIC, 24, 'course_1', 5, UserID(1), 1000, None, None)
+        _, params = ranking.execute.call_args[0]
+        self.assertEqual(params['pref'], 0)
+        self.assertEqual(params['lid'], 0)
@@ -0,0 +1,55 @@
+# vim: set fileencoding=utf-8
+import struct
+import unittest
+from unittest.mock import patch
+
+from PIL import Image  # type: ignore
+
+from bemani.format.afp import Texture
+from bemani.format.texture import TextureFormat
+from bemani.utils.afputils import crop_texture
+
+
+class TestTexture(unittest.TestCase):
+
+    def make_texture(self, name: str, color: int) -> Texture:
+        raw = struct.pack("<16H", *([color] * 16))
+        return Texture(name, 4, 4, 0x0B, 0, 0, 0, 0, raw, None, TextureFormat.RGB565)
+
+    def test_lazy_decode(self) -> None:
+        with patch('bemani.format.afp.container.TextureFormat.decode', wraps=TextureFormat.decode) as decode:
+            texture = self.make_texture('tex', 0xF800)
+            self.assertTrue(texture.supported)
+            decode.assert_not_called()
+
+            self.assertEqual(texture.img.getpixel((0, 0)), (255, 0, 0))
+            self.assertEqual(crop_texture(texture, (1, 1, 3, 3)).size, (2, 2))
+            self.assertEqual(decode.call_count, 1)
+
+    def test_cache_eviction(self) -> None:
+        with patch('bemani.format.afp.container.TextureFormat.decode', wraps=TextureFormat.decode) as decode:
+            textures = [self.make_texture(f'tex{i}', i) for i in range(Texture.IMAGE_CACHE_SIZE + 1)]
+            for texture in textures:
+                texture.img
+            self.assertEqual(decode.call_count, Texture.IMAGE_CACHE_SIZE + 1)
+
+            # The most recently used textures are still decoded, the oldest one was evicted.
+            textures[-1].img
+            self.assertEqual(decode.call_count, Texture.IMAGE_CACHE_SIZE + 1)
+            textures[0].img
+            self.assertEqual(decode.call_count, Texture.IMAGE_CACHE_SIZE + 2)
+
+    def test_assigned_image(self) -> None:
+        texture = self.make_texture('tex', 0xF800)
+        img = Image.new('RGBA', (4, 4), (0, 255, 0, 255))
+        texture.img = img
+
+        # Images that were set are never evicted, since they can't be decoded again.
+        for i in range(Texture.IMAGE_CACHE_SIZE + 1):
+            self.make_texture(f'other{i}', i).img
+        self.assertIs(texture.img, img)
+
+    def test_unsupported(self) -> None:
+        texture = Texture('tex', 4, 4, 0x1E, 0, 0, 0, 0, b'', None, None)
+        self.assertFalse(texture.supported)
+        self.assertIsNone(texture.img)
@@ -0,0 +1,74 @@
+# vim: set fileencoding=utf-8
+import os
+import struct
+import unittest
+
+from bemani.format.dxt import DXTBuffer
+from bemani.format.texture import TextureFormat
+
+
+class TestTextureFormat(unittest.TestCase):
+
+    def reference_rgb565(self, pixel: int) -> bytes:
+        red = ((pixel >> 0) & 0x1F) << 3
+        green = ((pixel >> 5) & 0x3F) << 2
+        blue = ((pixel >> 11) & 0x1F) << 3
+        red = red | (red >> 5)
+        green = green | (green >> 6)
+        blue = blue | (blue >> 5)
+        return struct.pack("<BBB", blue, green, red)
+
+    def reference_argb1555(self, pixel: int) -> bytes:
+        alpha = 255 if ((pixel >> 15) & 0x1) != 0 else 0
+        red = ((pixel >> 0) & 0x1F) << 3
+        green = ((pixel >> 5) & 0x1F) << 3
+        blue = ((pixel >> 10) & 0x1F) << 3
+        red = red | (red >> 5)
+        green = green | (green >> 5)
+        blue = blue | (blue >> 5)
+        return struct.pack("<BBBB", blue, green, red, alpha)
+
+    def reference_argb4444(self, pixel: int) -> bytes:
+        blue = ((pixel >> 0) & 0xF) << 4
+        green = ((pixel >> 4) & 0xF) << 4
+        red = ((pixel >> 8) & 0xF) << 4
+        alpha = ((pixel >> 12) & 0xF) << 4
+        red = red | (red >> 4)
+        green = green | (green >> 4)
+        blue = blue | (blue >> 4)
+        alpha = alpha | (alpha >> 4)
+        return struct.pack("<BBBB", red, green, blue, alpha)
+
+    def test_packed_formats(self) -> None:
+        # Every possible pixel value, in both endiannesses.
+        for fmt, reference in [
+            (TextureFormat.RGB565, self.reference_rgb565),
+            (TextureFormat.ARGB1555, self.reference_argb1555),
+            (TextureFormat.ARGB4444, self.reference_argb4444),
+        ]:
+            for endian in ["<", ">"]:
+                data = struct.pack(f"{endian}65536H", *range(0x10000))
+                img = TextureFormat.decode(fmt, 256, 256, data + b'\0\0', endian=endian)
+                self.assertEqual(img.tobytes(), b''.join(reference(pixel) for pixel in range(0x10000)))
+
+    def test_raw_formats(self) -> None:
+        data = bytes([1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(TextureFormat.decode(TextureFormat.RGB888, 2, 1, data[:6]).tobytes(), data[:6])
+        self.assertEqual(TextureFormat.decode(TextureFormat.BGR888, 2, 1, data[:6]).tobytes(), bytes([3, 2, 1, 6, 5, 4]))
+        self.assertEqual(TextureFormat.decode(TextureFormat.ARGB8888, 2, 1, data).tobytes(), bytes([2, 3, 4, 1, 6, 7, 8, 5]))
+        self.assertEqual(TextureFormat.decode(TextureFormat.BGRA8888, 2, 1, data).tobytes(), bytes([3, 2, 1, 4, 7, 6, 5, 8]))
+
+    def test_dxt_formats(self) -> None:
+        data = os.urandom(4 * 16)
+        self.assertEqual(
+            TextureFormat.decode(TextureFormat.DXT1, 8, 8, data[:32]).tobytes(),
+            DXTBuffer(8, 8).DXT1Decompress(data[:32]),
+        )
+        self.assertEqual(
+            TextureFormat.decode(TextureFormat.DXT5, 8, 8, data, endian=">").tobytes(),
+            DXTBuffer(8, 8).DXT5Decompress(data, swap=True),
+        )
+
+    def test_unsupported(self) -> None:
+        with self.assertRaisesRegex(Exception, 'Unsupported texture format yuv422!'):
+            TextureFormat.decode("yuv422", 2, 2, b'\0' * 8)
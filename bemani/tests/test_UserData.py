@@ -0,0 +1,51 @@
+# vim: set fileencoding=utf-8
+import unittest
+from unittest.mock import Mock
+
+from bemani.common import GameConstants
+from bemani.data import UserID
+from bemani.data.mysql.user import UserData
+from bemani.tests.helpers import FakeCursor
+
+
+class TestUserData(unittest.TestCase):
+
+    def test_get_any_profiles(self) -> None:
+        user = UserData(Mock(), None)
+        user.execute = Mock(side_effect=[  # type: ignore
+            # Which versions each user has a profile for.
+            FakeCursor([
+                {'userid': 1, 'version': 1},
+                {'userid': 1, 'version': 2},
+                {'userid': 2, 'version': 1},
+                {'userid': 3, 'version': 3},
+                {'userid': 3, 'version': 4},
+            ]),
+            # The profiles themselves, one query per version.
+            FakeCursor([
+                {'userid': 1, 'refid': 'A' * 16, 'extid': 11111111, 'data': '{"name": "ONE"}'},
+            ]),
+            FakeCursor([
+                {'userid': 2, 'refid': 'B' * 16, 'extid': 22222222, 'data': '{"name": "TWO"}'},
+            ]),
+            FakeCursor([
+                {'userid': 3, 'refid': 'C' * 16, 'extid': 33333333, 'data': '{"name": "THREE"}'},
+            ]),
+        ])
+
+        profiles = user.get_any_profiles(GameConstants.SDVX, 2, [UserID(1), UserID(2), UserID(3), UserID(4)])
+        self.assertEqual([userid for (userid, _) in profiles], [1, 2, 3, 4])
+        versions = [None if profile is None else profile.version for (_, profile) in profiles]
+        self.assertEqual(versions, [2, 1, 4, None])
+        names = [None if profile is None else profile.get_str('name') for (_, profile) in profiles]
+        self.assertEqual(names, ['ONE', 'TWO', 'THREE', None])
+        self.assertEqual(user.execute.call_count, 4)
+
+    def test_get_profiles_chunked(self) -> None:
+        user = UserData(Mock(), None)
+        user.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+
+        userids = [UserID(i) for i in range(UserData.PROFILE_CHUNK_SIZE + 1)]
+        self.assertEqual(user.get_profiles(GameConstants.DDR, [(userid, 16) for userid in userids]), {})
+        chunks = [call[0][1]['userids'] for call in user.execute.call_args_list]
+        self.assertEqual([len(chunk) for chunk in chunks], [UserData.PROFILE_CHUNK_SIZE, 1])
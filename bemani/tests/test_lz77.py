@@ -2,8 +2,9 @@
 import os
 import random
 import unittest
+from typing import List
 
-from bemani.protocol.lz77 import Lz77, Lz77Decompress
+from bemani.protocol.lz77 import Lz77, Lz77Compress, Lz77Decompress, LzException
 from bemani.tests.helpers import get_fixture
 
 
@@ -26,6 +27,43 @@ class TestLZ77Decompressor(unittest.TestCase):
             # Verify integrity of ringbuffer
             self.assertEqual(len(dec.ring), Lz77Decompress.RING_LENGTH)
 
+    def make_stream(self, instructions: int) -> bytes:
+        # Build a valid stream made up of random literals and random backrefs,
+        # including backrefs that reach before the start of the output.
+        chunks: List[bytes] = []
+        for _ in range(instructions):
+            flags = random.randint(0, 255)
+            chunk = b""
+            for flagpos in range(8):
+                if (flags >> flagpos) & 1:
+                    chunk += os.urandom(1)
+                else:
+                    copy_pos = random.randint(1, 0xFFF)
+                    copy_len = random.randint(0, 0xF)
+                    chunk += bytes([copy_pos >> 4, ((copy_pos & 0xF) << 4) | copy_len])
+            chunks.append(bytes([flags]) + chunk)
+        chunks.append(b"\x00\x00\x00")
+        return b"".join(chunks)
+
+    def test_decompress_all_fuzz(self) -> None:
+        for backref in [None, 0x1000, 0x2000, 0x100, 0x10]:
+            for _ in range(20):
+                data = self.make_stream(random.randint(1, 200))
+                expected = b''.join(Lz77Decompress(data, backref=backref).decompress_bytes())
+                actual = Lz77Decompress(data, backref=backref).decompress_all()
+                self.assertEqual(expected, actual)
+
+    def test_decompress_all_fixtures(self) -> None:
+        for fixture in ["declaration.txt", "lorem.txt", "rawdata"]:
+            data = get_fixture(fixture)
+            compresseddata = b''.join(Lz77Compress(data).compress_bytes())
+            self.assertEqual(data, Lz77Decompress(compresseddata).decompress_all())
+            self.assertEqual(data, b''.join(Lz77Decompress(compresseddata).decompress_bytes()))
+
+    def test_decompress_all_truncated(self) -> None:
+        with self.assertRaises(LzException):
+            Lz77Decompress(b"\x00\x01").decompress_all()
+
 
 class TestLz77RealCompressor(unittest.TestCase):
     def test_small_data_random(self) -> None:
@@ -91,6 +129,22 @@ class TestLz77RealCompressor(unittest.TestCase):
         decompresseddata = lz77.decompress(compresseddata)
         self.assertEqual(data, decompresseddata)
 
+    def test_compression_levels(self) -> None:
+        lz77 = Lz77()
+        for data in [get_fixture("declaration.txt"), get_fixture("rawdata"), os.urandom(10 * 1024), b"\x00" * 70000]:
+            fast = b''.join(Lz77Compress(data, level=Lz77Compress.LEVEL_FAST).compress_bytes())
+            best = b''.join(Lz77Compress(data, level=Lz77Compress.LEVEL_BEST).compress_bytes())
+            self.assertEqual(data, lz77.decompress(fast))
+            self.assertEqual(data, lz77.decompress(best))
+            self.assertEqual(data, lz77.decompress(lz77.compress(data, level=Lz77Compress.LEVEL_BEST)))
+
+        with self.assertRaises(LzException):
+            Lz77Compress(b"abc", level=5)
+        with self.assertRaises(LzException):
+            Lz77Compress(b"abc", level=0)
+        with self.assertRaises(LzException):
+            lz77.compress(b"abc", level=0)
+
     def test_known_compression(self) -> None:
         """
         Specifically tests for ability to compress an overlap,
@@ -1,7 +1,8 @@
 # vim: set fileencoding=utf-8
+import os
 import unittest
 
-from bemani.protocol import EAmuseProtocol, Node
+from bemani.protocol import EAmuseProtocol, EAmuseException, Node
 
 
 class TestProtocol(unittest.TestCase):
@@ -373,3 +374,71 @@ class TestProtocol(unittest.TestCase):
         root.add_child(unicode_node)
 
         self.assertLoopback(root)
+
+    def test_adaptive_compression(self) -> None:
+        proto = EAmuseProtocol()
+        before = EAmuseProtocol.stats()
+
+        # Tiny acks should never be compressed.
+        root = Node.void('response')
+        root.add_child(Node.void('pcbevent'))
+        binary = proto.encode('lz77', None, root, text_encoding=EAmuseProtocol.SHIFT_JIS, packet_encoding=EAmuseProtocol.BINARY, compress_threshold=512)
+        self.assertEqual(proto.last_compression, 'none')
+        self.assertEqual(proto.decode('none', None, binary), root)
+
+        # Large, repetitive responses should be compressed.
+        root = Node.void('response')
+        for i in range(200):
+            root.add_child(Node.s32('score', i % 10))
+        binary = proto.encode('lz77', None, root, text_encoding=EAmuseProtocol.SHIFT_JIS, packet_encoding=EAmuseProtocol.BINARY, compress_threshold=512)
+        self.assertEqual(proto.last_compression, 'lz77')
+        self.assertEqual(proto.decode('lz77', None, binary), root)
+
+        # Large, random responses should not be compressed.
+        root = Node.void('response')
+        root.add_child(Node.binary('data', os.urandom(8192)))
+        binary = proto.encode('lz77', '1-abcdef-0123', root, text_encoding=EAmuseProtocol.SHIFT_JIS, packet_encoding=EAmuseProtocol.BINARY, compress_threshold=512)
+        self.assertEqual(proto.last_compression, 'none')
+        self.assertEqual(proto.decode('none', '1-abcdef-0123', binary), root)
+
+        # Without a threshold, we always honor the requested compression.
+        root = Node.void('response')
+        binary = proto.encode('lz77', None, root, text_encoding=EAmuseProtocol.SHIFT_JIS, packet_encoding=EAmuseProtocol.BINARY)
+        self.assertEqual(proto.last_compression, 'lz77')
+        self.assertEqual(proto.decode('lz77', None, binary), root)
+
+        after = EAmuseProtocol.stats()
+        self.assertEqual(after['skipped_small'] - before['skipped_small'], 1)
+        self.assertEqual(after['skipped_incompressible'] - before['skipped_incompressible'], 1)
+        self.assertEqual(after['compressed'] - before['compressed'], 1)
+        self.assertTrue(after['bytes_saved'] > before['bytes_saved'])
+        self.assertTrue(after['compress_seconds'] >= before['compress_seconds'])
+
+    def test_encoding_detection(self) -> None:
+        proto = EAmuseProtocol()
+        before = EAmuseProtocol.stats()
+
+        root = Node.void('call')
+        root.add_child(Node.string('model', 'LDJ:J:A:A:2019090200'))
+
+        binary = proto.encode(None, None, root, text_encoding=EAmuseProtocol.SHIFT_JIS, packet_encoding=EAmuseProtocol.BINARY)
+        self.assertEqual(proto.decode(None, None, binary), root)
+        self.assertEqual(proto.last_packet_encoding, EAmuseProtocol.BINARY)
+
+        xml = proto.encode(None, None, root, text_encoding=EAmuseProtocol.SHIFT_JIS, packet_encoding=EAmuseProtocol.XML)
+        self.assertEqual(proto.decode(None, None, b'\r\n' + xml), root)
+        self.assertEqual(proto.last_packet_encoding, EAmuseProtocol.XML)
+
+        # A stray byte in front of the XML means we can't tell, but it still parses.
+        self.assertEqual(proto.decode(None, None, b'\x00' + xml), root)
+        self.assertEqual(proto.last_packet_encoding, EAmuseProtocol.XML)
+
+        # A truncated binary packet should not be retried as XML.
+        with self.assertRaises(EAmuseException):
+            proto.decode(None, None, binary[:10])
+
+        after = EAmuseProtocol.stats()
+        self.assertEqual(after['decoded_binary'] - before['decoded_binary'], 1)
+        self.assertEqual(after['decoded_xml'] - before['decoded_xml'], 2)
+        self.assertEqual(after['decode_fallback'] - before['decode_fallback'], 1)
+        self.assertEqual(after['decode_failed'] - before['decode_failed'], 1)
@@ -1,5 +1,6 @@
 #! /usr/bin/env python3
 import argparse
+import functools
 import io
 import json
 import math
@@ -10,7 +11,7 @@ import textwrap
 from PIL import Image, ImageDraw  # type: ignore
 from typing import Any, Dict, List, Optional, Tuple, TypeVar
 
-from bemani.format.afp import TXP2File, Shape, SWF, Frame, Tag, AP2DoActionTag, AP2PlaceObjectTag, AP2DefineSpriteTag, AFPRenderer, Color, Matrix
+from bemani.format.afp import TXP2File, Texture, Shape, SWF, Frame, Tag, AP2DoActionTag, AP2PlaceObjectTag, AP2DefineSpriteTag, AFPRenderer, Color, Matrix
 from bemani.format import IFS
 
 
@@ -108,7 +109,7 @@ def extract_txp2(
         for texture in afpfile.textures:
             filename = os.path.join(output_dir, texture.name)
 
-            if texture.img:
+            if texture.supported:
                 if pretend:
                     print(f"Would write {filename}.png texture...")
                 else:
@@ -116,7 +117,7 @@ def extract_txp2(
                     with open(f"{filename}.png", "wb") as bfp:
                         texture.img.save(bfp, format='PNG')
 
-            if not texture.img or write_raw:
+            if not texture.supported or write_raw:
                 if pretend:
                     print(f"Would write {filename}.raw texture...")
                 else:
@@ -260,7 +261,7 @@ def extract_txp2(
                 else:
                     raise Exception("Could not find texture {texturename} to split!")
 
-            if textures[texturename].img:
+            if textures[texturename].supported:
                 # Grab the location in the image, save it out to a new file.
                 filename = f"{texturename}_{name}.png"
                 filename = os.path.join(output_dir, filename)
@@ -381,6 +382,10 @@ def parse_geo(geo: str, *, verbose: bool=False) -> int:
     return 0
 
 
+def crop_texture(texture: Texture, box: Tuple[int, int, int, int]) -> Image.Image:
+    return texture.img.crop(box)
+
+
 def load_containers(renderer: AFPRenderer, containers: List[str], *, need_extras: bool, verbose: bool) -> None:
     # This is a complicated one, as we need to be able to specify multiple
     # directories of files as well as support IFS files and TXP2 files.
@@ -424,11 +429,16 @@ def load_containers(renderer: AFPRenderer, containers: List[str], *, need_extras
                         else:
                             raise Exception("Could not find texture {texturename} to split!")
 
-                    if sheets[texturename].img:
-                        sprite = sheets[texturename].img.crop(
-                            (region.left // 2, region.top // 2, region.right // 2, region.bottom // 2),
+                    if sheets[texturename].supported:
+                        # Only decode the sheet and crop the sprite out if the animation uses it.
+                        renderer.add_texture_loader(
+                            name,
+                            functools.partial(
+                                crop_texture,
+                                sheets[texturename],
+                                (region.left // 2, region.top // 2, region.right // 2, region.bottom // 2),
+                            ),
                         )
-                        renderer.add_texture(name, sprite)
 
                         if verbose:
                             print(f"Added {name} to animation texture library.", file=sys.stderr)
@@ -3,6 +3,9 @@ import getpass
 import sys
 from typing import Optional
 
+from bemani.backend.iidx import IIDXBase
+from bemani.backend.museca import MusecaBase
+from bemani.backend.sdvx import SoundVoltexBase
 from bemani.data import Config, Data, DBCreateException
 from bemani.utils.config import load_config
 
@@ -68,11 +71,30 @@ def remove_admin(config: Config, username: Optional[str]) -> None:
     print(f'User {username} lost admin rights.')
 
 
+def rebuild_clear_rates(config: Config) -> None:
+    data = Data(config)
+    for game, classify in [
+        (IIDXBase.game, IIDXBase.clear_rate_stats),
+        (SoundVoltexBase.game, SoundVoltexBase.clear_rate_stats),
+        (MusecaBase.game, MusecaBase.clear_rate_stats),
+    ]:
+        counted = data.local.music.rebuild_clear_rates(game, classify)
+        print(f'Counted {counted} attempts for {game.value}.')
+    data.close()
+
+
+def rebuild_records(config: Config) -> None:
+    data = Data(config)
+    checked, repaired = data.local.music.rebuild_records()
+    print(f'Checked {checked} records, repaired {repaired}.')
+    data.close()
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="A utility for working with databases created with this codebase.")
     parser.add_argument(
         "operation",
-        help="Operation to perform, options include 'create', 'generate', 'upgrade', 'change-password', 'add-admin' and 'remove-admin'.",
+        help="Operation to perform, options include 'create', 'generate', 'upgrade', 'change-password', 'add-admin', 'remove-admin', 'rebuild-clear-rates' and 'rebuild-records'.",
         type=str,
     )
     parser.add_argument(
@@ -112,6 +134,10 @@ def main() -> None:
             remove_admin(config, args.username)
         elif args.operation == 'change-password':
             change_password(config, args.username)
+        elif args.operation == 'rebuild-clear-rates':
+            rebuild_clear_rates(config)
+        elif args.operation == 'rebuild-records':
+            rebuild_records(config)
         else:
             raise Exception(f"Unknown operation '{args.operation}'")
     except DBCreateException as e:
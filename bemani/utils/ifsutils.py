@@ -1,11 +1,61 @@
 import argparse
 import os
-
-from typing import Optional
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Optional, Tuple
 
 from bemani.format import IFS
 
 
+# The archive each pool worker maps once at startup, so only member names cross processes.
+worker_ifs: Optional[IFS] = None
+
+
+def open_ifs(fileroot: str, fname: str, convert_xml: bool, convert_textures: bool) -> Optional[IFS]:
+    def load_ifs(fname: str, root: bool=False) -> Optional[IFS]:
+        fname = os.path.join(fileroot, fname)
+        if os.path.isfile(fname):
+            return IFS.open(
+                fname,
+                decode_binxml=root and convert_xml,
+                decode_textures=root and convert_textures,
+                keep_hex_names=not root,
+                reference_loader=load_ifs,
+            )
+        else:
+            return None
+
+    return load_ifs(fname, root=True)
+
+
+def extract_file(ifs: IFS, root: str, fn: str) -> Dict[str, float]:
+    before = ifs.timings
+    data = ifs.read_file(fn)
+    after = ifs.timings
+
+    realfn = os.path.join(root, fn)
+    dirof = os.path.dirname(realfn)
+    os.makedirs(dirof, exist_ok=True)
+    start = time.perf_counter()
+    with open(realfn, 'wb') as fp:
+        fp.write(data)
+
+    timings = {stage: after[stage] - before[stage] for stage in after}
+    timings['write'] = time.perf_counter() - start
+    return timings
+
+
+def init_worker(fileroot: str, fname: str, convert_xml: bool, convert_textures: bool) -> None:
+    global worker_ifs
+    worker_ifs = open_ifs(fileroot, fname, convert_xml, convert_textures)
+
+
+def extract_in_worker(root: str, fn: str) -> Tuple[str, Dict[str, float]]:
+    if worker_ifs is None:
+        raise Exception("Worker was not initialized with an IFS file!")
+    return fn, extract_file(worker_ifs, root, fn)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="A utility to extract IFS files.")
     parser.add_argument(
@@ -29,6 +79,13 @@ def main() -> None:
         help="Convert texture files that are in game-format to PNG files.",
         action="store_true",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of processes to extract files with. Defaults to 1.",
+        type=int,
+        default=1,
+    )
     args = parser.parse_args()
 
     root = args.directory
@@ -38,34 +95,40 @@ def main() -> None:
 
     fileroot = os.path.dirname(os.path.realpath(args.file))
 
-    def load_ifs(fname: str, root: bool=False) -> Optional[IFS]:
-        fname = os.path.join(fileroot, fname)
-        if os.path.isfile(fname):
-            fp = open(fname, 'rb')
-            data = fp.read()
-            fp.close()
-
-            return IFS(
-                data,
-                decode_binxml=root and args.convert_xml_files,
-                decode_textures=root and args.convert_texture_files,
-                keep_hex_names=not root,
-                reference_loader=load_ifs,
-            )
-        else:
-            return None
-
-    ifs = load_ifs(args.file, root=True)
+    ifs = open_ifs(fileroot, args.file, args.convert_xml_files, args.convert_texture_files)
     if ifs is None:
         raise Exception(f"Couldn't locate file {args.file}!")
 
-    for fn in ifs.filenames:
-        print(f'Extracting {fn} to disk...')
-        realfn = os.path.join(root, fn)
-        dirof = os.path.dirname(realfn)
-        os.makedirs(dirof, exist_ok=True)
-        with open(realfn, 'wb') as fp:
-            fp.write(ifs.read_file(fn))
+    totals: Dict[str, float] = {}
+
+    def report(fn: str, timings: Dict[str, float]) -> None:
+        print(f'Extracted {fn} to disk...')
+        for stage, amount in timings.items():
+            totals[stage] = totals.get(stage, 0.0) + amount
+
+    start = time.perf_counter()
+    with ifs:
+        if args.jobs > 1:
+            # Workers map the archive themselves, so we only need the list of members here.
+            filenames = ifs.filenames
+            ifs.close()
+
+            with ProcessPoolExecutor(
+                max_workers=args.jobs,
+                initializer=init_worker,
+                initargs=(fileroot, args.file, args.convert_xml_files, args.convert_texture_files),
+            ) as executor:
+                futures = [executor.submit(extract_in_worker, root, fn) for fn in filenames]
+                for future in as_completed(futures):
+                    report(*future.result())
+        else:
+            for fn in ifs.filenames:
+                report(fn, extract_file(ifs, root, fn))
+
+    elapsed = time.perf_counter() - start
+    print(f'Finished in {elapsed:.3f}s, time spent per stage across all processes:')
+    for stage, amount in totals.items():
+        print(f'  {stage}: {amount:.3f}s')
 
 
 if __name__ == '__main__':
@@ -1923,14 +1923,11 @@ class ImportIIDX(ImportBase):
                             data = fp.read()
                             fp.close()
                         else:
-                            fp = open(filename, 'rb')
-                            ifsdata = fp.read()
-                            fp.close()
-                            ifs = IFS(ifsdata)
-                            for fn in ifs.filenames:
-                                _, extension = os.path.splitext(fn)
-                                if extension == '.1':
-                                    data = ifs.read_file(fn)
+                            with IFS.open(filename) as ifs:
+                                for fn in ifs.filenames:
+                                    _, extension = os.path.splitext(fn)
+                                    if extension == '.1':
+                                        data = ifs.read_file(fn)
 
                         if data is not None:
                             iidxchart = IIDXChart(data)
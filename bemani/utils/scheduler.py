@@ -71,7 +71,10 @@ def run_scheduled_work(config: Config) -> None:
     if keep_duration > 0:
         # Calculate timestamp of events we should delete
         oldest_event = Time.now() - keep_duration
-        data.local.network.delete_events(oldest_event)
+        deleted = data.local.network.delete_events(oldest_event)
+        if sum(deleted) > 0:
+            # Stay quiet when nothing was pruned, since this runs from cron.
+            print(f'Deleted {sum(deleted)} old events in {len(deleted)} batches.')
 
 
 if __name__ == '__main__':
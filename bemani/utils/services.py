@@ -1,16 +1,55 @@
 import argparse
+import os
 import traceback
-from flask import Flask, request, redirect, Response, make_response
+from typing import Optional
+from flask import Flask, request, redirect, Response, make_response, jsonify
 
 from bemani.protocol import EAmuseProtocol
 from bemani.backend import Dispatch, UnrecognizedPCBIDException
 from bemani.data import Config, Data
+from bemani.data.api.client import APIClient
+from bemani.data.mysql.machine import MachineData
+from bemani.data.mysql.network import NetworkData
 from bemani.utils.config import load_config as base_load_config, register_games as base_register_games
 
 
 app = Flask(__name__)
 config = Config()
 
+# One Data object per worker process, created on first use so that it is never
+# shared across a fork. Sessions are per-thread, so each request checks out a
+# connection from the process-wide pool and hands it back when it's done.
+data: Optional[Data] = None
+data_pid: Optional[int] = None
+
+
+def get_data() -> Data:
+    global data
+    global data_pid
+    pid = os.getpid()
+    if data is None or data_pid != pid:
+        data = Data(config)
+        data.local.network.buffer_events()
+        data_pid = pid
+    return data
+
+
+@app.route('/debug/stats', methods=['GET'])
+def receive_debug_stats() -> Response:
+    # Only answer requests made directly against this worker from the local machine,
+    # anybody else gets the same treatment as any other GET.
+    if request.remote_addr not in {'127.0.0.1', '::1'} or 'x-remote-address' in request.headers:
+        return receive_healthcheck('debug/stats')
+
+    return jsonify({
+        'pid': os.getpid(),
+        'pool': Data.pool_stats(config),
+        'machine_cache': MachineData.cache_stats(),
+        'audit_events': NetworkData.event_stats(),
+        'remote_api': APIClient.client_stats(),
+        'protocol': EAmuseProtocol.stats(),
+    })
+
 
 @app.route('/', defaults={'path': ''}, methods=['GET'])
 @app.route('/<path:path>', methods=['GET'])
@@ -53,7 +92,7 @@ def receive_request(path: str) -> Response:
         'address': remote_address or request.remote_addr,
     }
 
-    dataprovider = Data(requestconfig)
+    dataprovider = get_data()
     try:
         dispatch = Dispatch(requestconfig, dataprovider, True)
         resp = dispatch.handle(req)
@@ -72,14 +111,16 @@ def receive_request(path: str) -> Response:
             compression,
             encryption,
             resp,
+            compress_threshold=config.server.compress_threshold,
         )
 
         response = make_response(data)
 
         # Some old clients are case-sensitive, even though http spec says these
-        # shouldn't matter, so capitalize correctly.
-        if compression:
-            response.headers['X-Compress'] = compression
+        # shouldn't matter, so capitalize correctly. Small or incompressible
+        # responses may have skipped compression even if the client asked for it.
+        if proto.last_compression:
+            response.headers['X-Compress'] = proto.last_compression
         else:
             response.headers['X-Compress'] = 'none'
         if encryption:
@@ -109,7 +150,7 @@ def receive_request(path: str) -> Response:
         )
         return Response("Crash when handling packet!", 500)
     finally:
-        dataprovider.close()
+        dataprovider.release()
 
 
 def register_games() -> None:
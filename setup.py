@@ -30,6 +30,28 @@ def extensions():
             extra_compile_args=["-std=c++14"],
             extra_link_args=["-std=c++14"],
         ),
+        # Alternative, much faster RC4 keystream implementation which is used for
+        # every encrypted packet that comes in or goes out of the services endpoint.
+        Extension(
+            "bemani.protocol.rc4cpp",
+            [
+                "bemani/protocol/rc4cpp.cxx",
+            ],
+            language="c++",
+            extra_compile_args=["-std=c++14"],
+            extra_link_args=["-std=c++14"],
+        ),
+        # Alternative, much faster DXT1/DXT5 block decoder which takes decoding large
+        # texture atlases found in IFS and AFP files down from seconds to milliseconds.
+        Extension(
+            "bemani.format.dxtcpp",
+            [
+                "bemani/format/dxtcpp.cxx",
+            ],
+            language="c++",
+            extra_compile_args=["-std=c++14"],
+            extra_link_args=["-std=c++14"],
+        ),
         # This is a memory-unsafe, orders of magnitude faster threaded implementation
         # of the pure python blend code which takes rendering rough animations down
         # from over an hour to around a minute.
@@ -149,8 +171,8 @@ def extensions():
                             "bemani/format/afp/types/generic.py",
                         ]
                     ),
-                    # DXT is slow enough that it might be worth it to write a C++ implementation of
-                    # this at some point, but for now we squeeze a bit of speed out of this by compiling.
+                    # The C++ implementation of DXT does the heavy lifting, but the pure python
+                    # fallback is still used when that isn't available, so compile it as well.
                     Extension(
                         "bemani.format.dxt",
                         [